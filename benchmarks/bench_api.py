@@ -0,0 +1,217 @@
+"""HTTP 负载测试：各接口的吞吐与 p50/p99 延迟
+
+Usage:
+    python benchmarks/bench_api.py --notes 10000 --concurrency 8 --requests 400
+    python benchmarks/bench_api.py --scenarios extract,translate,quiz --ai-latency 0.3 \\
+        --ai-rate-limit-rate 0.1 --ai-timeout-rate 0.05 --ai-client-timeout 2
+    python benchmarks/bench_api.py --scenarios extract --ai-server-error-rate 0.3 --ai-rps 20
+    BENCH_DATABASE_URL=postgresql://localhost/notes_bench python benchmarks/bench_api.py
+
+应用在本进程的多线程 WSGI 服务器中运行，负载线程通过真实 HTTP 请求访问它，
+因此结果包含连接处理、路由、序列化与数据库开销。AI 接口指向本地假模型服务
+（fake_ai_server.py），可模拟模型延迟、429 限流、5xx 和超时。AI 结果缓存默认关闭，
+使每次请求都真正调用模型；需要测量缓存命中路径时加 --ai-cache。
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import requests
+from werkzeug.serving import make_server
+
+from common import create_app, emit, rare_word, seed_notes, summarize
+from fake_ai_server import start_fake_server
+
+DB_SCENARIOS = ('list', 'get', 'search', 'create', 'update')
+AI_SCENARIOS = ('extract', 'translate', 'quiz')
+
+
+def _ai_failed(response):
+    """AI 接口在失败时可能仍返回 200（提取接口把错误文本放在 extracted_info 中）"""
+    if response.status_code != 200:
+        return True
+    body = response.json()
+    return str(body.get('extracted_info', '')).startswith('❌')
+
+
+def build_scenarios(note_ids):
+    """场景名 -> (生成请求参数的函数, 判断失败的函数)；生成函数接收线程私有的随机数生成器"""
+    created_ids = []
+    created_lock = threading.Lock()
+
+    def remember(response):
+        if response.status_code == 201:
+            with created_lock:
+                created_ids.append(response.json()['id'])
+        return response.status_code != 201
+
+    def update_target(rng):
+        with created_lock:
+            pool = created_ids or note_ids
+            return rng.choice(pool)
+
+    def ai_content(rng):
+        # 每次请求的内容不同，避免被 AI 结果缓存或单飞合并掩盖模型耗时
+        return f'负载测试笔记 {rng.random()} ' + ' '.join(rare_word(rng.randrange(5000)) for _ in range(40))
+
+    return {
+        'list': (lambda rng: ('GET', '/api/notes?limit=50&fields=id,title,updated_at,snippet', None),
+                 lambda r: r.status_code != 200),
+        'get': (lambda rng: ('GET', f'/api/notes/{rng.choice(note_ids)}', None),
+                lambda r: r.status_code != 200),
+        'search': (lambda rng: ('GET', f'/api/notes/search?q={rare_word(int(rng.paretovariate(1.0)) % 2000)}&limit=20', None),
+                   lambda r: r.status_code != 200),
+        'create': (lambda rng: ('POST', '/api/notes', {'title': f'bench {rng.random()}', 'content': 'load test'}),
+                   remember),
+        'update': (lambda rng: ('PUT', f'/api/notes/{update_target(rng)}', {'title': f'updated {rng.random()}'}),
+                   lambda r: r.status_code != 200),
+        'extract': (lambda rng: ('POST', '/api/notes/extract-info', {'content': ai_content(rng)}), _ai_failed),
+        'translate': (lambda rng: ('POST', '/api/notes/translate', {'content': ai_content(rng), 'language': 'English'}),
+                      _ai_failed),
+        'quiz': (lambda rng: ('POST', '/api/notes/generate-quiz', {'content': ai_content(rng)}), _ai_failed),
+    }
+
+
+def run_scenario(base_url, name, make_request, is_failure, total, concurrency, seed):
+    """用 concurrency 个线程共发出 total 个请求，返回延迟分布、吞吐与状态码统计"""
+    latencies = []
+    statuses = Counter()
+    failures = 0
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker(index):
+        nonlocal failures
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local_latencies, local_statuses, local_failures = [], Counter(), 0
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            method, path, body = make_request(rng)
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=120)
+                status = response.status_code
+                failed = is_failure(response)
+            except requests.RequestException as e:
+                status, failed = type(e).__name__, True
+            local_latencies.append((time.perf_counter() - started) * 1000)
+            local_statuses[str(status)] += 1
+            local_failures += failed
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            failures += local_failures
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    return {
+        'scenario': name,
+        'requests': total,
+        'concurrency': concurrency,
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(total / seconds, 1) if seconds else None,
+        'failures': failures,
+        'status_codes': dict(statuses),
+        'latency': summarize(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=10000, help='预先写入的笔记数')
+    parser.add_argument('--scenarios', default=','.join(DB_SCENARIOS + AI_SCENARIOS))
+    parser.add_argument('--requests', type=int, default=400, help='每个数据库场景的请求数')
+    parser.add_argument('--ai-requests', type=int, default=40, help='每个 AI 场景的请求数')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--ai-latency', type=float, default=0.2, help='假模型的响应延迟（秒）')
+    parser.add_argument('--ai-rate-limit-rate', type=float, default=0.0, help='假模型返回 429 的比例')
+    parser.add_argument('--ai-retry-after', type=int, default=1)
+    parser.add_argument('--ai-server-error-rate', type=float, default=0.0, help='假模型返回 503 的比例')
+    parser.add_argument('--ai-timeout-rate', type=float, default=0.0, help='假模型挂起不响应的比例')
+    parser.add_argument('--ai-client-timeout', type=float, default=5.0, help='应用侧 AI 请求超时（GITHUB_AI_TIMEOUT）')
+    parser.add_argument('--ai-rps', type=float, help='应用侧令牌桶速率（AI_RATE_LIMIT_RPS），0 表示不限流')
+    parser.add_argument('--ai-max-retries', type=int, help='应用侧最大重试次数（AI_MAX_RETRIES）')
+    parser.add_argument('--ai-cache', action='store_true', help='保留 AI 结果缓存（默认关闭）')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    from src.services.ai_resilience import ai_retries, get_ai_guard
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    fake_server, fake_options, fake_url = start_fake_server(
+        latency=args.ai_latency,
+        rate_limit_rate=args.ai_rate_limit_rate,
+        retry_after=args.ai_retry_after,
+        server_error_rate=args.ai_server_error_rate,
+        timeout_rate=args.ai_timeout_rate,
+        hang_seconds=args.ai_client_timeout * 2,
+        seed=args.seed
+    )
+    # AI 服务在首次调用时按环境变量创建客户端，必须在发出请求前设置好
+    os.environ['GITHUB_TOKEN'] = 'bench'
+    os.environ['GITHUB_AI_ENDPOINT'] = fake_url
+    os.environ['GITHUB_AI_TIMEOUT'] = str(args.ai_client_timeout)
+    if args.ai_rps is not None:
+        os.environ['AI_RATE_LIMIT_RPS'] = str(args.ai_rps)
+    if args.ai_max_retries is not None:
+        os.environ['AI_MAX_RETRIES'] = str(args.ai_max_retries)
+    if not args.ai_cache:
+        os.environ['AI_CACHE_BACKEND'] = 'off'
+
+    app, db = create_app()
+    with app.app_context():
+        seed_notes(db, args.notes, content_words=60)
+        from src.models.note import Note
+        note_ids = list(db.session.execute(db.select(Note.id)).scalars())
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    table = build_scenarios(note_ids)
+    results = []
+    try:
+        for index, name in enumerate(scenarios):
+            make_request, is_failure = table[name]
+            total = args.ai_requests if name in AI_SCENARIOS else args.requests
+            results.append(run_scenario(base_url, name, make_request, is_failure, total, args.concurrency,
+                                        args.seed + index))
+    finally:
+        server.shutdown()
+        fake_server.shutdown()
+
+    emit('api', {
+        'database': os.environ['DATABASE_URL'].split('@')[-1],
+        'notes': args.notes,
+        'ai': {
+            'latency': args.ai_latency,
+            'rate_limit_rate': args.ai_rate_limit_rate,
+            'server_error_rate': args.ai_server_error_rate,
+            'timeout_rate': args.ai_timeout_rate,
+            'client_timeout': args.ai_client_timeout,
+            'cache': args.ai_cache,
+            'fake_server': fake_options.stats(),
+            'retries': {reason: ai_retries.value(reason=reason)
+                        for reason in ('rate_limited', 'server_error', 'timeout', 'connection')},
+            'guard': get_ai_guard().state()
+        },
+        'scenarios': results
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""对比逐条请求与 /api/notes/batch 的写入吞吐
+
+Usage:
+    python benchmarks/bench_batch.py --operations 5000 --chunk-size 500
+
+依次测量创建、更新、删除三类操作：逐条调用 POST/PUT/DELETE 接口，
+与把同样的操作放进一次批量请求。通过 Flask 测试客户端在进程内发起请求，
+因此结果包含路由与序列化开销，但不包含网络开销。
+"""
+
+import argparse
+import time
+
+from common import create_app, emit, make_note_rows
+
+
+def _throughput(count, seconds):
+    return {'operations': count, 'seconds': round(seconds, 4), 'ops_per_second': round(count / seconds, 1)}
+
+
+def run_single(client, rows):
+    started = time.perf_counter()
+    ids = [client.post('/api/notes', json={'title': r['title'], 'content': r['content']}).json['id'] for r in rows]
+    create = _throughput(len(rows), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for note_id in ids:
+        client.put(f'/api/notes/{note_id}', json={'title': 'updated'})
+    update = _throughput(len(ids), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for note_id in ids:
+        client.delete(f'/api/notes/{note_id}')
+    remove = _throughput(len(ids), time.perf_counter() - started)
+    return {'create': create, 'update': update, 'delete': remove}
+
+
+def run_batch(client, rows, chunk_size):
+    def post(operations):
+        started = time.perf_counter()
+        response = client.post('/api/notes/batch', json={'operations': operations, 'chunk_size': chunk_size})
+        assert response.status_code == 200, response.json
+        return response.json['results'], time.perf_counter() - started
+
+    results, seconds = post([{'op': 'create', 'title': r['title'], 'content': r['content']} for r in rows])
+    create = _throughput(len(rows), seconds)
+    ids = [r['id'] for r in results]
+
+    _, seconds = post([{'op': 'update', 'id': note_id, 'title': 'updated'} for note_id in ids])
+    update = _throughput(len(ids), seconds)
+
+    _, seconds = post([{'op': 'delete', 'id': note_id} for note_id in ids])
+    remove = _throughput(len(ids), seconds)
+    return {'create': create, 'update': update, 'delete': remove}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app, _ = create_app()
+    client = app.test_client()
+    rows = make_note_rows(args.operations)
+    results = {
+        'per_request': run_single(client, rows),
+        'batch': run_batch(client, rows, args.chunk_size),
+        'chunk_size': args.chunk_size
+    }
+    emit('batch_writes', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
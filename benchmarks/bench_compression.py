@@ -0,0 +1,148 @@
+"""响应压缩与压缩存储：传输字节数、数据库体积与 CPU 开销
+
+Usage:
+    python benchmarks/bench_compression.py --notes 2000 --requests 100
+    python benchmarks/bench_compression.py --storage-threshold 4096 --output compression.json
+
+两部分：
+1. 传输：对列表（含正文与提取结果的投影）、单条笔记、搜索接口，分别以 identity / gzip /
+   br（安装了 brotli 时）请求，记录响应字节数、延迟与每个请求消耗的进程 CPU 时间
+2. 存储：把提取结果与两种语言的译文以明文写入，再在开启 CompressedText 阈值后重写一遍，
+   对比 VACUUM 后的 SQLite 文件大小、写入耗时与读取（解压）耗时；非 SQLite 数据库只记录耗时
+"""
+
+import argparse
+import os
+import random
+import time
+
+from common import create_app, emit, random_text, seed_notes, summarize
+
+ENDPOINTS = {
+    'list': '/api/notes?limit=50&fields=id,title,content,extracted_info,updated_at',
+    'get': '/api/notes/{note_id}',
+    'search': '/api/notes/search?q=database&limit=50',
+}
+
+
+def bench_wire(app, note_ids, requests, seed):
+    from src.services.compression import _brotli
+
+    encodings = ['identity', 'gzip'] + (['br'] if _brotli() else [])
+    client = app.test_client()
+    rng = random.Random(seed)
+    results = {}
+    for name, template in ENDPOINTS.items():
+        paths = [template.format(note_id=rng.choice(note_ids)) for _ in range(requests)]
+        results[name] = {}
+        for encoding in encodings:
+            sizes, samples, cpu = [], [], 0.0
+            for path in paths:
+                cpu_started = time.process_time()
+                started = time.perf_counter()
+                response = client.get(path, headers={'Accept-Encoding': encoding})
+                data = response.get_data()
+                samples.append((time.perf_counter() - started) * 1000)
+                cpu += time.process_time() - cpu_started
+                sizes.append(len(data))
+            results[name][encoding] = {
+                'mean_bytes': round(sum(sizes) / len(sizes)),
+                'latency': summarize(samples),
+                'cpu_ms_per_request': round(cpu * 1000 / len(paths), 3),
+            }
+        identity = results[name]['identity']['mean_bytes']
+        for encoding in encodings[1:]:
+            results[name][encoding]['ratio'] = round(results[name][encoding]['mean_bytes'] / max(identity, 1), 3)
+    return results
+
+
+def _database_bytes(db):
+    """VACUUM 后的 SQLite 文件大小；其他数据库返回 None"""
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('VACUUM')
+    return os.path.getsize(db.engine.url.database)
+
+
+def _write_ai_results(db, note_ids, seed, words):
+    from sqlalchemy import delete, insert, update
+    from src.models.note import Note, NoteTranslation
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for start in range(0, len(note_ids), 1000):
+        chunk = note_ids[start:start + 1000]
+        db.session.execute(update(Note), [
+            {'id': note_id, 'extracted_info': random_text(rng, words)} for note_id in chunk
+        ])
+        db.session.execute(delete(NoteTranslation).where(NoteTranslation.note_id.in_(chunk)))
+        db.session.execute(insert(NoteTranslation), [
+            {'note_id': note_id, 'language': language, 'text': random_text(rng, words)}
+            for note_id in chunk for language in ('English', 'Japanese')
+        ])
+        db.session.commit()
+    return time.perf_counter() - started
+
+
+def _read_ai_results(db):
+    from src.models.note import Note, NoteTranslation
+
+    started = time.perf_counter()
+    total = sum(len(value or '') for value in db.session.execute(db.select(Note.extracted_info)).scalars())
+    total += sum(len(value) for value in db.session.execute(db.select(NoteTranslation.text)).scalars())
+    return time.perf_counter() - started, total
+
+
+def bench_storage(app, db, note_ids, threshold, seed, words):
+    from src.models.types import set_compression_threshold
+
+    results = {}
+    with app.app_context():
+        for mode, min_bytes in (('plain', 0), ('compressed', threshold)):
+            set_compression_threshold(min_bytes)
+            write_seconds = _write_ai_results(db, note_ids, seed, words)
+            read_seconds, characters = _read_ai_results(db)
+            results[mode] = {
+                'threshold_bytes': min_bytes,
+                'database_bytes': _database_bytes(db),
+                'write_seconds': round(write_seconds, 3),
+                'read_seconds': round(read_seconds, 3),
+                'characters_read': characters,
+            }
+        set_compression_threshold(0)
+    plain, compressed = results['plain']['database_bytes'], results['compressed']['database_bytes']
+    if plain and compressed:
+        results['size_ratio'] = round(compressed / plain, 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=2000)
+    parser.add_argument('--content-words', type=int, default=300)
+    parser.add_argument('--result-words', type=int, default=600, help='每条提取结果/译文的词数')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--storage-threshold', type=int, default=4096)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app, db = create_app()
+    from src.models.note import Note
+
+    with app.app_context():
+        seed_notes(db, args.notes, content_words=args.content_words)
+        note_ids = list(db.session.execute(db.select(Note.id)).scalars())
+    storage = bench_storage(app, db, note_ids, args.storage_threshold, args.seed, args.result_words)
+    wire = bench_wire(app, note_ids, args.requests, args.seed)
+    emit('compression', {
+        'database': os.environ['DATABASE_URL'].split('@')[-1],
+        'notes': args.notes,
+        'wire': wire,
+        'storage': storage,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
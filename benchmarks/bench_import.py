@@ -0,0 +1,123 @@
+"""测量 api/index.py 的冷启动导入耗时
+
+Usage:
+    python benchmarks/bench_import.py --runs 10
+    python benchmarks/bench_import.py --runs 10 --budget-ms 800   # CI 中超出预算时以非零状态退出
+
+每次在全新的子进程中执行 `python -X importtime -c "import api.index"`，
+记录进程总耗时与 `api.index` 的累计导入耗时，并按顶层包汇总导入开销，
+同时检查 openai 等重量级模块是否在冷启动时被导入。
+默认 DATABASE_URL 指向一个（不存在的）SQLite 文件，模拟配置了持久化数据库的生产环境：
+导入阶段不应建表或连接数据库；`--memory` 改为测量未配置数据库时的内存 SQLite 回退路径。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from common import ROOT, emit, summarize
+
+TARGET = 'api.index'
+# 冷启动阶段不应出现的模块，它们只应在首次 AI 调用时导入
+LAZY_MODULES = ('openai', 'httpx', 'numpy')
+CHECK_SNIPPET = (
+    'import sys, json; import api.index; '
+    'print(json.dumps([m for m in {modules!r} if m in sys.modules]))'
+)
+
+
+def _environment(memory):
+    env = {key: value for key, value in os.environ.items()
+           if key not in ('DATABASE_URL', 'DB_AUTO_CREATE', 'PYTHONPROFILEIMPORTTIME')}
+    if not memory:
+        path = os.path.join(tempfile.mkdtemp(prefix='notes-bench-'), 'cold.db')
+        env['DATABASE_URL'] = f'sqlite:///{path}'
+    return env
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块: (自身微秒, 累计微秒)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(env):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {TARGET}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr[-2000:])
+    return wall_ms, parse_importtime(completed.stderr)
+
+
+def lazy_modules_loaded(env):
+    completed = subprocess.run(
+        [sys.executable, '-c', CHECK_SNIPPET.format(modules=LAZY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='输出导入耗时最高的顶层包数量')
+    parser.add_argument('--memory', action='store_true', help='不设置 DATABASE_URL，测量内存 SQLite 回退路径')
+    parser.add_argument('--budget-ms', type=float, help='api.index 累计导入耗时 p50 的上限，超出时退出码为 1')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    env = _environment(args.memory)
+    # 预热一次，让 .pyc 缓存就绪，之后的测量只反映导入本身
+    run_once(env)
+
+    wall_ms = []
+    import_ms = []
+    by_package = defaultdict(list)
+    for _ in range(args.runs):
+        wall, modules = run_once(env)
+        wall_ms.append(wall)
+        import_ms.append(modules[TARGET][1] / 1000)
+        totals = defaultdict(int)
+        for name, (self_us, _) in modules.items():
+            totals[name.split('.')[0]] += self_us
+        for package, self_us in totals.items():
+            by_package[package].append(self_us / 1000)
+
+    top = sorted(
+        ((package, sum(samples) / args.runs) for package, samples in by_package.items()),
+        key=lambda item: item[1], reverse=True
+    )[:args.top]
+    import_summary = summarize(import_ms)
+    results = {
+        'target': TARGET,
+        'database': 'memory' if args.memory else 'sqlite-file',
+        'runs': args.runs,
+        'process_wall': summarize(wall_ms),
+        'import': import_summary,
+        'top_packages_ms': {package: round(ms, 3) for package, ms in top},
+        'lazy_modules_loaded': lazy_modules_loaded(env),
+    }
+    if args.budget_ms is not None:
+        results['budget_ms'] = args.budget_ms
+        results['within_budget'] = import_summary['p50_ms'] <= args.budget_ms
+    emit('import', results, args.output)
+    if args.budget_ms is not None and not results['within_budget']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""测量不同连接池策略下的连接获取延迟与并发吞吐
+
+Usage:
+    python benchmarks/bench_pool.py --threads 1,8,32 --requests 200
+    BENCH_DATABASE_URL=postgresql://localhost/notes python benchmarks/bench_pool.py
+
+对每种策略（serverless 的 NullPool、server 的 QueuePool）和每个并发度，
+各线程循环执行“获取连接 → 执行一条按主键查询 → 归还连接”，
+分别统计获取连接的耗时分布与整体每秒请求数。引擎参数来自
+`src.services.database.build_engine_options`，与应用运行时一致。
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+import common  # noqa: F401  确保项目根目录在 sys.path 中
+from common import emit, summarize
+from src.services.database import build_engine_options, get_pool_stats
+
+MODES = ('serverless', 'server')
+
+
+def _database_url():
+    url = os.environ.get('BENCH_DATABASE_URL')
+    if url:
+        return url
+    path = os.path.join(tempfile.mkdtemp(prefix='notes-bench-'), 'pool.db')
+    return f'sqlite:///{path}'
+
+
+def prepare(url):
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS bench_pool (id INTEGER PRIMARY KEY, value VARCHAR(50))'))
+        conn.execute(text('DELETE FROM bench_pool'))
+        conn.execute(text('INSERT INTO bench_pool (id, value) VALUES (1, :value)'), {'value': 'x'})
+    engine.dispose()
+
+
+def run_mode(url, mode, threads, requests_per_thread):
+    engine = create_engine(url, **build_engine_options(url, mode))
+    stats = get_pool_stats(engine)
+    acquire_ms = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        samples = []
+        barrier.wait()
+        for _ in range(requests_per_thread):
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    acquired = time.perf_counter()
+                    conn.execute(text('SELECT value FROM bench_pool WHERE id = 1')).scalar()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            samples.append((acquired - started) * 1000)
+        with lock:
+            acquire_ms.extend(samples)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - started
+    engine.dispose()
+
+    return {
+        'mode': mode,
+        'threads': threads,
+        'requests': len(acquire_ms),
+        'errors': len(errors),
+        'requests_per_second': round(len(acquire_ms) / seconds, 1) if seconds else None,
+        'acquire': summarize(acquire_ms),
+        'pool': stats.snapshot()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', default='1,8,32', help='逗号分隔的并发线程数')
+    parser.add_argument('--requests', type=int, default=200, help='每个线程的请求数')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    url = _database_url()
+    prepare(url)
+    results = []
+    for mode in args.modes.split(','):
+        for threads in (int(t) for t in args.threads.split(',')):
+            results.append(run_mode(url, mode, threads, args.requests))
+    emit('pool', {'database': url.split('@')[-1], 'runs': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""相关笔记索引：建索引耗时、内存占用与查询延迟
+
+Usage:
+    python benchmarks/bench_related.py --sizes 10000,100000 --queries 200
+    python benchmarks/bench_related.py --sizes 100000 --dimensions 128
+
+对每个规模：写入笔记后从空索引做一次全量同步（即首次查询的冷启动成本），
+再对随机笔记测量 `RelatedNotesIndex.query` 的延迟（纯向量计算），
+以及 `GET /api/notes/<id>/related` 的端到端延迟（含增量同步检查与标题查询）。
+"""
+
+import argparse
+import os
+import random
+import time
+
+from common import create_app, emit, seed_notes, summarize, time_calls
+
+
+def bench_size(app, db, size, queries, dimensions, seed):
+    from src.models.note import Note
+    from src.services.related import RelatedNotesIndex
+    import src.services.related as related
+
+    with app.app_context():
+        existing = db.session.query(Note).count()
+        if existing < size:
+            seed_notes(db, size - existing, start=existing, content_words=60)
+        note_ids = list(db.session.execute(db.select(Note.id)).scalars())
+
+        index = RelatedNotesIndex(dimensions=dimensions)
+        started = time.perf_counter()
+        index.sync(force=True)
+        build_seconds = time.perf_counter() - started
+        # 首次查询还会计算 IDF 与全部行范数
+        started = time.perf_counter()
+        index.query(note_ids[0])
+        weights_ms = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(seed)
+        sample = [(rng.choice(note_ids),) for _ in range(queries)]
+        query_ms = time_calls(index.query, sample)
+
+    # 端到端：让接口使用这个已建好的索引
+    related._index = index
+    client = app.test_client()
+    http_ms = time_calls(lambda note_id: client.get(f'/api/notes/{note_id}/related'), sample)
+
+    return {
+        'notes': size,
+        'dimensions': dimensions,
+        'matrix_bytes': index.stats()['matrix_bytes'],
+        'build_seconds': round(build_seconds, 3),
+        'first_query_ms': round(weights_ms, 3),
+        'query': summarize(query_ms),
+        'http': summarize(http_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--dimensions', type=int, default=int(os.environ.get('RELATED_DIMENSIONS', 256)))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app, db = create_app()
+    results = [
+        bench_size(app, db, int(size), args.queries, args.dimensions, args.seed)
+        for size in sorted(int(s) for s in args.sizes.split(',') if s)
+    ]
+    emit('related', {'database': os.environ['DATABASE_URL'].split('@')[-1], 'sizes': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""对比 LIKE 子串匹配与全文索引的检索延迟
+
+Usage:
+    python benchmarks/bench_search.py --sizes 10000,100000,1000000 --queries 50
+
+数据库逐级扩容到每个规模后，分别用 LIKE 后端和当前方言的全文后端执行相同的查询集合。
+设置 BENCH_DATABASE_URL 可改为在 PostgreSQL 上测试。
+"""
+
+import argparse
+import random
+
+from common import WORDS, create_app, emit, rare_word, seed_notes, summarize, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    app, db = create_app()
+    from src.services.search import LikeSearchBackend, get_search_backend
+
+    # 查询集合混合高频词与长尾词，长尾词的命中数随数据规模线性增长
+    rng = random.Random(7)
+    queries = [
+        rng.choice(WORDS) if i % 5 == 0 else rare_word(rng.randint(20, 2000))
+        for i in range(args.queries)
+    ]
+    results = []
+    seeded = 0
+    with app.app_context():
+        like_backend = LikeSearchBackend()
+        fts_backend = get_search_backend()
+        for size in (int(s) for s in args.sizes.split(',')):
+            seed_notes(db, size - seeded, start=seeded)
+            seeded = size
+            entry = {'notes': size}
+            for backend in (like_backend, fts_backend):
+                samples = time_calls(
+                    lambda q: backend.search(q, args.limit, 0),
+                    [(q,) for q in queries]
+                )
+                entry[backend.name] = summarize(samples)
+            results.append(entry)
+            db.session.remove()
+
+    emit('search', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
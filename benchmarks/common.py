@@ -0,0 +1,136 @@
+"""基准测试公共工具
+
+所有基准脚本都通过 `create_app()` 获取 Flask 应用：它会在导入 `src.main`
+之前设置好 DATABASE_URL（默认使用临时目录下的 SQLite 文件）并建表，
+结果统一以 JSON 输出，便于在不同提交之间比较。
+"""
+
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 生成测试笔记用的词表，混合中英文以覆盖两类分词场景
+WORDS = (
+    'python flask database index query cursor latency throughput cache network '
+    'project meeting schedule budget report design review release deploy server '
+    'client request response token model prompt summary translate quiz answer'
+).split()
+PHRASES = ('机器学习', '数据库', '项目进度', '会议纪要', '性能优化', '知识总结', '翻译练习', '读书笔记')
+# 长尾词表规模：词频近似 Zipf 分布，让查询具有真实的选择性
+RARE_VOCABULARY = 50000
+
+
+def rare_word(rank):
+    return f'topic{rank:05d}'
+
+
+def create_app(database_url=None):
+    """设置数据库地址后导入应用，返回 (app, db)"""
+    if database_url is None:
+        database_url = os.environ.get('BENCH_DATABASE_URL')
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='notes-bench-'), 'bench.db')
+        database_url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = database_url
+
+    from src.main import app, init_database
+    from src.models.user import db
+    init_database()
+    return app, db
+
+
+def random_text(rng, words):
+    parts = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.15:
+            parts.append(rng.choice(PHRASES))
+        elif roll < 0.35:
+            parts.append(rare_word(int(rng.paretovariate(1.0)) % RARE_VOCABULARY))
+        else:
+            parts.append(rng.choice(WORDS))
+    return ' '.join(parts)
+
+
+def make_note_rows(count, start=0, seed=42, content_words=120):
+    """生成批量插入用的笔记行，时间戳递增以模拟真实的更新顺序"""
+    rng = random.Random(seed + start)
+    base = datetime(2025, 1, 1)
+    rows = []
+    for i in range(start, start + count):
+        stamp = base + timedelta(seconds=i)
+        rows.append({
+            'title': random_text(rng, 4),
+            'content': random_text(rng, content_words),
+            'created_at': stamp,
+            'updated_at': stamp
+        })
+    return rows
+
+
+def seed_notes(db, count, start=0, batch_size=5000, **kwargs):
+    """分批插入 count 条笔记"""
+    from sqlalchemy import insert
+    from src.models.note import Note
+
+    inserted = 0
+    while inserted < count:
+        size = min(batch_size, count - inserted)
+        db.session.execute(insert(Note), make_note_rows(size, start=start + inserted, **kwargs))
+        db.session.commit()
+        inserted += size
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    """把耗时样本（毫秒）汇总为统计指标"""
+    return {
+        'count': len(samples_ms),
+        'mean_ms': round(statistics.fmean(samples_ms), 3) if samples_ms else None,
+        'p50_ms': round(percentile(samples_ms, 50), 3) if samples_ms else None,
+        'p95_ms': round(percentile(samples_ms, 95), 3) if samples_ms else None,
+        'p99_ms': round(percentile(samples_ms, 99), 3) if samples_ms else None,
+        'max_ms': round(max(samples_ms), 3) if samples_ms else None
+    }
+
+
+def time_calls(func, args_list):
+    """依次执行 func(*args)，返回每次耗时（毫秒）"""
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def emit(name, results, output=None):
+    """输出 JSON 结果；指定 output 时同时写入文件"""
+    payload = {
+        'benchmark': name,
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': sys.version.split()[0],
+        'results': results
+    }
+    text = json.dumps(payload, ensure_ascii=False, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    return payload
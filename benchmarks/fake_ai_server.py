@@ -0,0 +1,246 @@
+"""本地 OpenAI 兼容的假模型服务
+
+实现 `POST .../chat/completions`（普通与 stream=True 两种模式），
+返回确定性的内容，便于在没有网络和 GITHUB_TOKEN 的情况下调试流式接口和跑基准测试。
+可按比例注入 429（带 Retry-After）、503 和挂起不响应的请求，模拟上游限流、故障与超时。
+
+Usage:
+    python benchmarks/fake_ai_server.py --port 8765 --latency 0.5 --token-delay 0.02
+    python benchmarks/fake_ai_server.py --rate-limit-rate 0.1 --timeout-rate 0.05 --hang-seconds 30
+    python benchmarks/fake_ai_server.py --server-error-rate 1.0   # 模拟上游完全不可用
+
+    # 另一个终端中让应用指向它
+    GITHUB_TOKEN=dummy GITHUB_AI_ENDPOINT=http://127.0.0.1:8765/v1 python src/main.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EXTRACTION_TEMPLATE = """📋 **主要内容摘要**
+{summary}
+
+🔑 **关键要点**
+- 要点一
+- 要点二
+- 要点三
+
+📊 **重要数据/信息**
+无
+
+🎯 **行动项/任务**
+无
+
+💡 **关键洞察**
+这是本地假模型生成的结果。"""
+
+QUIZ_RESPONSE = {
+    "question": "以下哪一项是本地假模型返回的答案？",
+    "options": [
+        {"label": "A", "text": "选项A"},
+        {"label": "B", "text": "选项B"},
+        {"label": "C", "text": "选项C"},
+        {"label": "D", "text": "选项D"}
+    ],
+    "answer": "A",
+    "explanation": "假模型总是选择A。"
+}
+
+
+class FakeModelOptions:
+    """可在运行中调整的假模型行为"""
+
+    def __init__(self, latency=0.0, token_delay=0.0, chunk_size=8,
+                 rate_limit_rate=0.0, retry_after=1, timeout_rate=0.0, hang_seconds=30.0,
+                 server_error_rate=0.0, seed=None):
+        self.latency = latency  # 首个 token 之前的等待时间（秒）
+        self.token_delay = token_delay  # 流式模式下每个分块之间的间隔（秒）
+        self.chunk_size = chunk_size  # 流式模式下每个分块的字符数
+        self.rate_limit_rate = rate_limit_rate  # 以该比例返回 429
+        self.retry_after = retry_after  # 429 响应的 Retry-After 秒数
+        self.timeout_rate = timeout_rate  # 以该比例挂起 hang_seconds 秒后才响应，模拟上游超时
+        self.hang_seconds = hang_seconds
+        self.server_error_rate = server_error_rate  # 以该比例返回 503
+        self.requests = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.server_errors = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def pick_fault(self):
+        """按配置的比例决定本次请求注入的故障：'429'、'5xx'、'timeout' 或 None"""
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                return '429'
+            roll -= self.rate_limit_rate
+            if roll < self.server_error_rate:
+                self.server_errors += 1
+                return '5xx'
+            if roll < self.server_error_rate + self.timeout_rate:
+                self.timeouts += 1
+                return 'timeout'
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'rate_limited': self.rate_limited,
+                    'server_errors': self.server_errors, 'timeouts': self.timeouts}
+
+
+def build_reply(messages):
+    """根据提示词类型返回确定性的回复文本"""
+    prompt = messages[-1]['content'] if messages else ''
+    if 'json.loads' in prompt:
+        return json.dumps(QUIZ_RESPONSE, ensure_ascii=False)
+    if '翻译为' in prompt:
+        original = prompt.split('原文：', 1)[-1].split('请仅输出翻译后的文本。', 1)[0].strip()
+        return f'[translated] {original}'
+    summary = prompt.split('文档内容：', 1)[-1].split('请用中文回答', 1)[0].strip()[:80]
+    return EXTRACTION_TEMPLATE.format(summary=summary)
+
+
+def make_handler(options):
+    class FakeModelHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+
+            fault = options.pick_fault()
+            if fault == '429':
+                self._rate_limited()
+                return
+            if fault == '5xx':
+                self._error(503, {'message': 'Service unavailable', 'type': 'server_error'})
+                return
+            if fault == 'timeout':
+                time.sleep(options.hang_seconds)
+
+            reply = build_reply(body.get('messages', []))
+            time.sleep(options.latency)
+            try:
+                if body.get('stream'):
+                    self._stream(body, reply)
+                else:
+                    self._complete(body, reply)
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端已超时断开（模拟超时时的正常情况）
+                pass
+
+        def _rate_limited(self):
+            self._error(429, {'message': 'Rate limit exceeded', 'type': 'rate_limit_error', 'code': 'rate_limit_exceeded'},
+                        {'Retry-After': str(options.retry_after)})
+
+        def _error(self, status, error, headers=None):
+            payload = json.dumps({'error': error}).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _complete(self, body, reply):
+            payload = json.dumps({
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': reply},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {
+                    'prompt_tokens': sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4,
+                    'completion_tokens': len(reply) // 4,
+                    'total_tokens': 0
+                }
+            }, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, body, reply):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+            chunks = [reply[i:i + options.chunk_size] for i in range(0, len(reply), options.chunk_size)]
+            for index, text in enumerate(chunks + [None]):
+                if index:
+                    time.sleep(options.token_delay)
+                chunk = {
+                    'id': completion_id,
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': body.get('model', 'fake'),
+                    'choices': [{
+                        'index': 0,
+                        'delta': {'content': text} if text is not None else {},
+                        'finish_reason': None if text is not None else 'stop'
+                    }]
+                }
+                self.wfile.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+
+    return FakeModelHandler
+
+
+def start_fake_server(port=0, **kwargs):
+    """在后台线程启动假模型服务，返回 (server, options, base_url)"""
+    options = FakeModelOptions(**kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(options))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, options, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local OpenAI-compatible fake model server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='首个 token 前的等待秒数')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='流式分块之间的间隔秒数')
+    parser.add_argument('--chunk-size', type=int, default=8)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='返回 429 的请求比例')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 响应的 Retry-After 秒数')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='返回 503 的请求比例')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='挂起不响应的请求比例')
+    parser.add_argument('--hang-seconds', type=float, default=30.0, help='模拟超时时挂起的秒数')
+    args = parser.parse_args()
+
+    server, _, base_url = start_fake_server(
+        args.port, latency=args.latency, token_delay=args.token_delay, chunk_size=args.chunk_size,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        server_error_rate=args.server_error_rate, timeout_rate=args.timeout_rate, hang_seconds=args.hang_seconds
+    )
+    print(f'Fake model server listening on {base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
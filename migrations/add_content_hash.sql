@@ -0,0 +1,9 @@
+-- Migration: Track which content version derived AI data was generated from
+-- Date: 2026-10-17
+-- Description: note.content_hash is the sha256 of the trimmed note content; each derived artifact stores the hash of the content it was generated from.
+-- Existing notes get their content_hash from migrate_content_hash.py. Artifacts created before this migration have no source hash and are reported as stale.
+
+ALTER TABLE note ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE note ADD COLUMN IF NOT EXISTS extracted_source_hash VARCHAR(64);
+ALTER TABLE note_translation ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
+ALTER TABLE note_quiz ADD COLUMN IF NOT EXISTS source_hash VARCHAR(64);
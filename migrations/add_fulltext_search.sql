@@ -0,0 +1,14 @@
+-- Migration: Add full-text search index for PostgreSQL
+-- Date: 2026-10-17
+-- Description: GET /api/notes/search ranks matches with a tsvector generated column and GIN index.
+-- The app also creates these objects on startup; run this manually on large tables to control when the rewrite happens.
+
+ALTER TABLE note ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_note_search_vector ON note USING GIN (search_vector);
+
+COMMENT ON COLUMN note.search_vector IS 'Full-text search vector (title weight A, content weight B), maintained by PostgreSQL';
@@ -0,0 +1,5 @@
+-- Migration: Add composite index for keyset-paginated note listing
+-- Date: 2026-10-17
+-- Description: GET /api/notes?limit=... pages by (updated_at, id); this index turns every page into an index range scan
+
+CREATE INDEX IF NOT EXISTS ix_note_updated_at_id ON note (updated_at, id);
@@ -0,0 +1,11 @@
+-- Migration: Add deletion tombstones for incremental sync
+-- Date: 2026-10-17
+-- Description: GET /api/notes/changes reports deleted notes from this table; rows older than NOTE_TOMBSTONE_RETENTION_DAYS are purged by the app
+
+CREATE TABLE IF NOT EXISTS note_tombstone (
+    id SERIAL PRIMARY KEY,
+    note_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_note_tombstone_deleted_at_id ON note_tombstone (deleted_at, id);
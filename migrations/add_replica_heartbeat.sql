@@ -0,0 +1,8 @@
+-- Migration: Add the replica heartbeat table
+-- Date: 2026-10-17
+-- Description: with DATABASE_REPLICA_URLS set, the app writes the current time into this single-row table on the primary and reads it back from each replica to bound replication lag
+
+CREATE TABLE IF NOT EXISTS replica_heartbeat (
+    id INTEGER PRIMARY KEY,
+    beat_at TIMESTAMP NOT NULL
+);
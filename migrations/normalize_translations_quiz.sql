@@ -0,0 +1,29 @@
+-- Migration: Move translations and quiz data into child tables
+-- Date: 2026-10-17
+-- Description: note.translations (JSON) becomes one note_translation row per language and the quiz_* columns move to note_quiz.
+--              Run migrate_normalize_note_children.py afterwards to backfill existing notes in batches.
+
+CREATE TABLE IF NOT EXISTS note_translation (
+    note_id INTEGER NOT NULL REFERENCES note (id) ON DELETE CASCADE,
+    language VARCHAR(50) NOT NULL,
+    text TEXT NOT NULL,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (note_id, language)
+);
+
+CREATE TABLE IF NOT EXISTS note_quiz (
+    note_id INTEGER PRIMARY KEY REFERENCES note (id) ON DELETE CASCADE,
+    question TEXT,
+    options TEXT,
+    answer VARCHAR(50),
+    explanation TEXT,
+    generated_at TIMESTAMP
+);
+
+-- After the backfill has been verified, the legacy columns can be dropped:
+-- ALTER TABLE note DROP COLUMN IF EXISTS translations;
+-- ALTER TABLE note DROP COLUMN IF EXISTS quiz_question;
+-- ALTER TABLE note DROP COLUMN IF EXISTS quiz_options;
+-- ALTER TABLE note DROP COLUMN IF EXISTS quiz_answer;
+-- ALTER TABLE note DROP COLUMN IF EXISTS quiz_explanation;
+-- ALTER TABLE note DROP COLUMN IF EXISTS quiz_generated_at;
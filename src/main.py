@@ -1,71 +1,161 @@
 import os
 import sys
 import tempfile
+import click
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.note import note_bp
-from src.models.note import Note
+from src.routes.system import system_bp
+from src.routes.job import job_bp
+from src.models.note import Note, NoteTombstone
+from src.models.ai_cache import AIResultCache
+from src.models.job import AIJob
+from src.models.replica import ReplicaHeartbeat
+from src.services import compression, metrics, replicas
+from src.services.database import configure_database, instrument_pool, resolve_database_url, resolve_replica_urls
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdfFGSgvasgf5WGT'
 
 # Enable CORS for all routes
 CORS(app)
+# 按 Accept-Encoding 压缩 JSON / 文本响应（含流式响应）
+compression.init_app(app)
 
 # register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(note_bp, url_prefix='/api')
-print('Registered blueprints: user_bp={}, note_bp={}'.format(bool(user_bp), bool(note_bp)))
+app.register_blueprint(system_bp, url_prefix='/api')
+app.register_blueprint(job_bp, url_prefix='/api')
+print('Registered blueprints: user_bp={}, note_bp={}, system_bp={}, job_bp={}'.format(
+    bool(user_bp), bool(note_bp), bool(system_bp), bool(job_bp)))
 # Configure database URI:
 # - Use DATABASE_URL environment variable (recommended for production).
 # - If DATABASE_URL is not set, fall back to an in-memory SQLite DB and
 #   log a clear warning. We intentionally do NOT create files on disk so
 #   this code is safe to run in read-only serverless environments like Vercel.
 ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-database_url = os.getenv('DATABASE_URL')
-if database_url:
-    # support older postgres:// prefix
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-else:
+database_url = resolve_database_url()
+if not database_url:
     # No DATABASE_URL provided — use in-memory SQLite (ephemeral).
     # Log a prominent warning so deployers know to set DATABASE_URL for production.
     print('Warning: DATABASE_URL not set; using in-memory SQLite. Configure DATABASE_URL to use a persistent remote database.')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-print(f"SQLALCHEMY_DATABASE_URI = {app.config.get('SQLALCHEMY_DATABASE_URI')}")
+    database_url = 'sqlite:///:memory:'
+# 连接池策略按部署形态选择（serverless 用 NullPool，常驻进程用带 pre-ping 的 QueuePool）
+# DATABASE_REPLICA_URLS 中的只读副本注册为额外的 bind
+configure_database(app, database_url, replica_uris=resolve_replica_urls())
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
-try:
+with app.app_context():
+    # 连接池计数器（/api/system/db-pool）需要在第一个连接之前挂载
+    instrument_pool(db.engine)
+    # 每个路由的耗时、SQL 次数/耗时，经 /api/metrics 输出
+    metrics.init_app(app, db.engine)
+    # 读请求路由到复制延迟在上限内的副本，写请求及其后的读取留在主库
+    router = replicas.init_app(app, db)
+    for replica in (router.replicas if router else ()):
+        instrument_pool(replica.engine)
+        metrics.instrument_engine(replica.engine)
+
+
+def init_database():
+    """创建缺失的表并安装全文索引；可重复执行，返回生效的搜索后端"""
     with app.app_context():
         db.create_all()
-        print('db.create_all() completed')
-except Exception as e:
-    print('Exception during db.create_all():')
-    import traceback
-    traceback.print_exc()
+        # 全文索引依赖数据库方言特有的虚拟表/生成列，需在建表后单独安装
+        from src.services.search import install_search_index
+        return install_search_index(db.engine)
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and the full-text search index."""
+    backend = init_database()
+    click.echo(f'Database initialized (search backend: {backend.name})')
+
+
+@app.cli.command('export-notes')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+def export_notes_command(path):
+    """Export every note as NDJSON to PATH ('-' for stdout, '.gz' to compress)."""
+    import gzip
+    from src.services.note_transfer import export_chunks
+
+    with app.app_context():
+        if path == '-':
+            for chunk in export_chunks():
+                click.echo(chunk, nl=False)
+            return
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            for chunk in export_chunks():
+                f.write(chunk)
+    click.echo(f'Exported notes to {path}', err=True)
+
+
+@app.cli.command('import-notes')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--preserve-ids', is_flag=True, help='Keep the ids from the file (restore into an empty database).')
+@click.option('--batch-size', default=1000, show_default=True, help='Notes written per transaction.')
+def import_notes_command(path, preserve_ids, batch_size):
+    """Import notes from an NDJSON file written by export-notes ('-' for stdin, '.gz' supported)."""
+    import gzip
+    from src.services.note_transfer import ImportFailed, import_notes
+
+    with app.app_context():
+        if path == '-':
+            source = click.get_binary_stream('stdin')
+        else:
+            source = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+        try:
+            result = import_notes(source, preserve_ids=preserve_ids, batch_size=batch_size)
+        except ImportFailed as e:
+            raise click.ClickException(
+                f'Import stopped after {e.result["imported"]} notes: {e.error}'
+            )
+        finally:
+            if path != '-':
+                source.close()
+    for error in result['errors']:
+        click.echo(f'line {error["line"]}: {error["error"]}', err=True)
+    click.echo(f'Imported {result["imported"]} notes in {result["batches"]} batches '
+               f'({result["method"]}), skipped {result["skipped"]} lines')
+
+# 导入时不再建表：冷启动只加载代码，持久化数据库的表结构由 `flask --app src.main init-db`
+# 或 migrations/ 中的脚本一次性创建。内存 SQLite 每个进程都是空库，仍需在导入时建表；
+# 设置 DB_AUTO_CREATE=1 可在其他数据库上恢复导入时建表（便于本地开发）。
+if database_url == 'sqlite:///:memory:' or os.environ.get('DB_AUTO_CREATE') == '1':
+    try:
+        init_database()
+    except Exception as e:
+        print('Exception during database initialization:')
+        import traceback
+        traceback.print_exc()
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
+    """静态文件与 SPA 回落：从启动后构建的清单中查找，未知路径返回 index.html"""
     static_folder_path = app.static_folder
     if static_folder_path is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    from src.services.static_assets import get_manifest
 
+    manifest = get_manifest(static_folder_path)
+    asset = manifest.get(path) if path != "" else None
+    if asset is None:
+        asset = manifest.get('index.html')
+        if asset is None:
+            return "index.html not found", 404
+    return manifest.response(asset)
 
 if __name__ == '__main__':
+    # 本地直接运行时顺带建表，避免首次使用 SQLite 文件库时还需单独初始化
+    init_database()
     app.run(host='0.0.0.0', port=5001, debug=True)
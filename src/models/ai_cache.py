@@ -0,0 +1,18 @@
+from datetime import datetime
+from src.models.types import CompressedText
+from src.models.user import db
+
+
+class AIResultCache(db.Model):
+    """AI 调用结果的持久化缓存，跨进程/冷启动复用"""
+
+    __tablename__ = 'ai_result_cache'
+
+    cache_key = db.Column(db.String(64), primary_key=True)  # 内容寻址的 sha256 键
+    operation = db.Column(db.String(32), nullable=False)  # extract / translate / quiz
+    value = db.Column(CompressedText, nullable=False)  # JSON 序列化后的结果，较长时压缩存储
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # 过期时间，为空表示永不过期
+
+    def __repr__(self):
+        return f'<AIResultCache {self.operation} {self.cache_key[:12]}>'
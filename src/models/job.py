@@ -0,0 +1,60 @@
+import json
+import uuid
+from datetime import datetime
+from src.models.user import db
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+class AIJob(db.Model):
+    """异步执行的 AI 任务（提取/翻译/出题）"""
+
+    __tablename__ = 'ai_job'
+    __table_args__ = (
+        # worker 按创建顺序领取排队中的任务
+        db.Index('ix_ai_job_status_created_at', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    operation = db.Column(db.String(32), nullable=False)  # extract / translate / quiz
+    note_id = db.Column(db.Integer, nullable=True)  # 完成后写回的笔记，可为空
+    payload = db.Column(db.Text, nullable=False)  # JSON 格式的任务参数
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    result = db.Column(db.Text, nullable=True)  # JSON 格式的执行结果
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<AIJob {self.operation} {self.id} {self.status}>'
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def to_dict(self):
+        """输出任务状态及耗时（毫秒）"""
+        def _ms(start, end):
+            if start is None or end is None:
+                return None
+            return int((end - start).total_seconds() * 1000)
+
+        return {
+            'id': self.id,
+            'operation': self.operation,
+            'note_id': self.note_id,
+            'status': self.status,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'queue_ms': _ms(self.created_at, self.started_at),
+            'run_ms': _ms(self.started_at, self.finished_at)
+        }
@@ -1,53 +1,302 @@
+import hashlib
 import json
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import and_, delete, exists, insert
+from sqlalchemy.orm import column_property, load_only, selectinload, validates
+from src.models.types import CompressedText
 from src.models.user import db
 
+
+def content_hash(content):
+    """正文的 sha256 摘要；AI 接口会去掉首尾空白再处理，因此摘要也按去掉首尾空白后的内容计算"""
+    return hashlib.sha256((content or '').strip().encode('utf-8')).hexdigest()
+
+
 class Note(db.Model):
+    __table_args__ = (
+        # 列表页按 (updated_at, id) 做游标分页，复合索引保证每页都是索引范围扫描
+        db.Index('ix_note_updated_at_id', 'updated_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    extracted_info = db.Column(db.Text, nullable=True)  # 存储AI提取的信息
+    content_hash = db.Column(db.String(64), nullable=True)  # 正文摘要，随 content 的每次写入更新
+    extracted_info = db.Column(CompressedText, nullable=True)  # 存储AI提取的信息（较长时压缩存储）
     extracted_at = db.Column(db.DateTime, nullable=True)  # 信息提取时间
-    translations = db.Column(db.Text, nullable=True)  # 以JSON格式存储多语言翻译结果
+    extracted_source_hash = db.Column(db.String(64), nullable=True)  # 提取时所用正文的摘要
     translation_updated_at = db.Column(db.DateTime, nullable=True)  # 最近一次翻译更新时间
-    quiz_question = db.Column(db.Text, nullable=True)  # 存储自动生成的题干
-    quiz_options = db.Column(db.Text, nullable=True)  # 以JSON格式存储多项选择题选项
-    quiz_answer = db.Column(db.String(50), nullable=True)  # 存储正确答案标识
-    quiz_explanation = db.Column(db.Text, nullable=True)  # 存储答案解析
-    quiz_generated_at = db.Column(db.DateTime, nullable=True)  # 最近一次题目生成时间
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # 翻译与题目存放在子表中，只有输出对应字段时才加载
+    translation_rows = db.relationship(
+        'NoteTranslation', lazy='select', cascade='all, delete-orphan', order_by='NoteTranslation.language'
+    )
+    quiz = db.relationship('NoteQuiz', uselist=False, lazy='select', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Note {self.title}>'
+
+    @validates('content')
+    def _track_content_hash(self, key, value):
+        # ORM 写入正文（构造、赋值）时同步更新摘要；批量 insert/update 语句需自行传入 content_hash
+        self.content_hash = content_hash(value)
+        return value
     
-    def to_dict(self):
-        """以字典形式对外输出笔记数据，便于前端直接消费"""
-        try:
-            translation_data = json.loads(self.translations) if self.translations else {}
-        except json.JSONDecodeError:
-            translation_data = {}
-
-        try:
-            quiz_options = json.loads(self.quiz_options) if self.quiz_options else []
-        except json.JSONDecodeError:
-            quiz_options = []
+    def get_translations(self):
+        """返回 语言 -> 译文 的字典"""
+        return {row.language: row.text for row in self.translation_rows}
 
+    def fresh_extracted_info(self, source_hash):
+        """已保存的提取结果基于 source_hash 对应的正文时返回它，否则返回 None"""
+        if self.extracted_info and self.extracted_source_hash == source_hash:
+            return self.extracted_info
+        return None
+
+    def fresh_translations(self, languages, source_hash):
+        """返回 languages 中已基于 source_hash 对应正文生成的译文（语言 -> 译文）"""
+        rows = NoteTranslation.query.filter(
+            NoteTranslation.note_id == self.id,
+            NoteTranslation.language.in_(list(languages)),
+            NoteTranslation.source_hash == source_hash
+        )
+        return {row.language: row.text for row in rows}
+
+    def fresh_quiz(self, source_hash):
+        """已保存的题目基于 source_hash 对应的正文时返回与生成接口相同结构的字典，否则返回 None"""
+        quiz = db.session.get(NoteQuiz, self.id)
+        if quiz is None or not quiz.question or quiz.source_hash != source_hash:
+            return None
         return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'extracted_info': self.extracted_info,
-            'extracted_at': self.extracted_at.isoformat() if self.extracted_at else None,
-            'translations': translation_data,
-            'translation_updated_at': self.translation_updated_at.isoformat() if self.translation_updated_at else None,
-            'quiz_question': self.quiz_question,
-            'quiz_options': quiz_options,
-            'quiz_answer': self.quiz_answer,
-            'quiz_explanation': self.quiz_explanation,
-            'quiz_generated_at': self.quiz_generated_at.isoformat() if self.quiz_generated_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'question': quiz.question,
+            'options': NoteQuiz.serialize_field(quiz, 'quiz_options'),
+            'answer': quiz.answer,
+            'explanation': quiz.explanation,
+        }
+
+    def apply_extracted_info(self, extracted_info, source_hash=None):
+        """保存AI提取的关键信息；source_hash 为生成时所用正文的摘要"""
+        self.extracted_info = extracted_info
+        self.extracted_at = datetime.utcnow()
+        self.extracted_source_hash = source_hash
+
+    def apply_translation(self, language, translation, source_hash=None):
+        """保存单个语言的翻译"""
+        self.apply_translations({language: translation}, source_hash)
+
+    def apply_translations(self, new_translations, source_hash=None):
+        """按语言逐行写入翻译，只读写涉及的语言，不改动其他语言的译文"""
+        now = datetime.utcnow()
+        existing = {
+            row.language: row for row in NoteTranslation.query.filter(
+                NoteTranslation.note_id == self.id,
+                NoteTranslation.language.in_(list(new_translations))
+            )
         }
+        for language, text in new_translations.items():
+            row = existing.get(language)
+            if row is None:
+                db.session.add(NoteTranslation(
+                    note_id=self.id, language=language, text=text, updated_at=now, source_hash=source_hash
+                ))
+            else:
+                row.text = text
+                row.updated_at = now
+                row.source_hash = source_hash
+        # 已加载的翻译集合不包含新增的行，使其在下次访问时重新加载
+        db.session.expire(self, ['translation_rows'])
+        self.translation_updated_at = now
+        self.updated_at = now
+
+    def apply_quiz(self, quiz_payload, source_hash=None):
+        """保存AI生成的选择题"""
+        quiz = db.session.get(NoteQuiz, self.id)
+        if quiz is None:
+            quiz = NoteQuiz(note_id=self.id)
+            db.session.add(quiz)
+        quiz.question = quiz_payload.get('question')
+        quiz.options = json.dumps(quiz_payload.get('options', []), ensure_ascii=False)
+        quiz.answer = quiz_payload.get('answer')
+        quiz.explanation = quiz_payload.get('explanation')
+        quiz.generated_at = datetime.utcnow()
+        quiz.source_hash = source_hash
+        db.session.expire(self, ['quiz'])
+        self.updated_at = datetime.utcnow()
+
+    def to_dict(self, fields=None):
+        """以字典形式对外输出笔记数据，便于前端直接消费
+
+        Args:
+            fields: 可选的字段名序列；只序列化其中的字段，
+                    配合 note_load_options 使用时不会触发未加载列或子表的懒加载
+        """
+        wanted = NOTE_FIELDS if fields is None else fields
+        return {name: self._serialize_field(name) for name in wanted}
+
+    def _serialize_field(self, name):
+        """按字段类型转换为 JSON 友好的值"""
+        if name == 'translations':
+            return self.get_translations()
+        if name in QUIZ_FIELDS:
+            return NoteQuiz.serialize_field(self.quiz, name)
+        value = getattr(self, name)
+        if name in STALE_FIELDS:
+            return bool(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+
+class NoteTranslation(db.Model):
+    """笔记的单个语言翻译，每个 (笔记, 语言) 一行"""
+
+    __tablename__ = 'note_translation'
+
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True)
+    language = db.Column(db.String(50), primary_key=True)
+    text = db.Column(CompressedText, nullable=False)  # 较长时压缩存储
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    source_hash = db.Column(db.String(64), nullable=True)  # 翻译时所用正文的摘要
+
+    def __repr__(self):
+        return f'<NoteTranslation {self.note_id} {self.language}>'
+
+
+class NoteQuiz(db.Model):
+    """笔记的AI选择题，每篇笔记至多一道"""
+
+    __tablename__ = 'note_quiz'
+
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True)
+    question = db.Column(db.Text, nullable=True)  # 题干
+    options = db.Column(db.Text, nullable=True)  # 以JSON格式存储多项选择题选项
+    answer = db.Column(db.String(50), nullable=True)  # 正确答案标识
+    explanation = db.Column(db.Text, nullable=True)  # 答案解析
+    generated_at = db.Column(db.DateTime, nullable=True)  # 最近一次题目生成时间
+    source_hash = db.Column(db.String(64), nullable=True)  # 出题时所用正文的摘要
+
+    def __repr__(self):
+        return f'<NoteQuiz {self.note_id}>'
+
+    @staticmethod
+    def serialize_field(quiz, name):
+        """按笔记对外的 quiz_* 字段名输出，笔记尚无题目时返回空值"""
+        if name == 'quiz_options':
+            try:
+                return json.loads(quiz.options) if quiz and quiz.options else []
+            except json.JSONDecodeError:
+                return []
+        if quiz is None:
+            return None
+        value = getattr(quiz, name[len('quiz_'):])
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+
+class NoteTombstone(db.Model):
+    """已删除笔记的墓碑记录，供增量同步接口告知客户端删除了哪些笔记"""
+
+    __tablename__ = 'note_tombstone'
+    __table_args__ = (
+        # 增量同步按 (deleted_at, id) 顺序读取墓碑
+        db.Index('ix_note_tombstone_deleted_at_id', 'deleted_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, nullable=False)  # 被删除笔记的 id
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NoteTombstone {self.note_id}>'
+
+    @classmethod
+    def record(cls, note_ids):
+        """在当前事务中为一组被删除的笔记写入墓碑"""
+        if not note_ids:
+            return
+        now = datetime.utcnow()
+        db.session.execute(insert(cls), [{'note_id': note_id, 'deleted_at': now} for note_id in note_ids])
+
+    @classmethod
+    def purge_expired(cls, retention):
+        """删除早于保留期限的墓碑，返回删除的条数"""
+        deadline = datetime.utcnow() - retention
+        return db.session.execute(
+            delete(cls).where(cls.deleted_at < deadline).execution_options(synchronize_session=False)
+        ).rowcount
+
+
+# 派生数据是否过期：数据存在且生成时的正文摘要与当前摘要不同（旧数据没有摘要，同样视为过期）
+# 由数据库计算，三个标志属于同一延迟加载组，首次访问时一条查询取回
+Note.extracted_stale = column_property(
+    and_(Note.extracted_info.isnot(None), Note.extracted_source_hash.is_distinct_from(Note.content_hash)),
+    deferred=True, group='staleness'
+)
+Note.translations_stale = column_property(
+    exists().where(
+        NoteTranslation.note_id == Note.id,
+        NoteTranslation.source_hash.is_distinct_from(Note.content_hash)
+    ),
+    deferred=True, group='staleness'
+)
+Note.quiz_stale = column_property(
+    exists().where(
+        NoteQuiz.note_id == Note.id,
+        NoteQuiz.source_hash.is_distinct_from(Note.content_hash)
+    ),
+    deferred=True, group='staleness'
+)
+STALE_FIELDS = ('extracted_stale', 'translations_stale', 'quiz_stale')
+
+
+# to_dict() 默认输出的字段及顺序
+NOTE_FIELDS = (
+    'id',
+    'title',
+    'content',
+    'content_hash',
+    'extracted_info',
+    'extracted_at',
+    'extracted_stale',
+    'translations',
+    'translation_updated_at',
+    'translations_stale',
+    'quiz_question',
+    'quiz_options',
+    'quiz_answer',
+    'quiz_explanation',
+    'quiz_generated_at',
+    'quiz_stale',
+    'created_at',
+    'updated_at',
+)
+
+
+# 由子表提供的字段
+QUIZ_FIELDS = ('quiz_question', 'quiz_options', 'quiz_answer', 'quiz_explanation', 'quiz_generated_at')
+RELATED_FIELDS = ('translations', *QUIZ_FIELDS)
+
+
+def note_load_options(fields, always=('id', 'updated_at')):
+    """为只输出 fields 的查询生成加载选项
+
+    只加载需要的列；请求了翻译或题目字段时用 selectinload 一次性加载整页的子表行，
+    避免逐条懒加载。
+    """
+    columns = {*always, *(name for name in fields if name in NOTE_FIELDS and name not in RELATED_FIELDS)}
+    options = [load_only(*(getattr(Note, name) for name in columns))]
+    if 'translations' in fields:
+        options.append(selectinload(Note.translation_rows))
+    if any(name in QUIZ_FIELDS for name in fields):
+        options.append(selectinload(Note.quiz))
+    return options
+
 
+def delete_note_children(note_ids):
+    """在当前事务中删除一组笔记的翻译与题目（按 id 批量删除笔记时不会触发 ORM 级联）"""
+    for model in (NoteTranslation, NoteQuiz):
+        db.session.execute(
+            delete(model).where(model.note_id.in_(note_ids)).execution_options(synchronize_session=False)
+        )
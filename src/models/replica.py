@@ -0,0 +1,17 @@
+from datetime import datetime
+from src.models.user import db
+
+# 心跳表只有一行
+HEARTBEAT_ID = 1
+
+
+class ReplicaHeartbeat(db.Model):
+    """主库定期写入的心跳，副本上读到的时间即其已复制到的位置，用于估计复制延迟"""
+
+    __tablename__ = 'replica_heartbeat'
+
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReplicaHeartbeat {self.beat_at}>'
@@ -0,0 +1,70 @@
+"""自定义列类型
+
+CompressedText：透明压缩的大文本列。写入时长度达到 TEXT_COMPRESSION_MIN_BYTES（UTF-8 字节）
+且压缩后确实更小的值，以 zlib 压缩后 base64 编码、加前缀标记存入原有的 Text 列；
+读取时识别前缀并解压，其余值原样返回。本身以前缀开头的文本一律压缩存储（不论阈值），
+读取时不会被误当作压缩值。列类型仍是 Text，无需迁移，
+开启、关闭或调整阈值都不影响已有数据的读取；已有的行在下次写入时才会被压缩。
+
+只用于不在数据库中被搜索、截取或比较内容的列（AI 结果、译文、缓存值）。
+Note.content 参与全文索引、摘要片段与 LIKE 搜索，必须保持明文。
+解压发生在加载列值时；列表与投影查询不加载这些列（load_only / 延迟加载），也就不会解压。
+
+配置（环境变量）：
+    TEXT_COMPRESSION_MIN_BYTES（默认 0，即关闭）：压缩阈值，建议 4096 左右
+"""
+
+import base64
+import os
+import zlib
+
+from sqlalchemy.types import Text, TypeDecorator
+
+# 压缩值的前缀：以不可见控制字符开头，正常文本极少出现；出现时该值强制压缩，见 compress_text
+COMPRESSED_PREFIX = '\x1fz1:'
+COMPRESSION_LEVEL = 6
+
+_min_bytes = int(os.environ.get('TEXT_COMPRESSION_MIN_BYTES', 0))
+
+
+def set_compression_threshold(min_bytes):
+    """调整压缩阈值（字节），0 表示不再压缩新写入的值；主要供基准测试与迁移脚本使用"""
+    global _min_bytes
+    _min_bytes = int(min_bytes)
+
+
+def compress_text(value):
+    """按当前阈值压缩文本，返回要写入数据库的字符串
+
+    以 COMPRESSED_PREFIX 开头的值无论阈值与压缩效果都会压缩，否则读取时会被当作压缩值解码。
+    """
+    if value is None:
+        return value
+    forced = value.startswith(COMPRESSED_PREFIX)
+    if not forced and not _min_bytes:
+        return value
+    raw = value.encode('utf-8')
+    if not forced and len(raw) < _min_bytes:
+        return value
+    encoded = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(raw, COMPRESSION_LEVEL)).decode('ascii')
+    return encoded if forced or len(encoded) < len(raw) else value
+
+
+def decompress_text(value):
+    """还原 compress_text 的结果；未压缩的值原样返回"""
+    if value is None or not value.startswith(COMPRESSED_PREFIX):
+        return value
+    return zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode('utf-8')
+
+
+class CompressedText(TypeDecorator):
+    """超过阈值时压缩存储的 Text 列"""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
@@ -1,6 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from src.services.replicas import RoutingSession
+
+# 会话按语句路由：配置了只读副本时，读请求中的查询可以走副本
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,19 @@
+from flask import Blueprint, current_app, jsonify
+from src.models.job import AIJob, JOB_QUEUED, JOB_RUNNING
+from src.models.user import db
+
+job_bp = Blueprint('job', __name__)
+
+
+@job_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询异步 AI 任务的状态、结果与耗时"""
+    job = db.session.get(AIJob, job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    if job.status in (JOB_QUEUED, JOB_RUNNING):
+        # 没有独立 worker 时，由轮询请求顺带恢复超时或无人执行的任务
+        from src.services.jobs import recover_jobs
+
+        recover_jobs(current_app._get_current_object(), job)
+    return jsonify(job.to_dict())
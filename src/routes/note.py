@@ -1,15 +1,210 @@
+import base64
+import hashlib
 import json
-from flask import Blueprint, jsonify, request
-from src.models.note import Note, db
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context, url_for
+from sqlalchemy import and_, func, or_
+from src.models.note import NOTE_FIELDS, Note, NoteTombstone, content_hash, db, note_load_options
+from src.services.sync import CursorExpired, collection_version, fetch_changes, maybe_purge_tombstones
 from datetime import datetime
 
 note_bp = Blueprint('note', __name__)
 
+# 列表分页参数
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+# 摘要片段长度（由数据库截取 content 前缀，正文本身不出库）
+SNIPPET_LENGTH = 120
+# 未指定 fields 时的精简投影，满足侧边栏展示需要
+LIST_DEFAULT_FIELDS = ('id', 'title', 'updated_at', 'snippet')
+LIST_ALLOWED_FIELDS = set(NOTE_FIELDS) | {'snippet'}
+
+
+def _encode_cursor(updated_at, note_id):
+    """把排序键 (updated_at, id) 编码为不透明的游标字符串"""
+    raw = json.dumps([updated_at.isoformat() if updated_at else None, note_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """解析游标，格式错误时抛出 ValueError"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except (ValueError, TypeError):
+        raise ValueError('无效的分页游标')
+
+
+def _parse_limit(value):
+    if value is None:
+        return LIST_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit 必须是整数')
+    return max(1, min(limit, LIST_MAX_LIMIT))
+
+
+def _parse_fields(value):
+    if not value:
+        return LIST_DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in LIST_ALLOWED_FIELDS]
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+    return fields
+
+
+def _note_etag(note_id, updated_at):
+    """单条笔记的强 ETag：由 id 和 updated_at 唯一确定"""
+    stamp = updated_at.strftime('%Y%m%d%H%M%S%f') if updated_at else '0'
+    return f'{note_id}-{stamp}'
+
+
+def _collection_etag():
+    """笔记集合的版本：最大 updated_at、最大笔记 id 与最大墓碑 id 任一变化都会改变版本
+
+    三个值都可以直接从索引末端读取，无需扫描全表。
+    查询参数也参与计算，不同分页/投影的响应拥有不同的 ETag。
+    """
+    max_updated_at, max_id, max_tombstone_id = collection_version()
+    raw = f'{max_updated_at}:{max_id}:{max_tombstone_id}:{request.query_string.decode("utf-8")}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag):
+    """If-None-Match 命中时返回 304，否则返回 None"""
+    if request.if_none_match and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def _with_etag(response, etag):
+    # no-cache：允许缓存但每次使用前必须携带 If-None-Match 重新验证
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _precondition_failed(note, updated_at=None):
+    response = jsonify({'error': '笔记已被其他请求修改，请刷新后重试'})
+    response.status_code = 412
+    response.set_etag(_note_etag(note.id, updated_at or note.updated_at))
+    return response
+
+
+def _write_buffer():
+    """自动保存写合并缓冲区；未开启时为 None"""
+    from src.services.write_behind import get_write_buffer
+
+    return get_write_buffer(current_app._get_current_object())
+
+
+def _pending_overlay(note_id):
+    """笔记在写合并缓冲区中尚未写入的 (字段, 版本时间)，没有时为 None"""
+    buffer = _write_buffer()
+    return buffer.overlay(note_id) if buffer is not None else None
+
+
+def _effective_updated_at(updated_at, overlay):
+    # 缓冲版本与数据库中较新的一个决定 ETag，与写入后的 updated_at 一致
+    if overlay is None:
+        return updated_at
+    return max(updated_at, overlay[1]) if updated_at else overlay[1]
+
+
+def _if_match(note_id, updated_at, buffer=None):
+    """If-Match 是否匹配当前版本
+
+    写合并模式下，保存时返回的 ETag 基于保存版本时间，写入后 updated_at 变为写入时刻，
+    两者都视为同一版本。
+    """
+    if request.if_match.contains(_note_etag(note_id, updated_at)):
+        return True
+    alias = buffer.version_alias(note_id, updated_at) if buffer is not None else None
+    return alias is not None and request.if_match.contains(_note_etag(note_id, alias))
+
+
+def _note_with_overlay(note, overlay):
+    """输出笔记，并叠加缓冲中尚未写入的标题/正文（读己之写）"""
+    item = note.to_dict()
+    if overlay is not None:
+        fields, _ = overlay
+        item.update(fields)
+        if 'content' in fields:
+            item['content_hash'] = content_hash(fields['content'])
+        updated_at = _effective_updated_at(note.updated_at, overlay)
+        item['updated_at'] = updated_at.isoformat()
+    return item
+
+
 @note_bp.route('/notes', methods=['GET'])
 def get_notes():
-    """Get all notes, ordered by most recently updated"""
-    notes = Note.query.order_by(Note.updated_at.desc()).all()
-    return jsonify([note.to_dict() for note in notes])
+    """Get notes, ordered by most recently updated
+
+    不带 limit/cursor/fields/stale 参数时保持原有行为，返回完整笔记数组；
+    传入任一参数时按 (updated_at, id) 做游标分页，并只加载 fields 指定的列。
+    stale=1 只返回提取结果、译文或题目已落后于当前正文的笔记。
+    """
+    # 先用聚合查询计算集合版本，未变化时直接 304，不加载任何笔记
+    etag = _collection_etag()
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    if not any(key in request.args for key in ('limit', 'cursor', 'fields', 'stale')):
+        notes = Note.query.options(*note_load_options(NOTE_FIELDS)).order_by(
+            Note.updated_at.desc(), Note.id.desc()
+        ).all()
+        return _with_etag(jsonify([note.to_dict() for note in notes]), etag)
+
+    try:
+        fields = _parse_fields(request.args.get('fields'))
+        limit = _parse_limit(request.args.get('limit'))
+        cursor = _decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    column_fields = [f for f in fields if f != 'snippet']
+    # 排序键始终加载以生成下一页游标，其余大字段和子表保持延迟、不出库
+    query = db.session.query(Note).options(*note_load_options(column_fields))
+    if 'snippet' in fields:
+        query = query.add_columns(func.substr(Note.content, 1, SNIPPET_LENGTH).label('snippet'))
+
+    if cursor:
+        last_updated_at, last_id = cursor
+        query = query.filter(or_(
+            Note.updated_at < last_updated_at,
+            and_(Note.updated_at == last_updated_at, Note.id < last_id),
+        ))
+    if request.args.get('stale', '').lower() in ('1', 'true'):
+        query = query.filter(or_(Note.extracted_stale, Note.translations_stale, Note.quiz_stale))
+
+    # 多取一条用于判断是否还有下一页
+    rows = query.order_by(Note.updated_at.desc(), Note.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    last_note = None
+    for row in rows:
+        note, snippet = (row[0], row[1]) if 'snippet' in fields else (row, None)
+        item = note.to_dict(column_fields)
+        if 'snippet' in fields:
+            item['snippet'] = snippet
+        items.append(item)
+        last_note = note
+
+    next_cursor = _encode_cursor(last_note.updated_at, last_note.id) if has_more else None
+    return _with_etag(jsonify({
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }), etag)
 
 @note_bp.route('/notes', methods=['POST'])
 def create_note():
@@ -22,31 +217,172 @@ def create_note():
         note = Note(title=data['title'], content=data['content'])
         db.session.add(note)
         db.session.commit()
-        return jsonify(note.to_dict()), 201
+        response = jsonify(note.to_dict())
+        response.set_etag(_note_etag(note.id, note.updated_at))
+        return response, 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/changes', methods=['GET'])
+def get_note_changes():
+    """Incremental sync: notes changed and deleted since the given cursor
+
+    不带 since 时从头返回全部笔记；之后每次用上次响应的 next_cursor 继续，
+    has_more 为 true 时应立即继续拉取。
+    """
+    try:
+        limit = _parse_limit(request.args.get('limit'))
+        fields = _parse_fields(request.args.get('fields')) if request.args.get('fields') else NOTE_FIELDS
+        if 'snippet' in fields:
+            raise ValueError('增量同步不支持 snippet 字段')
+        return jsonify(fetch_changes(request.args.get('since'), limit, fields))
+    except CursorExpired:
+        return jsonify({'error': '同步游标已过期，请重新全量同步', 'reset': True}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @note_bp.route('/notes/<int:note_id>', methods=['GET'])
 def get_note(note_id):
-    """Get a specific note by ID"""
+    """Get a specific note by ID
+
+    携带 If-None-Match 时只查询 updated_at，版本未变化直接返回 304。
+    开启自动保存写合并时，叠加本进程缓冲中尚未写入的版本。
+    """
+    overlay = _pending_overlay(note_id)
+    if request.if_none_match:
+        row = db.session.query(Note.updated_at).filter(Note.id == note_id).first()
+        if row is None:
+            abort(404)
+        not_modified = _not_modified(_note_etag(note_id, _effective_updated_at(row.updated_at, overlay)))
+        if not_modified is not None:
+            return not_modified
+
     note = Note.query.get_or_404(note_id)
-    return jsonify(note.to_dict())
+    updated_at = _effective_updated_at(note.updated_at, overlay)
+    return _with_etag(jsonify(_note_with_overlay(note, overlay)), _note_etag(note.id, updated_at))
 
 @note_bp.route('/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
-    """Update a specific note"""
+    """Update a specific note
+
+    携带 If-Match 时做乐观并发控制：版本不一致返回 412，不会覆盖他人的修改。
+    开启自动保存写合并（AUTOSAVE_COALESCE_MS）时只记入缓冲区，由后台按窗口合并写入。
+    """
+    buffer = _write_buffer()
+    if buffer is not None:
+        return _buffered_update(buffer, note_id)
     try:
-        note = Note.query.get_or_404(note_id)
+        # 先校验请求体再加锁查询，400 时不会留下未结束的事务和行锁
         data = request.json
-        
+
         if not data:
             return jsonify({'error': 'No data provided'}), 400
-        
+
+        query = Note.query
+        if request.if_match:
+            # 加行锁，保证版本比较与写入之间不会插入其他修改
+            query = query.with_for_update()
+        note = query.get_or_404(note_id)
+        if request.if_match and not request.if_match.contains(_note_etag(note.id, note.updated_at)):
+            db.session.rollback()
+            return _precondition_failed(note)
+
         note.title = data.get('title', note.title)
         note.content = data.get('content', note.content)
         db.session.commit()
-        return jsonify(note.to_dict())
+        response = jsonify(note.to_dict())
+        response.set_etag(_note_etag(note.id, note.updated_at))
+        return response
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def _buffered_update(buffer, note_id):
+    """写合并模式下的更新：校验版本后记入缓冲区，返回叠加了新版本的笔记"""
+    note = Note.query.get_or_404(note_id)
+    overlay = buffer.overlay(note_id)
+    updated_at = _effective_updated_at(note.updated_at, overlay)
+    if request.if_match and not _if_match(note.id, updated_at, buffer):
+        return _precondition_failed(note, updated_at)
+
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    fields = {name: data[name] for name in ('title', 'content') if name in data}
+    if fields:
+        buffer.submit(note_id, fields, base_hash=note.content_hash)
+        overlay = buffer.overlay(note_id)
+    response = jsonify(_note_with_overlay(note, overlay))
+    response.set_etag(_note_etag(note.id, _effective_updated_at(note.updated_at, overlay)))
+    return response
+
+@note_bp.route('/notes/<int:note_id>', methods=['PATCH'])
+def patch_note(note_id):
+    """Apply incremental text edits to a note's content
+
+    请求体只携带改动：edits 为相对基础版本的 [{start, end, text}, ...]，
+    unit 指定偏移单位（codepoint 或 utf16），可选 title 整体替换标题。
+    基础版本必须通过 If-Match（ETag）或 base_hash（基础正文的 content_hash）声明，
+    与当前版本不一致时返回 412，客户端应重新获取后再提交；
+    可选 result_hash 用于校验拼接结果，与客户端本地文本不一致时返回 409 且不写入。
+    响应只返回新版本信息，不回传正文。
+    """
+    from src.services.text_patch import OFFSET_UNITS, PatchError, apply_edits, parse_edits
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+    base_hash = data.get('base_hash')
+    if not request.if_match and not base_hash:
+        return jsonify({'error': '增量更新需要 If-Match 或 base_hash 指明基础版本'}), 428
+    unit = data.get('unit', 'codepoint')
+    if unit not in OFFSET_UNITS:
+        return jsonify({'error': f"unit 必须是 {' 或 '.join(OFFSET_UNITS)}"}), 400
+    if 'title' in data and not isinstance(data['title'], str):
+        return jsonify({'error': 'title 必须是字符串'}), 400
+    try:
+        edits = parse_edits(data.get('edits', []))
+    except PatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    buffer = _write_buffer()
+    if buffer is not None:
+        # 补丁基于最新正文，先写入缓冲中的自动保存
+        buffer.flush_notes([note_id])
+    # 加行锁，保证版本比较、拼接与写入之间不会插入其他修改
+    note = Note.query.with_for_update().get_or_404(note_id)
+    try:
+        if request.if_match and not _if_match(note.id, note.updated_at, buffer):
+            db.session.rollback()
+            return _precondition_failed(note)
+        current_hash = note.content_hash or content_hash(note.content)
+        if base_hash and base_hash != current_hash:
+            db.session.rollback()
+            return _precondition_failed(note)
+
+        try:
+            content = apply_edits(note.content, edits, unit)
+        except PatchError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        new_hash = content_hash(content)
+        if data.get('result_hash') and data['result_hash'] != new_hash:
+            db.session.rollback()
+            return jsonify({'error': '补丁应用结果与客户端文本不一致，请重新获取笔记', 'content_hash': new_hash}), 409
+
+        if edits:
+            note.content = content
+        if 'title' in data:
+            note.title = data['title']
+        db.session.commit()
+        response = jsonify({
+            'id': note.id,
+            'updated_at': note.updated_at.isoformat() if note.updated_at else None,
+            'content_hash': note.content_hash
+        })
+        response.set_etag(_note_etag(note.id, note.updated_at))
+        return response
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -56,25 +392,185 @@ def delete_note(note_id):
     """Delete a specific note"""
     try:
         note = Note.query.get_or_404(note_id)
+        buffer = _write_buffer()
+        updated_at = _effective_updated_at(note.updated_at, buffer.overlay(note_id) if buffer else None)
+        if request.if_match and not _if_match(note.id, updated_at, buffer):
+            db.session.rollback()
+            return _precondition_failed(note, updated_at)
         db.session.delete(note)
+        NoteTombstone.record([note_id])
+        maybe_purge_tombstones()
         db.session.commit()
+        if buffer is not None:
+            buffer.discard(note_id)
         return '', 204
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/batch', methods=['POST'])
+def batch_notes():
+    """Create, update and delete notes in bulk
+
+    操作按块批量执行，每块一个事务；返回与输入顺序一致的逐项结果。
+    """
+    from src.services.note_batch import (
+        DEFAULT_CHUNK_SIZE, BatchValidationError, execute_batch, validate_operations
+    )
+
+    data = request.json or {}
+    operations = data.get('operations')
+    try:
+        chunk_size = int(data.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'chunk_size 必须是整数'}), 400
+    try:
+        validate_operations(operations)
+    except BatchValidationError as e:
+        return jsonify({'error': str(e), 'results': e.results}), 400
+
+    buffer = _write_buffer()
+    if buffer is not None:
+        # 批量更新以最新正文为基础，先写入缓冲中的自动保存
+        buffer.flush_notes([op['id'] for op in operations if op['op'] == 'update'])
+    results, committed_chunks = execute_batch(operations, chunk_size)
+    if buffer is not None:
+        for result in results:
+            if result['op'] == 'delete' and result['status'] == 204:
+                buffer.discard(result['id'])
+    success = all(r['status'] not in (500, 'skipped') for r in results)
+    return jsonify({
+        'success': success,
+        'results': results,
+        'committed_chunks': committed_chunks
+    }), (200 if success else 500)
+
+@note_bp.route('/notes/export', methods=['GET'])
+def export_notes():
+    """Stream every note as NDJSON (one note per line, translations and quiz embedded)
+
+    笔记按 id 分页读取，每页再批量读取其翻译与题目，内存占用与笔记数量无关。
+    """
+    from src.services.note_transfer import export_chunks
+
+    filename = f'notes-{datetime.utcnow():%Y%m%d%H%M%S}.ndjson'
+    return Response(
+        stream_with_context(export_chunks()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'}
+    )
+
+@note_bp.route('/notes/import', methods=['POST'])
+def import_notes():
+    """Import notes from an NDJSON request body (the export format)
+
+    请求体逐行解析、分批写入，支持 Content-Encoding: gzip；preserve_ids=1 时沿用文件中的 id。
+    """
+    import gzip
+    from sqlalchemy.exc import IntegrityError
+    from src.services.note_transfer import IMPORT_BATCH_SIZE, ImportFailed, import_notes as run_import
+
+    try:
+        batch_size = max(1, min(int(request.args.get('batch_size', IMPORT_BATCH_SIZE)), 10000))
+    except ValueError:
+        return jsonify({'error': 'batch_size 必须是整数'}), 400
+    preserve_ids = request.args.get('preserve_ids', '').lower() in ('1', 'true')
+
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    if encoding not in ('identity', 'gzip'):
+        return jsonify({'error': f'不支持的 Content-Encoding: {encoding}'}), 415
+    stream = gzip.GzipFile(fileobj=request.stream) if encoding == 'gzip' else request.stream
+
+    try:
+        result = run_import(stream, preserve_ids=preserve_ids, batch_size=batch_size)
+    except ImportFailed as e:
+        status = 409 if isinstance(e.error, IntegrityError) else 500
+        return jsonify({'success': False, 'error': str(e.error), **e.result}), status
+    except (OSError, EOFError) as e:
+        # gzip 数据损坏或被截断
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'请求体解压失败: {e}'}), 400
+    return jsonify({'success': True, **result})
+
+@note_bp.route('/notes/<int:note_id>/related', methods=['GET'])
+def get_related_notes(note_id):
+    """Notes most similar to the given one (local hashed TF-IDF, cosine similarity)"""
+    try:
+        limit = min(_parse_limit(request.args.get('limit', '10')), 50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # numpy 在首次查询时才导入，不影响冷启动
+    from src.services.related import find_related_notes
+
+    related = find_related_notes(note_id, limit)
+    if related is None:
+        abort(404)
+
+    ids = [related_id for related_id, _ in related]
+    rows = {row.id: row for row in db.session.query(Note.id, Note.title, Note.updated_at).filter(Note.id.in_(ids))}
+    return jsonify({'items': [{
+        'id': related_id,
+        'title': rows[related_id].title,
+        'updated_at': rows[related_id].updated_at.isoformat() if rows[related_id].updated_at else None,
+        'score': score
+    } for related_id, score in related if related_id in rows]})
+
 @note_bp.route('/notes/search', methods=['GET'])
 def search_notes():
-    """Search notes by title or content"""
-    query = request.args.get('q', '')
+    """Full-text search notes by title or content
+
+    结果按相关度排序并分页，每条只返回高亮后的标题与正文片段。
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        limit = _parse_limit(request.args.get('limit'))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     if not query:
-        return jsonify([])
-    
-    notes = Note.query.filter(
-        (Note.title.contains(query)) | (Note.content.contains(query))
-    ).order_by(Note.updated_at.desc()).all()
-    
-    return jsonify([note.to_dict() for note in notes])
+        return jsonify({'items': [], 'next_offset': None, 'has_more': False})
+
+    from src.services.search import search_notes as run_search
+
+    # 多取一条用于判断是否还有下一页
+    backend, items = run_search(query, limit + 1, offset)
+    has_more = len(items) > limit
+    return jsonify({
+        'items': items[:limit],
+        'next_offset': offset + limit if has_more else None,
+        'has_more': has_more,
+        'backend': backend
+    })
+
+def _wants_async(data):
+    """请求体 "async": true 或查询参数 ?async=1 时以异步任务方式执行 AI 操作"""
+    return data.get('async') is True or request.args.get('async', '').lower() in ('1', 'true')
+
+
+def _wants_force(data):
+    """请求体 "force": true 或查询参数 ?force=1 时忽略笔记中已保存的结果，重新调用模型"""
+    return data.get('force') is True or request.args.get('force', '').lower() in ('1', 'true')
+
+
+def _result_source_hash(result, source_hash):
+    """错误结果不记录来源摘要，避免被当作最新结果复用"""
+    from src.services.ai_service import is_error_result
+    return None if is_error_result(result) else source_hash
+
+
+def _submit_ai_job(operation, payload, note_id):
+    """提交异步 AI 任务，立即返回 202 与任务查询地址"""
+    from src.services.jobs import submit_job
+
+    job = submit_job(operation, payload, note_id)
+    status_url = url_for('job.get_job', job_id=job.id)
+    response = jsonify({'job_id': job.id, 'status': job.status, 'status_url': status_url})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
 
 @note_bp.route('/notes/extract-info', methods=['POST'])
 def extract_information():
@@ -91,10 +587,18 @@ def extract_information():
             return jsonify({'error': '文档内容不能为空'}), 400
         
         # 如果提供了note_id，验证笔记是否存在
+        source_hash = content_hash(content)
         if note_id:
             note = Note.query.get(note_id)
             if not note:
                 return jsonify({'error': '笔记不存在'}), 404
+            # 正文未变化时直接返回已保存的结果，不再调用模型
+            existing = None if _wants_force(data) else note.fresh_extracted_info(source_hash)
+            if existing is not None:
+                return jsonify({'success': True, 'extracted_info': existing, 'saved': True, 'reused': True})
+
+        if _wants_async(data):
+            return _submit_ai_job('extract', {'content': content}, note_id)
         
         # Import here to avoid circular imports
         from src.services.ai_service import extract_key_info
@@ -104,8 +608,7 @@ def extract_information():
         
         # 如果提供了note_id，保存提取的信息到数据库
         if note_id and note:
-            note.extracted_info = extracted_info
-            note.extracted_at = datetime.utcnow()
+            note.apply_extracted_info(extracted_info, _result_source_hash(extracted_info, source_hash))
             try:
                 db.session.commit()
             except Exception as db_e:
@@ -134,22 +637,207 @@ def extract_information():
         return jsonify({'error': f'信息提取失败: {str(e)}'}), 500
 
 
+def _sse(event, data):
+    """格式化一条 server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(open_stream, on_complete):
+    """把模型的增量文本包装为 SSE 响应
+
+    事件顺序为 start → delta（多次）→ done；出错时发送 error 事件后结束。
+    on_complete(full_text) 在流结束后调用（负责持久化），返回值作为 done 事件的数据。
+    """
+    def generate():
+        # 先发送 start 事件，让客户端在模型产出首个 token 之前就拿到响应
+        yield _sse('start', {})
+        parts = []
+        try:
+            for delta in open_stream():
+                parts.append(delta)
+                yield _sse('delta', {'text': delta})
+            yield _sse('done', on_complete(''.join(parts).strip()))
+        except Exception as e:
+            import traceback as _tb
+            _tb.print_exc()
+            db.session.rollback()
+            from src.services.ai_service import describe_ai_error
+            yield _sse('error', {'error': describe_ai_error(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@note_bp.route('/notes/extract-info/stream', methods=['POST'])
+def stream_extract_information():
+    """流式提取关键信息（SSE），结束后可选保存到笔记"""
+    data = request.json or {}
+    content = (data.get('content') or '').strip()
+    note_id = data.get('note_id')
+
+    if not content:
+        return jsonify({'error': '文档内容不能为空'}), 400
+    note = Note.query.get(note_id) if note_id else None
+    if note_id and not note:
+        return jsonify({'error': '笔记不存在'}), 404
+
+    source_hash = content_hash(content)
+    existing = note.fresh_extracted_info(source_hash) if note and not _wants_force(data) else None
+    if existing is not None:
+        return _sse_response(lambda: iter([existing]),
+                             lambda _: {'extracted_info': existing, 'saved': True, 'reused': True})
+
+    def open_stream():
+        # 在 start 事件发出后才导入 AI 客户端，避免冷启动导入拖慢首字节
+        from src.services.ai_service import stream_key_info
+        return stream_key_info(content)
+
+    def on_complete(extracted_info):
+        saved = False
+        if note_id:
+            note = Note.query.get(note_id)
+            if note:
+                note.apply_extracted_info(extracted_info, _result_source_hash(extracted_info, source_hash))
+                db.session.commit()
+                saved = True
+        return {'extracted_info': extracted_info, 'saved': saved}
+
+    return _sse_response(open_stream, on_complete)
+
+
+@note_bp.route('/notes/translate/stream', methods=['POST'])
+def stream_translate_note():
+    """流式翻译笔记内容（SSE），结束后可选保存到笔记"""
+    data = request.json or {}
+    content = (data.get('content') or '').strip()
+    language = (data.get('language') or '').strip()
+    note_id = data.get('note_id')
+
+    if not content:
+        return jsonify({'error': '笔记内容不能为空'}), 400
+    if not language:
+        return jsonify({'error': '目标语言不能为空'}), 400
+    note = Note.query.get(note_id) if note_id else None
+    if note_id and not note:
+        return jsonify({'error': '笔记不存在'}), 404
+
+    source_hash = content_hash(content)
+    existing = note.fresh_translations([language], source_hash).get(language) \
+        if note and not _wants_force(data) else None
+    if existing is not None:
+        return _sse_response(lambda: iter([existing]), lambda _: {
+            'translation': existing, 'language': language, 'saved': True, 'reused': True
+        })
+
+    def open_stream():
+        from src.services.ai_service import stream_translation
+        return stream_translation(content, language)
+
+    def on_complete(translation):
+        saved = False
+        if note_id:
+            note = Note.query.get(note_id)
+            if note:
+                note.apply_translation(language, translation, _result_source_hash(translation, source_hash))
+                db.session.commit()
+                saved = True
+        return {'translation': translation, 'language': language, 'saved': saved}
+
+    return _sse_response(open_stream, on_complete)
+
+
+# 单次请求最多可翻译的语言数
+MAX_TRANSLATION_LANGUAGES = 10
+
+
+def _parse_languages(value):
+    """校验并去重 languages 列表，保持原有顺序"""
+    if not isinstance(value, list):
+        raise ValueError('languages 必须是语言名称数组')
+    languages = list(dict.fromkeys(str(item).strip() for item in value if str(item).strip()))
+    if not languages:
+        raise ValueError('目标语言不能为空')
+    if len(languages) > MAX_TRANSLATION_LANGUAGES:
+        raise ValueError(f'一次最多翻译 {MAX_TRANSLATION_LANGUAGES} 种语言')
+    return languages
+
+
 @note_bp.route('/notes/translate', methods=['POST'])
 def translate_note():
-    """调用AI服务将笔记内容翻译为指定语言并可选保存结果"""
-    from src.services.ai_service import translate_note_content
+    """调用AI服务将笔记内容翻译为指定语言并可选保存结果
+
+    传入 languages 数组时并发翻译为多种语言，并在同一个事务中合并写入。
+    """
+    from src.services.ai_service import translate_note_content, translate_note_content_batch
 
     try:
         data = request.json or {}
         content = (data.get('content') or '').strip()
         language = (data.get('language') or '').strip()
+        languages = data.get('languages')
         note_id = data.get('note_id')
 
         if not content:
             return jsonify({'error': '笔记内容不能为空'}), 400
-        if not language:
+        if languages is not None:
+            try:
+                languages = _parse_languages(languages)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        elif not language:
             return jsonify({'error': '目标语言不能为空'}), 400
 
+        note = None
+        if note_id:
+            note = Note.query.get(note_id)
+            if not note:
+                return jsonify({'error': '笔记不存在'}), 404
+
+        # 正文未变化时直接使用笔记中已保存的译文，只为缺少或过期的语言调用模型
+        source_hash = content_hash(content)
+        wanted = languages if languages is not None else [language]
+        fresh = note.fresh_translations(wanted, source_hash) if note and not _wants_force(data) else {}
+
+        if languages is None and language in fresh:
+            return jsonify({
+                'success': True,
+                'translation': fresh[language],
+                'language': language,
+                'saved': True,
+                'reused': True
+            })
+
+        pending = [lang for lang in wanted if lang not in fresh]
+        if _wants_async(data) and pending:
+            payload = {'content': content}
+            if languages is not None:
+                payload['languages'] = languages
+            else:
+                payload['language'] = language
+            return _submit_ai_job('translate', payload, note_id)
+
+        if languages is not None:
+            results = translate_note_content_batch(content, pending) if pending else {}
+            succeeded = {lang: r['translation'] for lang, r in results.items() if r['status'] == 'ok'}
+            for lang, text in fresh.items():
+                results[lang] = {'status': 'ok', 'translation': text, 'latency_ms': 0, 'reused': True}
+
+            saved = bool(fresh)
+            if note is not None and succeeded:
+                note.apply_translations(succeeded, source_hash)
+                db.session.commit()
+                saved = True
+
+            return jsonify({
+                'success': bool(succeeded or fresh),
+                'results': {lang: results[lang] for lang in languages},
+                'languages': languages,
+                'saved': saved
+            }), (200 if succeeded or fresh else 500)
+
         translation = translate_note_content(content, language)
 
         # 如果返回的字符串以错误标识开头，则视为失败
@@ -157,20 +845,8 @@ def translate_note():
             return jsonify({'error': translation}), 500
 
         saved = False
-        if note_id:
-            note = Note.query.get(note_id)
-            if not note:
-                return jsonify({'error': '笔记不存在'}), 404
-
-            try:
-                translations = json.loads(note.translations) if note.translations else {}
-            except json.JSONDecodeError:
-                translations = {}
-
-            translations[language] = translation
-            note.translations = json.dumps(translations, ensure_ascii=False)
-            note.translation_updated_at = datetime.utcnow()
-            note.updated_at = datetime.utcnow()
+        if note is not None:
+            note.apply_translation(language, translation, source_hash)
             db.session.commit()
             saved = True
 
@@ -198,6 +874,20 @@ def generate_quiz():
         if not content:
             return jsonify({'error': '笔记内容不能为空'}), 400
 
+        note = None
+        if note_id:
+            note = Note.query.get(note_id)
+            if not note:
+                return jsonify({'error': '笔记不存在'}), 404
+
+        source_hash = content_hash(content)
+        existing = note.fresh_quiz(source_hash) if note and not _wants_force(data) else None
+        if existing is not None:
+            return jsonify({'success': True, 'quiz': existing, 'saved': True, 'reused': True})
+
+        if _wants_async(data):
+            return _submit_ai_job('quiz', {'content': content}, note_id)
+
         quiz_payload = generate_quiz_question(content)
 
         if not isinstance(quiz_payload, dict):
@@ -207,17 +897,8 @@ def generate_quiz():
             return jsonify({'error': quiz_payload.get('error'), 'raw': quiz_payload.get('raw')}), 500
 
         saved = False
-        if note_id:
-            note = Note.query.get(note_id)
-            if not note:
-                return jsonify({'error': '笔记不存在'}), 404
-
-            note.quiz_question = quiz_payload.get('question')
-            note.quiz_options = json.dumps(quiz_payload.get('options', []), ensure_ascii=False)
-            note.quiz_answer = quiz_payload.get('answer')
-            note.quiz_explanation = quiz_payload.get('explanation')
-            note.quiz_generated_at = datetime.utcnow()
-            note.updated_at = datetime.utcnow()
+        if note is not None:
+            note.apply_quiz(quiz_payload, source_hash)
             db.session.commit()
             saved = True
 
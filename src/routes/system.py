@@ -0,0 +1,56 @@
+from flask import Blueprint, jsonify
+
+system_bp = Blueprint('system', __name__)
+
+
+@system_bp.route('/system/ai-cache', methods=['GET'])
+def get_ai_cache_stats():
+    """返回 AI 结果缓存的命中/未命中统计"""
+    from src.services.ai_cache import get_ai_cache
+
+    return jsonify(get_ai_cache().stats())
+
+
+@system_bp.route('/system/ai-cache', methods=['DELETE'])
+def clear_ai_cache():
+    """清空 AI 结果缓存（内存与数据库）"""
+    from src.services.ai_cache import get_ai_cache
+
+    get_ai_cache().clear()
+    return '', 204
+
+
+@system_bp.route('/system/db-pool', methods=['GET'])
+def get_db_pool_stats():
+    """返回数据库连接池的模式、占用情况与建连/借出统计"""
+    from src.models.user import db
+    from src.services.database import describe_pool
+
+    return jsonify(describe_pool(db.engine))
+
+
+@system_bp.route('/system/db-replicas', methods=['GET'])
+def get_db_replica_stats():
+    """返回只读副本的复制延迟、可用状态与请求路由统计"""
+    from src.services.replicas import get_replica_router
+
+    router = get_replica_router()
+    return jsonify(router.describe() if router is not None else {'enabled': False})
+
+
+@system_bp.route('/system/autosave', methods=['GET'])
+def get_autosave_stats():
+    """返回自动保存写合并的配置与吸收/写入统计"""
+    from flask import current_app
+    from src.services.write_behind import get_write_buffer
+
+    buffer = get_write_buffer(current_app._get_current_object())
+    return jsonify(buffer.stats() if buffer is not None else {'enabled': False})
+
+
+@system_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """以 Prometheus 文本格式输出路由耗时、SQL 与 AI 调用指标"""
+    from src.services.metrics import metrics_response
+
+    return metrics_response()
@@ -0,0 +1,257 @@
+"""AI 结果的内容寻址缓存
+
+缓存键由 (操作, 模型, 提示词版本, 目标语言, 内容 sha256) 计算得到，
+内容不变时直接返回缓存结果，完全跳过网络请求。
+
+存储后端可插拔：
+- MemoryCache：进程内 LRU，按条目数和 TTL 淘汰
+- DatabaseCache：ai_result_cache 表，Vercel 冷启动后依然有效
+- TieredCache：先查内存再查数据库，数据库命中会回填内存
+
+通过环境变量配置：
+- AI_CACHE_BACKEND：tiered（默认）/ memory / database / off
+- AI_CACHE_MAX_ENTRIES：内存缓存条目上限，默认 512
+- AI_CACHE_TTL_SECONDS：缓存有效期，默认 7 天；0 表示永不过期
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+# 数据库中过期记录的清理间隔（秒）
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def content_digest(content):
+    """计算内容的 sha256 十六进制摘要"""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def make_cache_key(operation, model, prompt_version, language, content):
+    """根据操作、模型、提示词版本、目标语言和内容摘要生成缓存键"""
+    parts = [operation, model, str(prompt_version), language or '', content_digest(content)]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """线程安全的进程内 LRU 缓存"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, operation, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DatabaseCache:
+    """基于 ai_result_cache 表的持久化缓存；没有应用上下文时自动跳过"""
+
+    name = 'database'
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+
+    def get(self, key):
+        if not has_app_context():
+            return None
+        from src.models.ai_cache import AIResultCache
+        from src.models.user import db
+
+        table = AIResultCache.__table__
+        # 使用独立连接，避免影响路由中尚未提交的会话事务
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(table.c.value, table.c.expires_at).where(table.c.cache_key == key)
+            ).first()
+        if row is None:
+            return None
+        if row.expires_at is not None and row.expires_at <= datetime.utcnow():
+            return None
+        return row.value
+
+    def set(self, key, operation, value):
+        if not has_app_context():
+            return
+        from src.models.ai_cache import AIResultCache
+        from src.models.user import db
+
+        table = AIResultCache.__table__
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds) if self.ttl_seconds else None
+        values = {'operation': operation, 'value': value, 'created_at': now, 'expires_at': expires_at}
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert(table).values(cache_key=key, **values))
+        except IntegrityError:
+            # 并发写入同一个键时退化为覆盖更新
+            with db.engine.begin() as connection:
+                connection.execute(update(table).where(table.c.cache_key == key).values(**values))
+        self._purge_expired(now)
+
+    def _purge_expired(self, now):
+        """定期删除过期记录，控制表的大小"""
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        from src.models.ai_cache import AIResultCache
+        from src.models.user import db
+
+        table = AIResultCache.__table__
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.expires_at <= now))
+
+    def clear(self):
+        if not has_app_context():
+            return
+        from src.models.ai_cache import AIResultCache
+        from src.models.user import db
+
+        with db.engine.begin() as connection:
+            connection.execute(delete(AIResultCache.__table__))
+
+
+class TieredCache:
+    """两级缓存：内存未命中时查询数据库，并把结果回填到内存"""
+
+    name = 'tiered'
+
+    def __init__(self, memory, database):
+        self.memory = memory
+        self.database = database
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.database.get(key)
+        if value is not None:
+            self.memory.set(key, None, value)
+        return value
+
+    def set(self, key, operation, value):
+        self.memory.set(key, operation, value)
+        self.database.set(key, operation, value)
+
+    def clear(self):
+        self.memory.clear()
+        self.database.clear()
+
+
+class AICache:
+    """缓存门面：负责序列化和命中率统计，存储细节交给后端"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+    def get(self, key):
+        """返回反序列化后的缓存值；未命中返回 None"""
+        if self.backend is None:
+            return None
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            # 缓存故障不应影响主流程，只记录错误并按未命中处理
+            print('AI cache lookup failed:', str(e))
+            self._count('errors')
+            raw = None
+        self._count('hits' if raw is not None else 'misses')
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, operation, value):
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, operation, json.dumps(value, ensure_ascii=False))
+            self._count('stores')
+        except Exception as e:
+            print('AI cache store failed:', str(e))
+            self._count('errors')
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['backend'] = self.backend.name if self.backend is not None else 'off'
+        memory = getattr(self.backend, 'memory', self.backend)
+        if isinstance(memory, MemoryCache):
+            stats['memory_entries'] = len(memory)
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+def _create_backend():
+    kind = os.environ.get('AI_CACHE_BACKEND', 'tiered').lower()
+    max_entries = int(os.environ.get('AI_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    ttl_seconds = int(os.environ.get('AI_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+    if kind == 'off':
+        return None
+    if kind == 'memory':
+        return MemoryCache(max_entries, ttl_seconds)
+    if kind == 'database':
+        return DatabaseCache(ttl_seconds)
+    return TieredCache(MemoryCache(max_entries, ttl_seconds), DatabaseCache(ttl_seconds))
+
+
+# Global instance
+_ai_cache = None
+_ai_cache_lock = threading.Lock()
+
+
+def get_ai_cache() -> AICache:
+    """Get or create the process-wide AI cache"""
+    global _ai_cache
+    if _ai_cache is None:
+        with _ai_cache_lock:
+            if _ai_cache is None:
+                _ai_cache = AICache(_create_backend())
+    return _ai_cache
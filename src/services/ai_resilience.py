@@ -0,0 +1,304 @@
+"""AI 客户端的限流、重试与熔断
+
+所有模型调用都经过进程内共享的 `AIGuard`：
+1. 熔断器：上游连续失败达到阈值后进入 open 状态，在冷却期内直接失败，不再发出请求；
+   冷却结束后放行一个探测请求（half-open），成功则恢复。
+2. 令牌桶：限制每秒发出的请求数，突发请求在桶内排队而不是同时打到上游；
+   收到 429 时按 Retry-After 暂停整个桶，让其余线程一起退让。
+3. 重试：对 429、5xx、超时和连接错误做指数退避（full jitter），优先遵守 Retry-After，
+   整个调用（含排队与重试）受同一个截止时间约束。
+
+配置（环境变量）：
+    AI_RATE_LIMIT_RPS（默认 5，0 表示不限流）、AI_RATE_LIMIT_BURST（默认 10）
+    AI_MAX_RETRIES（默认 3）、AI_RETRY_BASE_DELAY（秒，默认 0.5）、AI_RETRY_MAX_DELAY（秒，默认 8）
+    AI_CALL_DEADLINE（秒，默认 60）
+    AI_BREAKER_FAILURES（默认 5）、AI_BREAKER_RESET_SECONDS（默认 30）
+"""
+
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from src.services.metrics import registry
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+ai_retries = registry.counter('ai_retries_total', 'Model calls retried, by reason', ('reason',))
+ai_rejected = registry.counter('ai_rejected_total', 'Model calls rejected before reaching upstream', ('reason',))
+
+
+class AICallRejected(Exception):
+    """调用在发出前被拒绝（熔断或截止时间不足）"""
+
+
+class CircuitOpenError(AICallRejected):
+    """熔断器处于打开状态"""
+
+    def __init__(self, retry_in):
+        super().__init__(f'AI service circuit open, retry in {retry_in:.1f}s')
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(AICallRejected):
+    """在截止时间内没有拿到令牌或完成重试"""
+
+
+class TokenBucket:
+    """线程安全的令牌桶；pause() 让所有调用方等待到指定时刻"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # 暂停期间不积累令牌
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def acquire(self, deadline):
+        """取一个令牌，最多等到 deadline（monotonic 时间）；超时返回 False"""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """上游要求退让时暂停发放令牌，并清空已积累的突发额度
+
+        暂停结束时只保留一个令牌，先放行一个请求试探，其余请求按速率恢复。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = min(self._tokens, 1.0)
+
+    def state(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'tokens': round(self._tokens, 3),
+                'paused_for': round(max(0.0, self._paused_until - now), 3),
+            }
+
+
+class CircuitBreaker:
+    """连续失败计数的熔断器"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """放行则返回，否则抛出 CircuitOpenError"""
+        with self._lock:
+            if self._state == BREAKER_CLOSED:
+                return
+            now = time.monotonic()
+            if self._state == BREAKER_OPEN:
+                retry_in = self._opened_at + self.reset_timeout - now
+                if retry_in > 0:
+                    raise CircuitOpenError(retry_in)
+                self._state = BREAKER_HALF_OPEN
+                self._probe_in_flight = False
+            # half-open 时只放行一个探测请求
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """探测请求因与上游健康无关的原因结束（如 4xx）时，允许下一个探测"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def state(self):
+        with self._lock:
+            return {'state': self._state, 'consecutive_failures': self._failures}
+
+
+def _status_code(error):
+    return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def classify_error(error):
+    """返回可重试错误的原因（rate_limited / server_error / timeout / connection），不可重试时返回 None
+
+    按属性和类名判断，无需导入 openai。
+    """
+    name = type(error).__name__
+    if name == 'APITimeoutError' or isinstance(error, TimeoutError):
+        return 'timeout'
+    if name == 'APIConnectionError' or isinstance(error, ConnectionError):
+        return 'connection'
+    status = _status_code(error)
+    if status == 429:
+        return 'rate_limited'
+    if status is not None and status >= 500:
+        return 'server_error'
+    return None
+
+
+def retry_after_seconds(error):
+    """从错误响应中读取 Retry-After / retry-after-ms，没有时返回 None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AIGuard:
+    """组合熔断、限流与重试；call(func) 中 func 接收本次尝试剩余的秒数作为 timeout"""
+
+    def __init__(self, limiter, breaker, max_retries=3, base_delay=0.5, max_delay=8.0, deadline=60.0):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._random = random.Random()
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(
+            TokenBucket(float(env('AI_RATE_LIMIT_RPS', 5)), float(env('AI_RATE_LIMIT_BURST', 10))),
+            CircuitBreaker(int(env('AI_BREAKER_FAILURES', 5)), float(env('AI_BREAKER_RESET_SECONDS', 30))),
+            max_retries=int(env('AI_MAX_RETRIES', 3)),
+            base_delay=float(env('AI_RETRY_BASE_DELAY', 0.5)),
+            max_delay=float(env('AI_RETRY_MAX_DELAY', 8)),
+            deadline=float(env('AI_CALL_DEADLINE', 60)),
+        )
+
+    def backoff(self, attempt):
+        """第 attempt 次重试前的等待时间：full jitter 指数退避"""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func, deadline=None):
+        deadline_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        attempt = 0
+        while True:
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                ai_rejected.inc(reason='circuit_open')
+                raise
+            if not self.limiter.acquire(deadline_at):
+                self.breaker.release_probe()
+                ai_rejected.inc(reason='deadline')
+                raise DeadlineExceeded('AI call deadline exceeded while waiting for rate limiter')
+
+            try:
+                result = func(timeout=max(0.1, deadline_at - time.monotonic()))
+            except Exception as e:
+                reason = classify_error(e)
+                if reason is None:
+                    # 4xx 等调用方错误说明上游是健康的
+                    self.breaker.release_probe()
+                    raise
+                if reason == 'rate_limited':
+                    # 限流不代表上游故障，不计入熔断；整个进程一起退让
+                    self.breaker.release_probe()
+                    wait = retry_after_seconds(e)
+                    self.limiter.pause(wait if wait is not None else self.backoff(attempt))
+                else:
+                    self.breaker.record_failure()
+                    wait = retry_after_seconds(e)
+
+                if attempt >= self.max_retries:
+                    raise
+                delay = max(wait or 0.0, self.backoff(attempt))
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                ai_retries.inc(reason=reason)
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def state(self):
+        return {'breaker': self.breaker.state(), 'limiter': self.limiter.state()}
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_ai_guard():
+    """Get or create the process-wide AI call guard"""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = AIGuard.from_env()
+                registry.register_collector(_collect_guard_state)
+    return _guard
+
+
+def _collect_guard_state():
+    state = get_ai_guard().state()
+    return [
+        ('ai_circuit_open', 'gauge', 'Whether the AI circuit breaker is open (1) or half-open (0.5)',
+         [({}, {BREAKER_CLOSED: 0, BREAKER_HALF_OPEN: 0.5, BREAKER_OPEN: 1}[state['breaker']['state']])]),
+        ('ai_rate_limit_paused_seconds', 'gauge', 'Remaining pause requested by upstream Retry-After',
+         [({}, state['limiter']['paused_for'])]),
+    ]
@@ -1,27 +1,367 @@
 import os
-from openai import OpenAI
+import time
 from typing import Optional, Dict, Any
 import json
+from src.services.ai_cache import get_ai_cache, make_cache_key
+from src.services.ai_resilience import CircuitOpenError, DeadlineExceeded, get_ai_guard
+from src.services.chunking import split_content
+from src.services.concurrency import run_concurrently
+from src.services.metrics import ai_coalesced, record_ai_call, registry
+from src.services.singleflight import SingleFlight
+
+# 提示词模板版本号：修改某个操作的提示词时递增，使旧的缓存结果自然失效
+PROMPT_VERSIONS = {
+    'extract': 1,
+    'extract_chunk': 1,
+    'translate': 1,
+    'quiz': 1,
+}
+
+# 多语言翻译时的默认并发数，可通过 AI_TRANSLATE_CONCURRENCY 调整
+DEFAULT_TRANSLATE_CONCURRENCY = 4
+
+# 超过该字符数的笔记改为分块提取再合并，可通过 AI_EXTRACT_CHUNK_CHARS 调整
+DEFAULT_EXTRACT_CHUNK_CHARS = 6000
+# 分块提取的默认并发数，可通过 AI_EXTRACT_CONCURRENCY 调整
+DEFAULT_EXTRACT_CONCURRENCY = 4
+
+# 模型返回空内容时的提示文本，不应写入缓存
+_EMPTY_RESULTS = {
+    "AI分析完成，但返回内容为空。",
+    "AI翻译完成，但返回内容为空。",
+}
+
+# 进程内正在进行的模型调用，按缓存键合并相同请求（所有服务实例共享）
+_in_flight = SingleFlight()
+registry.register_collector(lambda: [
+    ('ai_in_flight_requests', 'gauge', 'Distinct model calls currently in flight', [({}, _in_flight.in_flight())])
+])
+
+
+def is_error_result(result) -> bool:
+    """判断 AI 调用结果是否为错误/空结果（字符串以 ❌ 开头或字典包含 error）"""
+    if isinstance(result, dict):
+        return bool(result.get('error'))
+    return not result or result.startswith('❌') or result in _EMPTY_RESULTS
+
+
+def _build_extraction_messages(content: str):
+    """构造关键信息提取的对话消息"""
+    prompt = f"""
+请分析以下文档内容，并提取其中的关键信息。请按照以下格式整理信息：
+
+📋 **主要内容摘要**
+[提供文档的核心内容摘要]
+
+🔑 **关键要点**
+[列出3-5个主要要点]
+
+📊 **重要数据/信息**
+[提取重要的数据、日期、人名、地名等]
+
+🎯 **行动项/任务**
+[如果有的话，列出需要执行的任务或行动项]
+
+💡 **关键洞察**
+[提供有价值的洞察或结论]
+
+文档内容：
+{content}
+
+请用中文回答，格式清晰易读。
+"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一个专业的文档分析助手，擅长从各种文档中提取关键信息。"
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _build_chunk_extraction_messages(chunk: str):
+    """构造单个文档片段的要点提取消息
+
+    提示词中不包含片段序号，同一片段无论位于文档何处都得到相同的缓存键。
+    """
+    prompt = f"""
+以下是一篇长文档中的一个片段。请提取该片段中的关键信息，用简洁的条目列出：
+- 内容摘要（1-2句）
+- 关键要点
+- 重要数据/信息（数字、日期、人名、地名等）
+- 行动项/任务（如果有）
+- 值得注意的洞察（如果有）
+
+文档片段：
+{chunk}
+
+请用中文回答，只输出条目，不要添加额外说明。
+"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一个专业的文档分析助手，擅长从各种文档中提取关键信息。"
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _build_reduce_messages(partials):
+    """构造把各片段要点合并为完整关键信息的消息"""
+    sections = '\n\n'.join(f'--- 第{index}部分 ---\n{partial}' for index, partial in enumerate(partials, 1))
+    prompt = f"""
+以下是同一篇文档各部分按原文顺序提取的要点。请综合全部内容，去除重复，整理为一份完整的关键信息，按照以下格式：
+
+📋 **主要内容摘要**
+[提供文档的核心内容摘要]
+
+🔑 **关键要点**
+[列出3-5个主要要点]
+
+📊 **重要数据/信息**
+[提取重要的数据、日期、人名、地名等]
+
+🎯 **行动项/任务**
+[如果有的话，列出需要执行的任务或行动项]
+
+💡 **关键洞察**
+[提供有价值的洞察或结论]
+
+各部分要点：
+{sections}
+
+请用中文回答，格式清晰易读。
+"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一个专业的文档分析助手，擅长从各种文档中提取关键信息。"
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _build_translation_messages(content: str, target_language: str):
+    """构造翻译的对话消息"""
+    prompt = f"""
+请将以下内容精准翻译为{target_language}，保留原有段落结构，不要添加额外说明或格式化符号：
+
+原文：
+{content}
+
+请仅输出翻译后的文本。
+"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一名专业的翻译专家，擅长精准保持语义和语气。"
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _build_quiz_messages(content: str):
+    """构造出题的对话消息"""
+    prompt = f"""
+请阅读以下笔记内容，然后生成一道用于巩固知识的多项选择题：
+
+笔记内容：
+{content}
+
+输出格式要求：
+{{
+  "question": "题干内容，语言请与原文一致或使用中文",
+  "options": [
+    {{"label": "A", "text": "选项内容"}},
+    {{"label": "B", "text": "选项内容"}},
+    {{"label": "C", "text": "选项内容"}},
+    {{"label": "D", "text": "选项内容"}}
+  ],
+  "answer": "正确答案的选项标识，例如A",
+  "explanation": "简要解释正确答案的原因"
+}}
+
+请严格返回JSON格式，确保可以被json.loads解析。
+"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一位专业的教学设计师，擅长围绕文本内容设计高质量的练习题。"
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def describe_ai_error(e: Exception, action: str = "处理过程中") -> str:
+    """把OpenAI客户端异常转换为面向用户的错误提示"""
+    if isinstance(e, CircuitOpenError):
+        return "❌ AI服务暂时不可用，请稍后重试"
+    if isinstance(e, DeadlineExceeded):
+        return "❌ API请求超时，请稍后重试"
+    error_str = str(e)
+    if "401" in error_str or "Unauthorized" in error_str:
+        return "❌ 认证失败，请检查GitHub Token是否有效"
+    elif "429" in error_str or "rate limit" in error_str.lower():
+        return "❌ API调用频率超限，请稍后重试"
+    elif "timeout" in error_str.lower():
+        return "❌ API请求超时，请稍后重试"
+    else:
+        return f"❌ {action}发生错误: {error_str}"
 
 
 class GitHubAIService:
     """GitHub AI API service for content analysis"""
     
     def __init__(self):
-        # 配置GitHub AI服务的端点和模型
+        # 配置GitHub AI服务的端点和模型；本地调试时可指向 benchmarks/fake_ai_server.py
         self.token = os.environ.get('GITHUB_TOKEN')
-        self.endpoint = "https://models.github.ai/inference"
-        self.model = "openai/gpt-4.1-mini"
+        self.endpoint = os.environ.get('GITHUB_AI_ENDPOINT', "https://models.github.ai/inference")
+        self.model = os.environ.get('GITHUB_AI_MODEL', "openai/gpt-4.1-mini")
+        self.extract_chunk_chars = int(os.environ.get('AI_EXTRACT_CHUNK_CHARS', DEFAULT_EXTRACT_CHUNK_CHARS))
         
         if not self.token:
             raise ValueError("GitHub token not found. Please set GITHUB_TOKEN environment variable.")
         
+        # openai SDK 导入较慢，推迟到首次创建服务（首次 AI 调用）时再导入，不拖慢冷启动
+        from openai import OpenAI
+
         # 初始化OpenAI客户端，使用GitHub AI端点
+        # GITHUB_AI_TIMEOUT（秒）限制单次请求耗时；整个调用（含重试）的截止时间由 AI_CALL_DEADLINE 控制
+        timeout = os.environ.get('GITHUB_AI_TIMEOUT')
+        self.attempt_timeout = float(timeout) if timeout else None
+        # 关闭 SDK 自带的重试，由进程共享的 AIGuard 统一做限流、退避与熔断
         self.client = OpenAI(
             base_url=self.endpoint,
             api_key=self.token,
+            max_retries=0
         )
-    
+        self.guard = get_ai_guard()
+
+    def _create_completion(self, operation: str, messages, temperature: float, max_tokens: int, stream: bool = False):
+        """发送一次 chat completion 请求，所有模型调用都经过这里
+
+        非流式调用在这里记录耗时、token 用量和错误；流式调用由 _stream_completion 在流结束时记录。
+        请求经过 AIGuard：排队等待令牌、对 429/5xx/超时按退避重试，熔断时直接失败。
+        流式调用只对建立连接阶段重试，已开始输出的流中断后不再重试。
+        """
+        def attempt(timeout):
+            if self.attempt_timeout is not None:
+                timeout = min(timeout, self.attempt_timeout)
+            return self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                top_p=1.0,
+                stream=stream,
+                timeout=timeout
+            )
+
+        started = time.perf_counter()
+        try:
+            response = self.guard.call(attempt)
+        except Exception as e:
+            record_ai_call(operation, 'stream' if stream else 'complete', started, error=e)
+            raise
+        if not stream:
+            record_ai_call(operation, 'complete', started, usage=getattr(response, 'usage', None))
+        return response
+
+    def _stream_completion(self, operation: str, messages, temperature: float, max_tokens: int):
+        """以流式方式请求模型，逐个产出增量文本"""
+        started = time.perf_counter()
+        stream = self._create_completion(operation, messages, temperature, max_tokens, stream=True)
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            record_ai_call(operation, 'stream', started, error=e)
+            raise
+        record_ai_call(operation, 'stream', started)
+
+    def _cached_call(self, operation: str, content: str, compute, language: Optional[str] = None):
+        """命中内容寻址缓存时直接返回结果，否则调用 compute() 并缓存成功结果
+
+        未命中时按缓存键单飞合并：并发的相同调用只有一个真正请求模型，其余等待并共享结果。
+        """
+        cache = get_ai_cache()
+        key = make_cache_key(operation, self.model, PROMPT_VERSIONS[operation], language, content)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        def compute_and_cache():
+            result = compute()
+            # 先写缓存再唤醒等待者，之后到达的相同调用可以直接命中缓存
+            if not is_error_result(result):
+                cache.set(key, operation, result)
+            return result
+
+        while True:
+            result, shared = _in_flight.do(key, compute_and_cache)
+            if not shared:
+                return result
+            ai_coalesced.inc(operation=operation, mode='complete')
+            if result is not None:
+                return result
+            # leader 是中途被客户端断开的流式请求，没有结果可共享，重新发起
+
+    def _cached_stream(self, operation: str, content: str, open_stream, language: Optional[str] = None):
+        """流式版本的缓存包装：命中时一次性产出完整结果，未命中时边转发边拼接，结束后写入缓存
+
+        与 _cached_call 共用单飞表：已有相同调用在进行时等待其完成，把完整结果作为一个增量产出；
+        否则由本次流式请求作为 leader，结束后把拼接结果共享给等待者。
+        """
+        cache = get_ai_cache()
+        key = make_cache_key(operation, self.model, PROMPT_VERSIONS[operation], language, content)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        while True:
+            call, leader = _in_flight.begin(key)
+            if leader:
+                break
+            result = call.wait()
+            ai_coalesced.inc(operation=operation, mode='stream')
+            if result is not None:
+                yield result
+                return
+
+        parts = []
+        result = None
+        error = None
+        try:
+            for delta in open_stream():
+                parts.append(delta)
+                yield delta
+            result = ''.join(parts).strip()
+            if not is_error_result(result):
+                cache.set(key, operation, result)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # 客户端中途断开（GeneratorExit）时 result 为 None，等待者会各自重新发起请求
+            _in_flight.finish(key, call, result=result, error=error)
+
     def extract_key_information(self, content: str) -> str:
         """
         Extract key information from content using GitHub AI API
@@ -32,47 +372,89 @@ class GitHubAIService:
         Returns:
             str: Extracted key information
         """
-        prompt = f"""
-请分析以下文档内容，并提取其中的关键信息。请按照以下格式整理信息：
+        if len(content) > self.extract_chunk_chars:
+            return self._cached_call('extract', content, lambda: self._map_reduce_extraction(content))
+        return self._cached_call('extract', content, lambda: self._request_extraction(content))
 
-📋 **主要内容摘要**
-[提供文档的核心内容摘要]
+    def stream_key_information(self, content: str):
+        """流式提取关键信息，产出增量文本；网络异常会直接抛出，由调用方处理
 
-🔑 **关键要点**
-[列出3-5个主要要点]
+        长文档先（非流式）完成各片段的提取，再以流式输出合并结果。
+        """
+        if len(content) > self.extract_chunk_chars:
+            return self._cached_stream('extract', content, lambda: self._stream_map_reduce_extraction(content))
+        return self._cached_stream(
+            'extract', content,
+            lambda: self._stream_completion('extract', _build_extraction_messages(content), temperature=0.3, max_tokens=1500)
+        )
 
-📊 **重要数据/信息**
-[提取重要的数据、日期、人名、地名等]
+    def _extract_partials(self, content: str):
+        """map 阶段：分块并发提取要点，返回 (要点列表, 错误信息)
 
-🎯 **行动项/任务**
-[如果有的话，列出需要执行的任务或行动项]
+        每个片段按自身内容单独缓存，修改某一章节后只有该章节对应的片段需要重新调用模型。
+        片段要点合起来仍然过长时，再对要点分组提取一轮，直到能放进一次合并请求。
+        """
+        max_workers = int(os.environ.get('AI_EXTRACT_CONCURRENCY', DEFAULT_EXTRACT_CONCURRENCY))
 
-💡 **关键洞察**
-[提供有价值的洞察或结论]
+        def extract_chunk(chunk):
+            return self._cached_call('extract_chunk', chunk, lambda: self._request_chunk_extraction(chunk))
 
-文档内容：
-{content}
+        units = split_content(content, self.extract_chunk_chars)
+        while True:
+            partials = run_concurrently(extract_chunk, units, max_workers)
+            for partial in partials:
+                if is_error_result(partial):
+                    return None, partial or "AI分析完成，但返回内容为空。"
+            if len(partials) <= 1 or sum(len(p) for p in partials) <= self.extract_chunk_chars:
+                return partials, None
+            # 每组至少两份要点，保证每一轮都在收敛
+            grouped = split_content('\n\n'.join(partials), self.extract_chunk_chars)
+            units = grouped if len(grouped) < len(partials) else [
+                '\n\n'.join(partials[i:i + 2]) for i in range(0, len(partials), 2)
+            ]
 
-请用中文回答，格式清晰易读。
-"""
-        
+    def _map_reduce_extraction(self, content: str) -> str:
+        """长文档的关键信息提取：分块提取要点后合并为五段式结果（不经过整体缓存）"""
+        partials, error = self._extract_partials(content)
+        if error:
+            return error
+        try:
+            response = self._create_completion(
+                'extract_reduce', _build_reduce_messages(partials), temperature=0.3, max_tokens=1500
+            )
+            if response.choices and len(response.choices) > 0:
+                return response.choices[0].message.content.strip()
+            return "AI分析完成，但返回内容为空。"
+        except Exception as e:
+            return describe_ai_error(e, "处理过程中")
+
+    def _stream_map_reduce_extraction(self, content: str):
+        partials, error = self._extract_partials(content)
+        if error:
+            yield error
+            return
+        yield from self._stream_completion(
+            'extract_reduce', _build_reduce_messages(partials), temperature=0.3, max_tokens=1500
+        )
+
+    def _request_chunk_extraction(self, chunk: str) -> str:
+        """调用模型提取单个片段的要点（不经过缓存）"""
+        try:
+            response = self._create_completion(
+                'extract_chunk', _build_chunk_extraction_messages(chunk), temperature=0.3, max_tokens=800
+            )
+            if response.choices and len(response.choices) > 0:
+                return response.choices[0].message.content.strip()
+            return "AI分析完成，但返回内容为空。"
+        except Exception as e:
+            return describe_ai_error(e, "处理过程中")
+
+    def _request_extraction(self, content: str) -> str:
+        """调用模型提取关键信息（不经过缓存）"""
         try:
             # 使用OpenAI客户端发送请求
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的文档分析助手，擅长从各种文档中提取关键信息。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model=self.model,
-                temperature=0.3,
-                max_tokens=1500,
-                top_p=1.0
+            response = self._create_completion(
+                'extract', _build_extraction_messages(content), temperature=0.3, max_tokens=1500
             )
             
             # 提取返回内容
@@ -83,99 +465,48 @@ class GitHubAIService:
                 
         except Exception as e:
             # 处理OpenAI客户端异常
-            error_str = str(e)
-            if "401" in error_str or "Unauthorized" in error_str:
-                return "❌ 认证失败，请检查GitHub Token是否有效"
-            elif "429" in error_str or "rate limit" in error_str.lower():
-                return "❌ API调用频率超限，请稍后重试"
-            elif "timeout" in error_str.lower():
-                return "❌ API请求超时，请稍后重试"
-            else:
-                return f"❌ 处理过程中发生错误: {str(e)}"
+            return describe_ai_error(e, "处理过程中")
 
     def translate_content(self, content: str, target_language: str) -> str:
         """使用GitHub AI服务将文本翻译为目标语言"""
-        prompt = f"""
-请将以下内容精准翻译为{target_language}，保留原有段落结构，不要添加额外说明或格式化符号：
-
-原文：
-{content}
+        return self._cached_call(
+            'translate', content,
+            lambda: self._request_translation(content, target_language),
+            language=target_language
+        )
 
-请仅输出翻译后的文本。
-"""
+    def stream_translation(self, content: str, target_language: str):
+        """流式翻译，产出增量文本；网络异常会直接抛出，由调用方处理"""
+        return self._cached_stream(
+            'translate', content,
+            lambda: self._stream_completion(
+                'translate', _build_translation_messages(content, target_language), temperature=0.2, max_tokens=1500
+            ),
+            language=target_language
+        )
 
+    def _request_translation(self, content: str, target_language: str) -> str:
+        """调用模型翻译文本（不经过缓存）"""
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一名专业的翻译专家，擅长精准保持语义和语气。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model=self.model,
-                temperature=0.2,
-                max_tokens=1500,
-                top_p=1.0
+            response = self._create_completion(
+                'translate', _build_translation_messages(content, target_language), temperature=0.2, max_tokens=1500
             )
 
             if response.choices and len(response.choices) > 0:
                 return response.choices[0].message.content.strip()
             return "AI翻译完成，但返回内容为空。"
         except Exception as e:
-            error_str = str(e)
-            if "401" in error_str or "Unauthorized" in error_str:
-                return "❌ 认证失败，请检查GitHub Token是否有效"
-            elif "429" in error_str or "rate limit" in error_str.lower():
-                return "❌ API调用频率超限，请稍后重试"
-            elif "timeout" in error_str.lower():
-                return "❌ API请求超时，请稍后再试"
-            else:
-                return f"❌ 翻译过程中发生错误: {str(e)}"
+            return describe_ai_error(e, "翻译过程中")
 
     def generate_quiz(self, content: str) -> Dict[str, Any]:
         """基于笔记内容生成一道多项选择题"""
-        prompt = f"""
-请阅读以下笔记内容，然后生成一道用于巩固知识的多项选择题：
-
-笔记内容：
-{content}
-
-输出格式要求：
-{{
-  "question": "题干内容，语言请与原文一致或使用中文",
-  "options": [
-    {{"label": "A", "text": "选项内容"}},
-    {{"label": "B", "text": "选项内容"}},
-    {{"label": "C", "text": "选项内容"}},
-    {{"label": "D", "text": "选项内容"}}
-  ],
-  "answer": "正确答案的选项标识，例如A",
-  "explanation": "简要解释正确答案的原因"
-}}
-
-请严格返回JSON格式，确保可以被json.loads解析。
-"""
+        return self._cached_call('quiz', content, lambda: self._request_quiz(content))
 
+    def _request_quiz(self, content: str) -> Dict[str, Any]:
+        """调用模型生成选择题（不经过缓存）"""
         try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一位专业的教学设计师，擅长围绕文本内容设计高质量的练习题。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model=self.model,
-                temperature=0.4,
-                max_tokens=1200,
-                top_p=1.0
+            response = self._create_completion(
+                'quiz', _build_quiz_messages(content), temperature=0.4, max_tokens=1200
             )
 
             if response.choices and len(response.choices) > 0:
@@ -197,15 +528,7 @@ class GitHubAIService:
                     }
             return {"error": "AI题目生成完成，但返回内容为空。"}
         except Exception as e:
-            error_str = str(e)
-            if "401" in error_str or "Unauthorized" in error_str:
-                return {"error": "❌ 认证失败，请检查GitHub Token是否有效"}
-            elif "429" in error_str or "rate limit" in error_str.lower():
-                return {"error": "❌ API调用频率超限，请稍后重试"}
-            elif "timeout" in error_str.lower():
-                return {"error": "❌ API请求超时，请稍后重试"}
-            else:
-                return {"error": f"❌ 生成题目时发生错误: {str(e)}"}
+            return {"error": describe_ai_error(e, "生成题目时")}
 
 
 # Global instance
@@ -248,6 +571,25 @@ def translate_note_content(content: str, target_language: str) -> str:
         return f"❌ 服务初始化失败: {str(e)}"
 
 
+def translate_note_content_batch(content: str, languages) -> Dict[str, Dict[str, Any]]:
+    """并发地把内容翻译为多种语言
+
+    Returns:
+        dict: 语言 -> {"status": "ok"/"error", "translation" 或 "error", "latency_ms"}
+    """
+    max_workers = int(os.environ.get('AI_TRANSLATE_CONCURRENCY', DEFAULT_TRANSLATE_CONCURRENCY))
+
+    def translate_one(language):
+        started = time.perf_counter()
+        translation = translate_note_content(content, language)
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        if is_error_result(translation):
+            return language, {'status': 'error', 'error': translation or '翻译结果为空', 'latency_ms': latency_ms}
+        return language, {'status': 'ok', 'translation': translation, 'latency_ms': latency_ms}
+
+    return dict(run_concurrently(translate_one, languages, max_workers))
+
+
 def generate_quiz_question(content: str) -> Dict[str, Any]:
     """对外暴露的自动出题功能入口"""
     try:
@@ -256,4 +598,14 @@ def generate_quiz_question(content: str) -> Dict[str, Any]:
     except ValueError as e:
         return {"error": f"❌ 配置错误: {str(e)}", "needsToken": True}
     except Exception as e:
-        return {"error": f"❌ 服务初始化失败: {str(e)}"}
\ No newline at end of file
+        return {"error": f"❌ 服务初始化失败: {str(e)}"}
+
+
+def stream_key_info(content: str):
+    """对外暴露的流式提取入口；配置错误时抛出 ValueError"""
+    return get_ai_service().stream_key_information(content)
+
+
+def stream_translation(content: str, target_language: str):
+    """对外暴露的流式翻译入口；配置错误时抛出 ValueError"""
+    return get_ai_service().stream_translation(content, target_language)
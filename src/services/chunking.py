@@ -0,0 +1,102 @@
+"""长文本分块
+
+按标题与段落边界把笔记切成不超过 max_chars 的块，供分块提取（map-reduce）使用。
+块边界总是落在章节标题处，修改某一章节不会改变其他章节切出的块，
+因此按块缓存的结果在编辑其他章节后仍能命中。
+"""
+
+import re
+
+# Markdown 标题行（# 到 ######）或 “一、” “1.” 这类编号标题
+_HEADING = re.compile(r'^(#{1,6}\s|[一二三四五六七八九十]+、|\d+[.、]\s*\S)')
+# 句末标点之后的位置，用于切分过长的段落
+_SENTENCE_END = re.compile(r'(?<=[。！？!?；;.])\s*')
+
+
+def _sections(content):
+    """把文本拆成以标题开头的章节，每个章节再拆成段落（空行分隔）"""
+    sections = []
+    current = []
+    paragraph = []
+
+    def flush_paragraph():
+        if paragraph:
+            current.append('\n'.join(paragraph).strip())
+            paragraph.clear()
+
+    for line in content.splitlines():
+        if _HEADING.match(line.strip()) and (current or paragraph):
+            flush_paragraph()
+            sections.append(current)
+            current = []
+        if not line.strip():
+            flush_paragraph()
+            continue
+        paragraph.append(line)
+    flush_paragraph()
+    if current:
+        sections.append(current)
+    return [[p for p in section if p] for section in sections if any(section)]
+
+
+def _split_long(text, max_chars):
+    """把超长段落按句子切分，单句仍超长时按字符硬切"""
+    pieces = []
+    current = ''
+    for sentence in (s for s in _SENTENCE_END.split(text) if s):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) > max_chars:
+            pieces.append(current)
+            current = ''
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _pack(units, max_chars, separator):
+    """把有序的文本单元贪心地合并为不超过 max_chars 的块"""
+    chunks = []
+    current = []
+    size = 0
+    for unit in units:
+        added = len(unit) + (len(separator) if current else 0)
+        if current and size + added > max_chars:
+            chunks.append(separator.join(current))
+            current, size = [], 0
+            added = len(unit)
+        current.append(unit)
+        size += added
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def split_content(content, max_chars):
+    """按章节/段落边界把 content 切成若干不超过 max_chars 的块
+
+    每个章节（标题到下一个标题之间）至少独占一块；章节过长时在段落间切分，
+    段落过长时在句子间切分。
+    """
+    content = content.strip()
+    if len(content) <= max_chars:
+        return [content] if content else []
+
+    chunks = []
+    for section in _sections(content):
+        text = '\n\n'.join(section)
+        if len(text) <= max_chars:
+            chunks.append(text)
+            continue
+        units = []
+        for paragraph in section:
+            units.extend(_split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph])
+        chunks.extend(_pack(units, max_chars, '\n\n'))
+
+    # 不跨章节合并：某一章节的长度变化不会挪动其他章节的块边界
+    return chunks
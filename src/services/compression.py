@@ -0,0 +1,189 @@
+"""HTTP 响应压缩（gzip / brotli）
+
+按 Accept-Encoding 协商编码：安装了 brotli 包时优先 br，否则 gzip；客户端的 q 值优先于服务端顺序。
+
+- 普通响应：正文达到 COMPRESS_MIN_SIZE 字节才压缩，小响应压缩后几乎不变小，只会多花 CPU
+- 流式响应（SSE、NDJSON 导出等）：无法预知大小，总是压缩，并在每个数据块后做一次同步刷新
+  （Z_SYNC_FLUSH / brotli flush），客户端收到的每一块都能立即解码，不会被压缩缓冲区攒住
+- 已带 Content-Encoding、Cache-Control: no-transform、send_file 直出的文件、
+  204/206/304 以及非文本类型的响应保持原样
+- 压缩后的响应使用不同的强 ETag（追加 -gzip / -br 后缀）；请求中 If-Match / If-None-Match
+  携带的后缀会在路由处理前去掉，路由里的版本比较不受影响
+
+配置（环境变量）：
+    COMPRESS_ENABLED（默认 1）：设为 0 关闭响应压缩（例如由前置代理负责压缩时）
+    COMPRESS_MIN_SIZE（字节，默认 1024）：普通响应的压缩阈值
+    COMPRESS_LEVEL（默认 6）：gzip 压缩级别 1-9
+    COMPRESS_BROTLI_QUALITY（默认 4）：brotli 质量 0-11，动态响应用中等质量即可
+    COMPRESS_STREAMS（默认 1）：设为 0 时流式响应不压缩
+"""
+
+import os
+import re
+import zlib
+
+from flask import g, request
+
+from src.services.metrics import registry
+
+COMPRESSIBLE_TYPES = frozenset((
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'image/svg+xml', 'text/event-stream'
+))
+# 请求条件头中由本模块追加的 ETag 后缀
+_ETAG_SUFFIX = re.compile(r'-(gzip|br)"')
+
+compressed_responses = registry.counter(
+    'http_compressed_responses_total', 'Responses sent with a content coding', ('encoding', 'mode')
+)
+compression_bytes = registry.counter(
+    'http_compression_bytes_total', 'Bytes before and after compressing buffered responses', ('stage',)
+)
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        # wbits=31：输出带 gzip 头尾的流
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, brotli, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ResponseCompressor:
+    """在 after_request 中压缩响应"""
+
+    def __init__(self, min_size=1024, level=6, brotli_quality=4, compress_streams=True):
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.compress_streams = compress_streams
+        self.brotli = _brotli()
+        self.encodings = ('br', 'gzip') if self.brotli else ('gzip',)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+            level=int(os.environ.get('COMPRESS_LEVEL', 6)),
+            brotli_quality=int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4)),
+            compress_streams=os.environ.get('COMPRESS_STREAMS', '1') != '0'
+        )
+
+    def _encoder(self, encoding):
+        if encoding == 'br':
+            return _BrotliEncoder(self.brotli, self.brotli_quality)
+        return _GzipEncoder(self.level)
+
+    def strip_etag_suffix(self):
+        """去掉条件请求头中的编码后缀，记下来供 304 响应回填"""
+        for header in ('HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH'):
+            value = request.environ.get(header)
+            if value and _ETAG_SUFFIX.search(value):
+                g.compression_etag_suffix = _ETAG_SUFFIX.search(value).group(1)
+                request.environ[header] = _ETAG_SUFFIX.sub('"', value)
+
+    def _compressible(self, response):
+        mimetype = response.mimetype or ''
+        if mimetype not in COMPRESSIBLE_TYPES and not mimetype.startswith('text/'):
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if request.method == 'HEAD' or response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        return 'no-transform' not in response.headers.get('Cache-Control', '')
+
+    def process(self, response):
+        if response.status_code == 304:
+            # 客户端缓存的是压缩版本，304 沿用同一个带后缀的 ETag
+            suffix = g.get('compression_etag_suffix')
+            tag, weak = response.get_etag()
+            if suffix and tag and not tag.endswith(f'-{suffix}'):
+                response.set_etag(f'{tag}-{suffix}', weak)
+            return response
+        if not self._compressible(response):
+            return response
+
+        # 是否压缩取决于 Accept-Encoding，共享缓存需要按它区分
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            if not self.compress_streams:
+                return response
+            response.response = self._stream(response.iter_encoded(), response.response, self._encoder(encoding))
+            response.headers.pop('Content-Length', None)
+            mode = 'stream'
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            encoder = self._encoder(encoding)
+            compressed = encoder.compress(data) + encoder.finish()
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+            compression_bytes.inc(len(data), stage='in')
+            compression_bytes.inc(len(compressed), stage='out')
+            mode = 'buffered'
+
+        response.headers['Content-Encoding'] = encoding
+        tag, weak = response.get_etag()
+        if tag:
+            response.set_etag(f'{tag}-{encoding}', weak)
+        compressed_responses.inc(encoding=encoding, mode=mode)
+        return response
+
+    @staticmethod
+    def _stream(chunks, source, encoder):
+        try:
+            for chunk in chunks:
+                data = encoder.chunk(chunk)
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            # 客户端断开时 Werkzeug 关闭的是外层生成器，需要把关闭传递给原始响应体
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+
+def init_app(app):
+    """注册压缩钩子；COMPRESS_ENABLED=0 时不做任何事"""
+    if os.environ.get('COMPRESS_ENABLED', '1') == '0':
+        return None
+    compressor = ResponseCompressor.from_env()
+    app.before_request(compressor.strip_etag_suffix)
+    app.after_request(compressor.process)
+    return compressor
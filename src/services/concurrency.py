@@ -0,0 +1,30 @@
+"""有界并发执行工具
+
+AI 调用属于 I/O 密集型操作，用线程池并发执行即可显著降低总耗时。
+子线程会继承调用方的 Flask 应用上下文，保证其中的数据库缓存等功能可用。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+
+def run_concurrently(func, items, max_workers):
+    """在最多 max_workers 个线程中对每个元素执行 func，按输入顺序返回结果
+
+    func 抛出的异常会在取结果时原样抛出，调用方需要自行在 func 内部处理错误。
+    """
+    items = list(items)
+    if len(items) <= 1 or max_workers <= 1:
+        return [func(item) for item in items]
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def call(item):
+        if app is None:
+            return func(item)
+        with app.app_context():
+            return func(item)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(call, items))
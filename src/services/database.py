@@ -0,0 +1,182 @@
+"""数据库引擎与连接池配置
+
+按部署形态选择连接池策略（环境变量 DB_POOL_MODE，默认 auto）：
+- serverless：使用 NullPool，每个请求用完即关闭连接。函数实例随时被冻结或回收，
+  池中连接跨冻结期后往往已被服务端断开；应配合外部连接池（PgBouncer、Neon/Supabase
+  的 pooler 地址）使用，由外部连接池负责复用物理连接。
+- server：长期运行的进程使用有上限的 QueuePool，借出前 pre-ping 检测失效连接，
+  并定期回收，避免空闲连接被数据库或负载均衡器超时断开后报错。
+- auto：检测到 Vercel / AWS Lambda 环境变量时按 serverless，否则按 server。
+
+QueuePool 参数：DB_POOL_SIZE（默认 5）、DB_MAX_OVERFLOW（默认 10）、
+DB_POOL_TIMEOUT（秒，默认 30）、DB_POOL_RECYCLE（秒，默认 1800）。
+
+只读副本：DATABASE_REPLICA_URLS（逗号分隔）中的每个地址注册为 replica_N bind，
+使用与主库相同的连接池策略，读请求的路由见 src/services/replicas.py。
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+POOL_MODES = ('auto', 'serverless', 'server')
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_POOL_RECYCLE = 1800
+# 这些环境变量存在即视为运行在无服务器平台
+SERVERLESS_ENV_VARS = ('VERCEL', 'AWS_LAMBDA_FUNCTION_NAME', 'FUNCTIONS_WORKER_RUNTIME')
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def _normalize_url(database_url):
+    if database_url.startswith('postgres://'):
+        return database_url.replace('postgres://', 'postgresql://', 1)
+    return database_url
+
+
+def resolve_database_url():
+    """读取 DATABASE_URL 并兼容旧的 postgres:// 前缀；未设置时返回 None"""
+    database_url = os.getenv('DATABASE_URL')
+    return _normalize_url(database_url) if database_url else None
+
+
+def resolve_replica_urls():
+    """读取 DATABASE_REPLICA_URLS（逗号分隔）；未设置时返回空列表"""
+    urls = os.getenv('DATABASE_REPLICA_URLS', '').split(',')
+    return [_normalize_url(url.strip()) for url in urls if url.strip()]
+
+
+def get_pool_mode():
+    """返回实际生效的连接池模式：serverless 或 server"""
+    mode = os.environ.get('DB_POOL_MODE', 'auto').lower()
+    if mode not in POOL_MODES:
+        raise ValueError(f"DB_POOL_MODE 必须是 {'/'.join(POOL_MODES)} 之一")
+    if mode == 'auto':
+        return 'serverless' if any(os.environ.get(name) for name in SERVERLESS_ENV_VARS) else 'server'
+    return mode
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def build_engine_options(database_uri, mode=None):
+    """根据数据库地址与部署模式生成 SQLALCHEMY_ENGINE_OPTIONS"""
+    url = make_url(database_uri)
+    if _is_memory_sqlite(url):
+        # 内存库只能存在于单个连接中，保留 Flask-SQLAlchemy 默认的 StaticPool
+        return {}
+
+    mode = mode or get_pool_mode()
+    if mode == 'serverless':
+        return {'poolclass': NullPool}
+
+    return {
+        'poolclass': QueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE)),
+        'pool_pre_ping': True,
+    }
+
+
+def configure_database(app, database_uri, mode=None, replica_uris=()):
+    """把数据库地址、只读副本和连接池参数写入 Flask 配置，需在 db.init_app 之前调用"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(database_uri, mode)
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'{REPLICA_BIND_PREFIX}{index}': {'url': uri, **build_engine_options(uri, mode)}
+        for index, uri in enumerate(replica_uris)
+    }
+
+
+class PoolStats:
+    """通过连接池事件统计物理连接的建立、借出与失效次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0  # 新建的物理连接
+        self.checkouts = 0  # 从池中借出
+        self.invalidations = 0  # pre-ping 失败或出错被丢弃的连接
+        self.connect_seconds = 0.0  # 建立物理连接的累计耗时
+
+    def attach(self, engine):
+        # 用首个 connect 事件之前的时间近似建连耗时
+        @event.listens_for(engine, 'do_connect')
+        def _before_connect(dialect, conn_rec, cargs, cparams):
+            conn_rec.info['connect_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, conn_rec):
+            started = conn_rec.info.pop('connect_started', None)
+            with self._lock:
+                self.connects += 1
+                if started is not None:
+                    self.connect_seconds += time.perf_counter() - started
+
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_connection, conn_rec, conn_proxy):
+            with self._lock:
+                self.checkouts += 1
+
+        @event.listens_for(engine, 'invalidate')
+        def _on_invalidate(dbapi_connection, conn_rec, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'invalidations': self.invalidations,
+                'avg_connect_ms': round(self.connect_seconds / self.connects * 1000, 3) if self.connects else None,
+                # 借出次数与建连次数之比，越高说明连接复用得越好
+                'reuse_ratio': round(1 - self.connects / self.checkouts, 4) if self.checkouts else None,
+            }
+
+
+_pool_stats = {}
+_pool_stats_lock = threading.Lock()
+
+
+def get_pool_stats(engine):
+    """Get or create the event-based counters for an engine"""
+    with _pool_stats_lock:
+        stats = _pool_stats.get(engine)
+        if stats is None:
+            stats = PoolStats()
+            stats.attach(engine)
+            _pool_stats[engine] = stats
+    return stats
+
+
+def instrument_pool(engine):
+    """在引擎上挂载连接池计数器；应在建立第一个连接之前（应用启动时）调用，统计才完整"""
+    get_pool_stats(engine)
+
+
+def describe_pool(engine):
+    """返回连接池类型、当前占用情况与累计统计"""
+    pool = engine.pool
+    info = {
+        'mode': 'memory' if _is_memory_sqlite(engine.url) else get_pool_mode(),
+        'pool_class': type(pool).__name__,
+        'dialect': engine.dialect.name,
+    }
+    if isinstance(pool, QueuePool):
+        info.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+        })
+    info.update(get_pool_stats(engine).snapshot())
+    return info
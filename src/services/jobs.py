@@ -0,0 +1,327 @@
+"""AI 异步任务队列
+
+提取/翻译/出题请求以任务形式写入 ai_job 表后立即返回，由执行器在后台调用模型，
+并把结果写回任务记录和对应笔记的字段。
+
+执行方式由环境变量 AI_JOB_MODE 决定：
+- thread（默认，适合本地开发）：在当前进程的有界线程池中执行
+- inline：在提交任务的请求内同步执行；serverless 模式下 thread 自动改为 inline，
+  因为函数实例在响应发出后会被冻结，后台线程中的任务永远不会完成
+- external（适合生产/Vercel）：任务仅入队，由独立的 `python -m src.worker` 进程领取执行
+
+thread / inline 模式没有独立 worker，提交和查询任务时会顺带（至多每 STALE_CHECK_INTERVAL 秒一次）
+把执行超时的任务重新排队，并重新提交本进程没有在执行的排队任务。
+
+并发上限由 AI_JOB_CONCURRENCY 控制，默认 4。
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from src.models.job import AIJob, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from src.models.note import Note, content_hash
+from src.models.user import db
+
+JOB_MODES = ('thread', 'inline', 'external')
+DEFAULT_CONCURRENCY = 4
+# 运行超过该时长仍未结束的任务视为执行进程已退出，将被重新排队
+STALE_JOB_SECONDS = 300
+MAX_ATTEMPTS = 3
+# thread / inline 模式下两次检查超时任务的最小间隔（秒）
+STALE_CHECK_INTERVAL = 30
+
+_last_stale_check = 0.0
+_stale_check_lock = threading.Lock()
+_serverless_warned = False
+
+
+class JobError(Exception):
+    """AI 调用返回错误结果"""
+
+
+def _run_extract(payload):
+    from src.services.ai_service import extract_key_info, is_error_result
+
+    extracted_info = extract_key_info(payload['content'])
+    if is_error_result(extracted_info):
+        raise JobError(extracted_info)
+    return {'extracted_info': extracted_info}
+
+
+def _run_translate(payload):
+    from src.services.ai_service import is_error_result, translate_note_content, translate_note_content_batch
+
+    if 'languages' in payload:
+        results = translate_note_content_batch(payload['content'], payload['languages'])
+        if not any(r['status'] == 'ok' for r in results.values()):
+            raise JobError('; '.join(r['error'] for r in results.values()))
+        return {'results': results, 'languages': payload['languages']}
+
+    translation = translate_note_content(payload['content'], payload['language'])
+    if is_error_result(translation):
+        raise JobError(translation)
+    return {'translation': translation, 'language': payload['language']}
+
+
+def _run_quiz(payload):
+    from src.services.ai_service import generate_quiz_question, is_error_result
+
+    quiz_payload = generate_quiz_question(payload['content'])
+    if not isinstance(quiz_payload, dict):
+        raise JobError('题目生成失败，请稍后重试')
+    if is_error_result(quiz_payload):
+        raise JobError(quiz_payload.get('error'))
+    return {'quiz': quiz_payload}
+
+
+def _apply_translate(note, result, source_hash):
+    if 'results' in result:
+        note.apply_translations({
+            lang: r['translation'] for lang, r in result['results'].items() if r['status'] == 'ok'
+        }, source_hash)
+    else:
+        note.apply_translation(result['language'], result['translation'], source_hash)
+
+
+# 操作名 -> (执行函数, 把结果写回笔记的函数)；写回函数额外接收生成时所用正文的摘要
+OPERATIONS = {
+    'extract': (_run_extract, lambda note, result, source_hash: note.apply_extracted_info(
+        result['extracted_info'], source_hash)),
+    'translate': (_run_translate, _apply_translate),
+    'quiz': (_run_quiz, lambda note, result, source_hash: note.apply_quiz(result['quiz'], source_hash)),
+}
+
+
+def create_job(operation, payload, note_id=None):
+    """写入一条排队中的任务"""
+    if operation not in OPERATIONS:
+        raise ValueError(f'未知的任务类型: {operation}')
+    job = AIJob(
+        operation=operation,
+        note_id=note_id,
+        payload=json.dumps(payload, ensure_ascii=False),
+        status=JOB_QUEUED
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def get_job_mode():
+    """实际生效的执行方式；serverless 模式下 thread 改为 inline"""
+    global _serverless_warned
+    mode = os.environ.get('AI_JOB_MODE', 'thread').lower()
+    if mode not in JOB_MODES:
+        raise ValueError(f"AI_JOB_MODE 必须是 {'/'.join(JOB_MODES)} 之一")
+    if mode == 'thread':
+        from src.services.database import get_pool_mode
+
+        if get_pool_mode() == 'serverless':
+            if not _serverless_warned:
+                _serverless_warned = True
+                print('Warning: AI_JOB_MODE=thread is not supported in serverless mode; jobs run inline. '
+                      'Use AI_JOB_MODE=external with a worker to run them in the background.')
+            return 'inline'
+    return mode
+
+
+def submit_job(operation, payload, note_id=None):
+    """创建任务并按 AI_JOB_MODE 分派执行；AI_JOB_MODE 无效时抛出 ValueError，不创建任务"""
+    # 先校验模式再写入任务行，否则配置错误时每个请求都会留下无人执行的排队任务
+    mode = get_job_mode()
+    job = create_job(operation, payload, note_id)
+    if mode == 'thread':
+        recover_jobs(current_app._get_current_object())
+        get_job_runner(current_app._get_current_object()).submit(job.id)
+    elif mode == 'inline':
+        recover_jobs(current_app._get_current_object())
+        execute_job(job.id)
+        db.session.refresh(job)
+    return job
+
+
+def recover_jobs(app, job=None):
+    """没有独立 worker 时恢复中断的任务（thread / inline 模式，提交或查询任务时调用）
+
+    至多每 STALE_CHECK_INTERVAL 秒把执行超时的任务重新排队；thread 模式下把排队中的任务
+    重新交给本进程的执行器（执行器按 id 去重，claim_job 保证只执行一次）。
+    inline 模式下被查询的任务仍在排队时，直接在本次请求中执行。
+    """
+    global _last_stale_check
+    mode = get_job_mode()
+    if mode == 'external':
+        return
+    with _stale_check_lock:
+        due = time.monotonic() - _last_stale_check >= STALE_CHECK_INTERVAL
+        if due:
+            _last_stale_check = time.monotonic()
+    if due:
+        requeue_stale_jobs()
+        if mode == 'thread':
+            runner = get_job_runner(app)
+            for job_id in fetch_queued_job_ids(runner.max_workers):
+                runner.submit(job_id)
+    if mode == 'inline' and job is not None:
+        db.session.refresh(job)
+        if job.status == JOB_QUEUED:
+            execute_job(job.id)
+            db.session.refresh(job)
+
+
+def claim_job(job_id):
+    """原子地把任务从 queued 改为 running，多个执行器竞争时只有一个成功"""
+    claimed = db.session.execute(
+        update(AIJob)
+        .where(AIJob.id == job_id, AIJob.status == JOB_QUEUED)
+        .values(status=JOB_RUNNING, started_at=datetime.utcnow(), attempts=AIJob.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.session.commit()
+    return claimed
+
+
+def execute_job(job_id):
+    """领取并执行任务；成功时把结果写回笔记，返回是否由本次调用执行"""
+    if not claim_job(job_id):
+        return False
+
+    job = db.session.get(AIJob, job_id)
+    run, apply_to_note = OPERATIONS[job.operation]
+    payload = job.get_payload()
+    try:
+        result = run(payload)
+    except Exception as e:
+        if not isinstance(e, JobError):
+            traceback.print_exc()
+        job.status = JOB_FAILED
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+
+    saved = False
+    if job.note_id is not None:
+        note = db.session.get(Note, job.note_id)
+        if note is not None:
+            apply_to_note(note, result, content_hash(payload['content']))
+            saved = True
+    result['saved'] = saved
+    job.result = json.dumps(result, ensure_ascii=False)
+    job.status = JOB_SUCCEEDED
+    job.finished_at = datetime.utcnow()
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        db.session.execute(
+            update(AIJob).where(AIJob.id == job_id)
+            .values(status=JOB_FAILED, error=f'保存结果失败: {str(e)}', finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+    return True
+
+
+def fetch_queued_job_ids(limit):
+    """按创建顺序取出待执行的任务 id"""
+    return list(db.session.execute(
+        select(AIJob.id).where(AIJob.status == JOB_QUEUED).order_by(AIJob.created_at).limit(limit)
+    ).scalars())
+
+
+def requeue_stale_jobs(stale_seconds=STALE_JOB_SECONDS):
+    """把执行超时的任务重新排队；超过最大尝试次数的直接标记失败"""
+    deadline = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    stale = (AIJob.status == JOB_RUNNING) & (AIJob.started_at < deadline)
+    db.session.execute(
+        update(AIJob).where(stale, AIJob.attempts < MAX_ATTEMPTS)
+        .values(status=JOB_QUEUED).execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(AIJob).where(stale, AIJob.attempts >= MAX_ATTEMPTS)
+        .values(status=JOB_FAILED, error='任务执行超时', finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+class JobRunner:
+    """进程内的有界线程池执行器"""
+
+    def __init__(self, app, max_workers=DEFAULT_CONCURRENCY):
+        self.app = app
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-job')
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id):
+        with self._lock:
+            if job_id in self._inflight:
+                return
+            self._inflight.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def inflight(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                execute_job(job_id)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._inflight.discard(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner(app):
+    """Get or create the in-process job runner"""
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                concurrency = int(os.environ.get('AI_JOB_CONCURRENCY', DEFAULT_CONCURRENCY))
+                _job_runner = JobRunner(app, concurrency)
+    return _job_runner
+
+
+def run_worker(app, concurrency=DEFAULT_CONCURRENCY, poll_interval=1.0, once=False):
+    """独立 worker 主循环：轮询排队任务并以有界并发执行
+
+    Args:
+        once: 为 True 时处理完当前队列后退出（便于定时任务或调试）
+    """
+    runner = JobRunner(app, concurrency)
+    try:
+        while True:
+            with app.app_context():
+                requeue_stale_jobs()
+                free_slots = concurrency - runner.inflight()
+                job_ids = fetch_queued_job_ids(free_slots) if free_slots > 0 else []
+                db.session.remove()
+            for job_id in job_ids:
+                runner.submit(job_id)
+            if once and not job_ids and runner.inflight() == 0:
+                break
+            time.sleep(poll_interval if not job_ids else 0.05)
+    finally:
+        runner.shutdown(wait=True)
@@ -0,0 +1,299 @@
+"""进程内指标与 Prometheus 文本输出
+
+- 每个路由的请求耗时直方图（按 Flask 路由规则而不是实际路径聚合，避免标签爆炸）
+- 每个请求执行的 SQL 语句数与耗时（SQLAlchemy 引擎事件）
+- AI 调用耗时、token 用量与按异常类型统计的错误数（GitHubAIService），以及被单飞合并的调用数
+
+指标通过 `GET /api/metrics` 以 Prometheus 文本格式输出。设置 METRICS_LOG=json 时，
+每个请求结束后另外打印一行 JSON 日志（路由、状态码、耗时、SQL 次数与耗时）。
+
+记录一次观测只需在锁内做一次二分查找与几次加法，对请求路径的额外开销可以忽略。
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+# 请求与 AI 调用耗时的分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 单个请求 SQL 语句数的分桶
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器，按标签值分组"""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    """固定分桶的直方图，输出 _bucket / _sum / _count"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # 标签值 -> [各分桶计数..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        samples = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', _format_labels(self.labelnames, key, ('le', _format_value(float(bound)))), cumulative))
+            samples.append((f'{self.name}_bucket', _format_labels(self.labelnames, key, ('le', '+Inf')), state[-1]))
+            samples.append((f'{self.name}_sum', _format_labels(self.labelnames, key), round(state[-2], 6)))
+            samples.append((f'{self.name}_count', _format_labels(self.labelnames, key), state[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表；collectors 在输出时按需采集外部状态（如缓存命中数）"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """collect() 返回 [(指标名, 类型, 说明, [(标签字典, 值), ...]), ...]"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        """按 Prometheus 文本格式输出全部指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in metric.samples())
+        for collect in collectors:
+            try:
+                families = collect()
+            except Exception:
+                # 采集外部状态失败时跳过，不影响其余指标输出
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {type_name}')
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f'{name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')
+)
+http_request_sql_statements = registry.histogram(
+    'http_request_sql_statements', 'SQL statements executed per HTTP request', ('route',), SQL_COUNT_BUCKETS
+)
+http_request_sql_duration = registry.histogram(
+    'http_request_sql_duration_seconds', 'Total SQL execution time per HTTP request', ('route',)
+)
+db_statements = registry.counter('db_statements_total', 'SQL statements executed', ())
+db_statement_duration = registry.counter('db_statement_duration_seconds_total', 'Total SQL execution time', ())
+ai_request_duration = registry.histogram(
+    'ai_request_duration_seconds', 'Model call latency', ('operation', 'mode', 'outcome')
+)
+ai_tokens = registry.counter('ai_tokens_total', 'Tokens reported by the model', ('operation', 'kind'))
+ai_errors = registry.counter('ai_errors_total', 'Failed model calls by exception class', ('operation', 'error'))
+ai_coalesced = registry.counter(
+    'ai_coalesced_total', 'Model calls that joined an identical in-flight call instead of calling upstream', ('operation', 'mode')
+)
+
+
+def _route_label():
+    # 未匹配任何路由的请求（如扫描 404）统一归为 unmatched，避免标签基数失控
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def instrument_engine(engine):
+    """监听 SQL 执行事件，累计全局与当前请求的语句数和耗时"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        db_statements.inc()
+        db_statement_duration.inc(elapsed)
+        if has_request_context():
+            g.metrics_sql_count = g.get('metrics_sql_count', 0) + 1
+            g.metrics_sql_seconds = g.get('metrics_sql_seconds', 0.0) + elapsed
+
+
+def _collect_ai_cache():
+    from src.services.ai_cache import get_ai_cache
+
+    stats = get_ai_cache().stats()
+    return [
+        ('ai_cache_hits_total', 'counter', 'AI result cache hits', [({}, stats['hits'])]),
+        ('ai_cache_misses_total', 'counter', 'AI result cache misses', [({}, stats['misses'])]),
+    ]
+
+
+def _collect_db_pool(engine):
+    from src.services.database import describe_pool
+
+    pool = describe_pool(engine)
+    labels = {'pool_class': pool['pool_class']}
+    families = [
+        ('db_pool_connects_total', 'counter', 'New DBAPI connections opened', [(labels, pool['connects'])]),
+        ('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool', [(labels, pool['checkouts'])]),
+        ('db_pool_invalidations_total', 'counter', 'Connections discarded as invalid', [(labels, pool['invalidations'])]),
+    ]
+    if 'checked_out' in pool:
+        families.append(('db_pool_checked_out', 'gauge', 'Connections currently checked out', [(labels, pool['checked_out'])]))
+    return families
+
+
+def init_app(app, engine):
+    """注册请求计时钩子、SQL 事件监听以及缓存/连接池采集器"""
+    log_json = os.environ.get('METRICS_LOG', '').lower() == 'json'
+    instrument_engine(engine)
+    registry.register_collector(_collect_ai_cache)
+    registry.register_collector(lambda: _collect_db_pool(engine))
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_seconds = 0.0
+
+    @app.after_request
+    def _record_request(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        # 流式响应（SSE）在这里只统计到首字节为止
+        elapsed = time.perf_counter() - started
+        route = _route_label()
+        sql_count = g.get('metrics_sql_count', 0)
+        sql_seconds = g.get('metrics_sql_seconds', 0.0)
+        http_request_duration.observe(elapsed, method=request.method, route=route, status=str(response.status_code))
+        http_request_sql_statements.observe(sql_count, route=route)
+        http_request_sql_duration.observe(sql_seconds, route=route)
+        if log_json:
+            print(json.dumps({
+                'ts': datetime.utcnow().isoformat(),
+                'method': request.method,
+                'route': route,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 3),
+                'sql_count': sql_count,
+                'sql_ms': round(sql_seconds * 1000, 3)
+            }, ensure_ascii=False), flush=True)
+        return response
+
+
+def record_ai_call(operation, mode, started, usage=None, error=None):
+    """记录一次模型调用；usage 为响应中的 token 用量对象，error 为抛出的异常"""
+    outcome = 'error' if error is not None else 'ok'
+    ai_request_duration.observe(time.perf_counter() - started, operation=operation, mode=mode, outcome=outcome)
+    if error is not None:
+        ai_errors.inc(operation=operation, error=type(error).__name__)
+    if usage is not None:
+        ai_tokens.inc(getattr(usage, 'prompt_tokens', 0) or 0, operation=operation, kind='prompt')
+        ai_tokens.inc(getattr(usage, 'completion_tokens', 0) or 0, operation=operation, kind='completion')
+
+
+def metrics_response():
+    return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
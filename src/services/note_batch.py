@@ -0,0 +1,176 @@
+"""笔记批量写入
+
+把混合的 create/update/delete 操作按块执行：每块内先批量插入、再按主键批量更新、
+最后批量删除，整块在一个事务中提交。块大小不超过操作总数时即为单事务。
+"""
+
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+from src.models.note import Note, NoteTombstone, content_hash, delete_note_children
+from src.models.user import db
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+MAX_BATCH_OPERATIONS = 10000
+OPERATION_TYPES = ('create', 'update', 'delete')
+
+
+class BatchValidationError(ValueError):
+    """批量请求中存在格式错误的操作"""
+
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.results = results
+
+
+def validate_operations(operations):
+    """校验所有操作，任一不合法时抛出 BatchValidationError 并附带逐项结果"""
+    if not isinstance(operations, list) or not operations:
+        raise BatchValidationError('operations 必须是非空数组', [])
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchValidationError(f'单次最多提交 {MAX_BATCH_OPERATIONS} 个操作', [])
+
+    results = []
+    valid = True
+    for index, op in enumerate(operations):
+        error = _validate_operation(op)
+        results.append({
+            'index': index,
+            'op': op.get('op') if isinstance(op, dict) else None,
+            'status': 400 if error else None,
+            'error': error
+        })
+        valid = valid and error is None
+    if not valid:
+        raise BatchValidationError('存在不合法的操作', [r for r in results if r['error']])
+
+
+def _validate_operation(op):
+    if not isinstance(op, dict):
+        return '操作必须是对象'
+    kind = op.get('op')
+    if kind not in OPERATION_TYPES:
+        return f"op 必须是 {'/'.join(OPERATION_TYPES)} 之一"
+    if kind == 'create':
+        if not isinstance(op.get('title'), str) or not isinstance(op.get('content'), str):
+            return 'Title and content are required'
+        return None
+    if not isinstance(op.get('id'), int):
+        return 'id 必须是整数'
+    if kind == 'update':
+        if 'title' not in op and 'content' not in op:
+            return 'No data provided'
+        for field in ('title', 'content'):
+            if field in op and not isinstance(op[field], str):
+                return f'{field} 必须是字符串'
+    return None
+
+
+def execute_batch(operations, chunk_size=DEFAULT_CHUNK_SIZE):
+    """分块执行已校验的操作，返回 (按输入顺序排列的逐项结果, 已提交的块数)
+
+    某一块执行失败时该块回滚，其后的块不再执行并标记为 skipped。
+    """
+    chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+    results = [None] * len(operations)
+    committed_chunks = 0
+    failed = None
+
+    for start in range(0, len(operations), chunk_size):
+        indexed = list(enumerate(operations[start:start + chunk_size], start))
+        if failed is not None:
+            for index, op in indexed:
+                results[index] = {'index': index, 'op': op['op'], 'status': 'skipped'}
+            continue
+        try:
+            chunk_results = _execute_chunk(indexed)
+            db.session.commit()
+            committed_chunks += 1
+        except Exception as e:
+            db.session.rollback()
+            failed = str(e)
+            chunk_results = {
+                index: {'index': index, 'op': op['op'], 'status': 500, 'error': failed}
+                for index, op in indexed
+            }
+        for index, result in chunk_results.items():
+            results[index] = result
+
+    return results, committed_chunks
+
+
+def _execute_chunk(indexed):
+    """在当前事务中执行一块操作，返回 index -> 结果"""
+    now = datetime.utcnow()
+    results = {}
+    creates = [(i, op) for i, op in indexed if op['op'] == 'create']
+    updates = [(i, op) for i, op in indexed if op['op'] == 'update']
+    deletes = [(i, op) for i, op in indexed if op['op'] == 'delete']
+
+    # 更新和删除引用的笔记先一次性查出是否存在
+    referenced = {op['id'] for _, op in updates + deletes}
+    existing = set()
+    if referenced:
+        existing = set(db.session.execute(select(Note.id).where(Note.id.in_(referenced))).scalars())
+
+    if creates:
+        rows = [{
+            'title': op['title'],
+            'content': op['content'],
+            'content_hash': content_hash(op['content']),
+            'created_at': now,
+            'updated_at': now
+        } for _, op in creates]
+        for (index, _), note_id in zip(creates, bulk_insert_notes(rows)):
+            results[index] = {'index': index, 'op': 'create', 'status': 201, 'id': note_id}
+
+    update_rows = []
+    for index, op in updates:
+        if op['id'] not in existing:
+            results[index] = {'index': index, 'op': 'update', 'status': 404, 'id': op['id']}
+            continue
+        row = {'id': op['id'], 'updated_at': now}
+        for field in ('title', 'content'):
+            if field in op:
+                row[field] = op[field]
+        if 'content' in op:
+            # 批量 update 语句不经过 ORM 校验钩子，摘要需要显式写入
+            row['content_hash'] = content_hash(op['content'])
+        update_rows.append(row)
+        results[index] = {'index': index, 'op': 'update', 'status': 200, 'id': op['id']}
+    if update_rows:
+        # ORM 按主键批量更新，键集合相同的行会合并为一次 executemany
+        db.session.execute(update(Note), update_rows)
+
+    delete_ids = []
+    for index, op in deletes:
+        if op['id'] not in existing:
+            results[index] = {'index': index, 'op': 'delete', 'status': 404, 'id': op['id']}
+            continue
+        delete_ids.append(op['id'])
+        results[index] = {'index': index, 'op': 'delete', 'status': 204, 'id': op['id']}
+    if delete_ids:
+        delete_note_children(delete_ids)
+        db.session.execute(
+            delete(Note).where(Note.id.in_(delete_ids)).execution_options(synchronize_session=False)
+        )
+        NoteTombstone.record(delete_ids)
+
+    return results
+
+
+def bulk_insert_notes(rows):
+    """批量插入并按输入顺序返回新 id"""
+    dialect = db.engine.dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.session.execute(
+            insert(Note).returning(Note.id, sort_by_parameter_order=True), rows
+        ).scalars())
+
+    # 不支持 executemany RETURNING 的数据库退回 ORM 批量 flush
+    notes = [Note(**row) for row in rows]
+    db.session.add_all(notes)
+    db.session.flush()
+    return [note.id for note in notes]
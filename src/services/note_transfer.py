@@ -0,0 +1,344 @@
+"""笔记的 NDJSON 导出与批量导入
+
+导出：每行一篇笔记（按 id 升序），翻译与题目内嵌在所属笔记中。笔记按 id 键集分页读取，
+每页 EXPORT_BATCH_SIZE 篇，再用 note_id IN (...) 读取这一页的翻译与题目；每条语句的结果
+读完后才执行下一条，同一连接上不会同时打开多个结果集（MySQL 的非缓冲游标不支持），
+任意时刻内存中只有一页行。输出按约 64 KB 合并成块，减少分块传输与逐块压缩刷新的次数。
+
+导入：逐行解析请求体（或文件），每 IMPORT_BATCH_SIZE 篇笔记批量写入并提交一次，内存占用与数据量无关。
+PostgreSQL + psycopg2 下用 COPY FROM STDIN 写入（先用 nextval 预分配 id），
+其他数据库使用 executemany 批量插入。格式错误的行被跳过并在结果中报告；
+写入失败时当前批回滚并停止，此前的批保持已提交。
+
+行格式：
+    {"id", "title", "content", "content_hash", "extracted_info", "extracted_at", "extracted_source_hash",
+     "translation_updated_at", "created_at", "updated_at",
+     "translations": [{"language", "text", "source_hash", "updated_at"}],
+     "quiz": {"question", "options", "answer", "explanation", "generated_at", "source_hash"} | null}
+
+导入时 title、content 必填；translations 也可以是 to_dict() 输出的 {语言: 译文}。
+默认忽略 id 并分配新 id；preserve_ids 时沿用文件中的 id（用于恢复到空库，id 冲突时报错）。
+created_at 沿用文件中的值，updated_at 一律为该批写入时的时间（每批单独取时），
+已同步的客户端能通过增量同步拿到导入的笔记，即使导入期间有其他修改被同步过。
+"""
+
+import io
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, text
+
+from src.models.note import Note, NoteQuiz, NoteTranslation, content_hash
+from src.models.types import CompressedText, compress_text
+from src.models.user import db
+from src.services.note_batch import bulk_insert_notes
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+NOTE_COLUMNS = (
+    'id', 'title', 'content', 'content_hash', 'extracted_info', 'extracted_at', 'extracted_source_hash',
+    'translation_updated_at', 'created_at', 'updated_at'
+)
+TRANSLATION_COLUMNS = ('language', 'text', 'source_hash', 'updated_at')
+QUIZ_COLUMNS = ('question', 'options', 'answer', 'explanation', 'generated_at', 'source_hash')
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# 导出 ----------------------------------------------------------------------
+
+def _children(model, columns, note_ids):
+    """读取一页笔记的子表行，按 note_id 分组"""
+    grouped = {}
+    rows = db.session.execute(
+        select(model.note_id, *(getattr(model, name) for name in columns)).where(model.note_id.in_(note_ids))
+    )
+    for row in rows:
+        grouped.setdefault(row.note_id, []).append(row)
+    return grouped
+
+
+def iter_export_records(batch_size=EXPORT_BATCH_SIZE):
+    """逐篇产出导出记录；需要在应用上下文中调用"""
+    last_id = 0
+    while True:
+        notes = db.session.execute(
+            select(*(getattr(Note, name) for name in NOTE_COLUMNS))
+            .where(Note.id > last_id).order_by(Note.id).limit(batch_size)
+        ).all()
+        if not notes:
+            return
+        note_ids = [note.id for note in notes]
+        translations = _children(NoteTranslation, TRANSLATION_COLUMNS, note_ids)
+        quizzes = _children(NoteQuiz, QUIZ_COLUMNS, note_ids)
+        for note in notes:
+            record = {name: _json_value(getattr(note, name)) for name in NOTE_COLUMNS}
+            record['translations'] = [
+                {name: _json_value(getattr(row, name)) for name in TRANSLATION_COLUMNS}
+                for row in sorted(translations.get(note.id, ()), key=lambda row: row.language)
+            ]
+            quiz = quizzes.get(note.id)
+            record['quiz'] = None
+            if quiz:
+                record['quiz'] = {name: _json_value(getattr(quiz[0], name)) for name in QUIZ_COLUMNS}
+                record['quiz']['options'] = json.loads(quiz[0].options) if quiz[0].options else []
+            yield record
+        last_id = note_ids[-1]
+
+
+def export_chunks():
+    """把导出记录编码为 NDJSON，按约 EXPORT_CHUNK_BYTES 合并成块产出"""
+    buffer = []
+    size = 0
+    for record in iter_export_records():
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+# 导入 ----------------------------------------------------------------------
+
+class ImportFailed(Exception):
+    """某一批写入失败；result 为失败前的导入结果"""
+
+    def __init__(self, error, result):
+        super().__init__(str(error))
+        self.error = error
+        self.result = result
+
+
+def _parse_datetime(value, name):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} 必须是 ISO 8601 时间字符串')
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} 不是有效的 ISO 8601 时间')
+
+
+def _optional_str(record, name):
+    value = record.get(name)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f'{name} 必须是字符串')
+    return value
+
+
+def _parse_translations(raw):
+    if raw is None:
+        return []
+    if isinstance(raw, dict):
+        raw = [{'language': language, 'text': value} for language, value in raw.items()]
+    if not isinstance(raw, list):
+        raise ValueError('translations 必须是数组或对象')
+    rows = []
+    for item in raw:
+        if not isinstance(item, dict) or not isinstance(item.get('language'), str) \
+                or not isinstance(item.get('text'), str):
+            raise ValueError('translations 的每一项都需要字符串 language 与 text')
+        rows.append({
+            'language': item['language'],
+            'text': item['text'],
+            'source_hash': _optional_str(item, 'source_hash'),
+            # 文件中没有时间时由 _write_batch 填入写入时间
+            'updated_at': _parse_datetime(item.get('updated_at'), 'translations.updated_at'),
+        })
+    return rows
+
+
+def _parse_quiz(raw):
+    if raw is None:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError('quiz 必须是对象')
+    options = raw.get('options') or []
+    if not isinstance(options, list):
+        raise ValueError('quiz.options 必须是数组')
+    return {
+        'question': _optional_str(raw, 'question'),
+        'options': json.dumps(options, ensure_ascii=False),
+        'answer': _optional_str(raw, 'answer'),
+        'explanation': _optional_str(raw, 'explanation'),
+        'generated_at': _parse_datetime(raw.get('generated_at'), 'quiz.generated_at'),
+        'source_hash': _optional_str(raw, 'source_hash'),
+    }
+
+
+def parse_record(record, preserve_ids):
+    """校验一行导入记录，返回 (笔记行, 翻译行列表, 题目行或 None)；格式错误时抛出 ValueError
+
+    updated_at（以及文件中缺少的 created_at、翻译的 updated_at）留空，由 _write_batch 在写入时填入。
+    """
+    if not isinstance(record, dict):
+        raise ValueError('每行必须是 JSON 对象')
+    title, content = record.get('title'), record.get('content')
+    if not isinstance(title, str) or not isinstance(content, str):
+        raise ValueError('Title and content are required')
+    if len(title) > Note.title.type.length:
+        raise ValueError(f'title 不能超过 {Note.title.type.length} 个字符')
+    row = {
+        'title': title,
+        'content': content,
+        # 摘要按正文重新计算，不信任文件中的值
+        'content_hash': content_hash(content),
+        'extracted_info': _optional_str(record, 'extracted_info'),
+        'extracted_at': _parse_datetime(record.get('extracted_at'), 'extracted_at'),
+        'extracted_source_hash': _optional_str(record, 'extracted_source_hash'),
+        'translation_updated_at': _parse_datetime(record.get('translation_updated_at'), 'translation_updated_at'),
+        'created_at': _parse_datetime(record.get('created_at'), 'created_at'),
+        'updated_at': None,
+    }
+    if preserve_ids:
+        if not isinstance(record.get('id'), int) or isinstance(record.get('id'), bool):
+            raise ValueError('preserve_ids 时每行都需要整数 id')
+        row = {'id': record['id'], **row}
+    return row, _parse_translations(record.get('translations')), _parse_quiz(record.get('quiz'))
+
+
+def iter_ndjson(lines):
+    """逐行解析 NDJSON，产出 (行号, 对象, 错误)；空行被跳过"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f'JSON 解析失败: {e}'
+
+
+def _copy_supported():
+    dialect = db.engine.dialect
+    return dialect.name == 'postgresql' and dialect.driver == 'psycopg2' and \
+        os.environ.get('NOTE_IMPORT_COPY', '1') != '0'
+
+
+def _csv_value(column_type, value):
+    if value is None:
+        return ''
+    if isinstance(column_type, CompressedText):
+        # COPY 不经过 SQLAlchemy 的类型处理，压缩需要手动完成
+        value = compress_text(value)
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, datetime):
+        value = value.isoformat(' ')
+    # 带引号的空串在 COPY CSV 中是空字符串，不带引号的空字段才是 NULL
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(model, rows):
+    """用 COPY FROM STDIN 写入一批键集合相同的行"""
+    table = model.__table__
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_csv_value(table.c[name].type, row[name]) for name in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {table.name} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def _write_batch(batch, preserve_ids, use_copy):
+    """在当前事务中写入一批解析后的记录，返回写入的笔记数
+
+    时间戳在写入时才取：若整个导入共用开始时间，导入期间已同步过更新修改的客户端，
+    其 (updated_at, id) 游标会越过后面各批，永远拿不到这些笔记。
+    """
+    now = datetime.utcnow()
+    note_rows = [
+        {**note, 'created_at': note['created_at'] or now, 'updated_at': now} for note, _, _ in batch
+    ]
+    if use_copy:
+        if preserve_ids:
+            ids = [row['id'] for row in note_rows]
+        else:
+            # 预先从序列取 id，COPY 才能写入子表的 note_id
+            ids = list(db.session.execute(
+                text("SELECT nextval(pg_get_serial_sequence('note', 'id')) FROM generate_series(1, :n)"),
+                {'n': len(note_rows)}
+            ).scalars())
+            note_rows = [{'id': note_id, **row} for note_id, row in zip(ids, note_rows)]
+        _copy_rows(Note, note_rows)
+    else:
+        ids = bulk_insert_notes(note_rows)
+
+    translation_rows = [
+        {'note_id': note_id, **row, 'updated_at': row['updated_at'] or now}
+        for note_id, (_, translations, _) in zip(ids, batch) for row in translations
+    ]
+    quiz_rows = [{'note_id': note_id, **quiz} for note_id, (_, _, quiz) in zip(ids, batch) if quiz is not None]
+    for model, rows in ((NoteTranslation, translation_rows), (NoteQuiz, quiz_rows)):
+        if not rows:
+            continue
+        if use_copy:
+            _copy_rows(model, rows)
+        else:
+            db.session.execute(insert(model), rows)
+    return len(ids)
+
+
+def _sync_id_sequence():
+    """沿用 id 导入后，把 PostgreSQL 的自增序列推进到当前最大 id 之后"""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    max_id = db.session.execute(select(func.max(Note.id))).scalar()
+    if max_id:
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('note', 'id'), :max_id)"), {'max_id': max_id})
+        db.session.commit()
+
+
+def import_notes(lines, preserve_ids=False, batch_size=IMPORT_BATCH_SIZE):
+    """从可迭代的 NDJSON 行导入笔记，返回 {"imported", "batches", "skipped", "errors", "method"}
+
+    写入失败时抛出 ImportFailed，其 result 记录失败前已提交的数量。
+    """
+    use_copy = _copy_supported()
+    result = {'imported': 0, 'batches': 0, 'skipped': 0, 'errors': [], 'method': 'copy' if use_copy else 'insert'}
+    batch = []
+
+    def flush():
+        try:
+            written = _write_batch(batch, preserve_ids, use_copy)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise ImportFailed(e, result)
+        result['imported'] += written
+        result['batches'] += 1
+        batch.clear()
+
+    for number, record, error in iter_ndjson(lines):
+        if error is None:
+            try:
+                batch.append(parse_record(record, preserve_ids))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            result['skipped'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': number, 'error': error})
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if preserve_ids and result['imported']:
+        _sync_id_sequence()
+    return result
@@ -0,0 +1,254 @@
+"""相关笔记：本地哈希 TF-IDF 向量 + 余弦相似度
+
+每篇笔记被表示为 RELATED_DIMENSIONS 维的哈希词频向量（标题词计两次），
+全部向量按行存放在一个 float32 矩阵中。查询时用一次矩阵-向量乘法求出与所有笔记的
+TF-IDF 余弦相似度，再用 argpartition 取前 k 个，不依赖网络或外部服务。
+
+- 分词：英文/数字按单词，中日韩文字按相邻二字组（无需词典）
+- 哈希：crc32 决定维度和符号（signed hashing），不同进程得到相同的向量
+- IDF：按维度统计文档频率，随增删实时更新；文档数变化超过 10% 时重算 IDF 与各行范数
+
+索引在进程内存中，首次查询时建立，之后每次查询前通过增量同步
+（src/services/sync.py 的 updated_at 游标与删除墓碑）拉取其他请求或进程写入的变化；
+墓碑已被清理导致游标过期时整体重建。
+
+配置（环境变量）：
+    RELATED_DIMENSIONS（默认 256）：向量维度，每篇笔记占用 4 × 维度 字节
+    RELATED_SYNC_INTERVAL（秒，默认 0）：两次增量同步的最小间隔，0 表示每次查询都同步
+"""
+
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+from src.services.sync import CursorExpired, collection_version, fetch_changes
+
+DEFAULT_DIMENSIONS = 256
+SYNC_BATCH_SIZE = 2000
+# 文档数相对上次计算范数时变化超过该比例时重算全部行范数
+NORM_REFRESH_RATIO = 0.1
+INDEX_FIELDS = ('id', 'title', 'content')
+
+_TOKEN = re.compile(r'[a-z0-9]+|[぀-ヿ㐀-䶿一-鿿가-힯]+')
+_STOPWORDS = frozenset(
+    'the and for are but not you with this that from have was were will would can could of to in on at by '
+    'is it as be or an a'.split()
+)
+
+
+def tokenize(text):
+    """英文/数字按单词（去掉停用词和单字母），中日韩文字按二字组"""
+    for match in _TOKEN.finditer((text or '').lower()):
+        word = match.group()
+        if word[0] < '぀':
+            if len(word) > 1 and word not in _STOPWORDS:
+                yield word
+        elif len(word) == 1:
+            yield word
+        else:
+            for i in range(len(word) - 1):
+                yield word[i:i + 2]
+
+
+def hashed_term_frequencies(title, content, dimensions):
+    """返回 {维度: 带符号的对数词频}；标题中的词计两次"""
+    counts = {}
+    for weight, text in ((2, title), (1, content)):
+        for token in tokenize(text):
+            digest = zlib.crc32(token.encode('utf-8'))
+            index = digest % dimensions
+            counts[index] = counts.get(index, 0) + (weight if digest & 0x80000000 else -weight)
+    return {
+        index: math.copysign(1 + math.log(abs(count)), count)
+        for index, count in counts.items() if count
+    }
+
+
+class RelatedNotesIndex:
+    """按行存放笔记向量的内存索引，线程安全"""
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, sync_interval=0.0):
+        import numpy as np
+
+        self.np = np
+        self.dimensions = dimensions
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._last_sync = 0.0
+        self._reset()
+
+    def _reset(self):
+        np = self.np
+        self._matrix = np.zeros((1024, self.dimensions), dtype=np.float32)
+        self._ids = np.zeros(1024, dtype=np.int64)
+        self._rows = {}  # note_id -> 行号
+        self._count = 0
+        self._norms = np.zeros(1024, dtype=np.float32)  # 各行在 _idf_squared 下的范数
+        self._df = np.zeros(self.dimensions, dtype=np.int64)
+        self._idf_squared = None
+        self._weights_count = 0  # 计算 _idf_squared 时的文档数
+        self._cursor = None
+        self._version = None  # 上次同步时的 (最大 updated_at, 最大笔记 id, 最大墓碑 id)
+
+    def __len__(self):
+        return self._count
+
+    # 写入 ------------------------------------------------------------------
+
+    def upsert(self, note_id, title, content):
+        np = self.np
+        with self._lock:
+            row = self._rows.get(note_id)
+            if row is None:
+                if self._count == len(self._ids):
+                    self._grow()
+                row = self._count
+                self._rows[note_id] = row
+                self._ids[row] = note_id
+                self._count += 1
+            else:
+                self._df -= self._matrix[row] != 0
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for index, value in hashed_term_frequencies(title, content, self.dimensions).items():
+                vector[index] = value
+            self._matrix[row] = vector
+            self._df += vector != 0
+            if self._idf_squared is not None:
+                self._norms[row] = math.sqrt(float((vector * vector) @ self._idf_squared))
+
+    def remove(self, note_id):
+        with self._lock:
+            row = self._rows.pop(note_id, None)
+            if row is None:
+                return
+            self._df -= self._matrix[row] != 0
+            # 用最后一行填补空位，保持矩阵紧凑
+            last = self._count - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._norms[row] = self._norms[last]
+                self._rows[int(self._ids[row])] = row
+            self._matrix[last] = 0
+            self._count = last
+
+    def _grow(self):
+        np = self.np
+        capacity = len(self._ids) * 2
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        matrix[:self._count] = self._matrix[:self._count]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._count] = self._ids[:self._count]
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[:self._count] = self._norms[:self._count]
+        self._matrix, self._ids, self._norms = matrix, ids, norms
+
+    # 同步 ------------------------------------------------------------------
+
+    def sync(self, force=False):
+        """拉取上次同步之后的新增、修改与删除；需要在应用上下文中调用"""
+        with self._lock:
+            if not force and self._cursor is not None and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            # 与集合 ETag 相同的版本判断：三个值都从索引末端读取，没有变化时跳过增量查询
+            version = collection_version()
+            if not force and self._cursor is not None and version == self._version:
+                self._last_sync = time.monotonic()
+                return
+            while True:
+                try:
+                    batch = fetch_changes(self._cursor, SYNC_BATCH_SIZE, INDEX_FIELDS)
+                except CursorExpired:
+                    # 期间的删除记录可能已被清理，无法增量补齐，整体重建
+                    self._reset()
+                    continue
+                for note_id in batch['deleted']:
+                    self.remove(note_id)
+                for note in batch['changes']:
+                    self.upsert(note['id'], note['title'], note['content'])
+                self._cursor = batch['next_cursor']
+                if not batch['has_more']:
+                    break
+            self._version = version
+            self._last_sync = time.monotonic()
+
+    # 查询 ------------------------------------------------------------------
+
+    def _refresh_weights(self):
+        """尚未计算或文档数变化较大时，按当前文档频率重算 IDF 和所有行的范数
+
+        期间写入的行按当时的 IDF 单独计算范数，IDF 的小幅漂移不影响排序结果。
+        """
+        np = self.np
+        count = self._count
+        if self._idf_squared is not None and \
+                abs(count - self._weights_count) <= NORM_REFRESH_RATIO * max(self._weights_count, 1):
+            return
+        idf = np.log((1 + count) / (1 + self._df.astype(np.float32))) + 1
+        self._idf_squared = (idf * idf).astype(np.float32)
+        # 分块计算，避免为整个矩阵分配临时数组
+        for start in range(0, count, 8192):
+            block = self._matrix[start:min(count, start + 8192)]
+            self._norms[start:start + len(block)] = np.sqrt((block * block) @ self._idf_squared)
+        self._weights_count = count
+
+    def query(self, note_id, limit=10):
+        """返回与 note_id 最相似的笔记 [(note_id, 相似度), ...]；笔记不在索引中时返回 None"""
+        np = self.np
+        with self._lock:
+            row = self._rows.get(note_id)
+            if row is None:
+                return None
+            self._refresh_weights()
+            count = self._count
+            vector = self._matrix[row]
+            query_norm = math.sqrt(float((vector * vector) @ self._idf_squared))
+            if count <= 1 or query_norm == 0:
+                return []
+
+            scores = self._matrix[:count] @ (vector * self._idf_squared)
+            norms = self._norms[:count]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(norms > 0, scores / (norms * query_norm), 0.0)
+            scores[row] = -1.0
+
+            k = min(limit, count - 1)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self._ids[i]), round(float(scores[i]), 4)) for i in top if scores[i] > 0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'notes': self._count,
+                'dimensions': self.dimensions,
+                'matrix_bytes': int(self._matrix.nbytes),
+                'synced': self._cursor is not None
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_related_index():
+    """Get or create the process-wide related-notes index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RelatedNotesIndex(
+                    dimensions=int(os.environ.get('RELATED_DIMENSIONS', DEFAULT_DIMENSIONS)),
+                    sync_interval=float(os.environ.get('RELATED_SYNC_INTERVAL', 0))
+                )
+    return _index
+
+
+def find_related_notes(note_id, limit=10):
+    """同步索引后查询相关笔记；笔记不存在时返回 None"""
+    index = get_related_index()
+    index.sync()
+    return index.query(note_id, limit)
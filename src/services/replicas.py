@@ -0,0 +1,268 @@
+"""只读副本路由
+
+设置 DATABASE_REPLICA_URLS（逗号分隔）后，每个副本作为一个 Flask-SQLAlchemy bind
+（replica_0、replica_1 ...）创建引擎，RoutingSession 按语句决定使用主库还是副本：
+
+- GET / HEAD 请求在开始时选定一个可用副本，其中的只读语句（SELECT、不带 FOR UPDATE）走副本
+- 写语句、flush、SELECT ... FOR UPDATE 始终走主库；请求中一旦写过主库，之后的读取也留在主库
+- 其他方法的请求（OPTIONS 及写请求）全部走主库；成功的写请求（POST / PUT / PATCH / DELETE）
+  会设置 Cookie（db_primary_until），该客户端在 REPLICA_STICKY_SECONDS 秒内的读请求仍走主库，
+  读到自己刚写入的数据
+- 后台线程（任务执行、自动保存写入等）的会话不经过请求钩子，始终使用主库
+
+复制延迟：每隔 REPLICA_CHECK_INTERVAL 秒（在请求中按需）检查各副本。
+- PostgreSQL 备库（pg_is_in_recovery()）：使用 pg_last_xact_replay_timestamp()，
+  已重放完收到的全部 WAL 时为 0
+- 其他情况使用心跳：先读取副本上 replica_heartbeat 的时间，再把当前时间写入主库的心跳行。
+  副本包含该时间之前提交的全部数据，因此"现在 - 副本心跳时间"是其数据陈旧程度的上界；
+  副本追平时约等于两次检查的间隔。心跳时间来自各 Web 进程的时钟，进程间的时钟偏差会计入延迟
+延迟超过 REPLICA_MAX_LAG_SECONDS 或无法连接的副本暂停使用，没有可用副本时读取回落到主库。
+
+配置（环境变量）：
+    DATABASE_REPLICA_URLS：副本地址列表，未设置时不启用
+    REPLICA_MAX_LAG_SECONDS（默认 5）：允许的最大复制延迟
+    REPLICA_CHECK_INTERVAL（秒，默认 1）：两次延迟检查（及心跳写入）的最小间隔，应明显小于最大延迟
+    REPLICA_STICKY_SECONDS（默认同 REPLICA_MAX_LAG_SECONDS）：写请求后客户端读主库的时长
+"""
+
+import itertools
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from flask import g, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.elements import TextClause
+
+from src.services.database import REPLICA_BIND_PREFIX
+from src.services.metrics import registry
+
+STICKY_COOKIE = 'db_primary_until'
+# 只有这些方法的请求会路由到副本；OPTIONS（CORS 预检）不查询数据库，也不是写请求
+READ_METHODS = ('GET', 'HEAD')
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+DEFAULT_CHECK_INTERVAL = 1.0
+
+routed_requests = registry.counter(
+    'db_routed_requests_total', 'Requests by the database their reads were routed to', ('target',)
+)
+
+
+def _is_read(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        # 原生 SQL 只有 SELECT / WITH 开头的视为读取（搜索等 FTS 查询）
+        statement = clause.text.lstrip().upper()
+        return statement.startswith(('SELECT', 'WITH')) and 'FOR UPDATE' not in statement
+    return bool(getattr(clause, 'is_select', False)) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """只读语句可以路由到副本的会话；info['replica'] 为请求选定的副本引擎"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None:
+            if not self._flushing and _is_read(clause):
+                return replica
+            # 写过主库之后，本次请求的读取也留在主库
+            self.info['replica'] = None
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaState:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.lag = None
+        self.healthy = False
+        self.error = None
+        self.checked_at = None
+
+
+class ReplicaRouter:
+    """维护副本的延迟状态，并为请求选择副本"""
+
+    def __init__(self, primary, replicas, max_lag=5.0, check_interval=DEFAULT_CHECK_INTERVAL, sticky_seconds=None):
+        self.primary = primary
+        self.replicas = [ReplicaState(name, engine) for name, engine in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = max_lag if sticky_seconds is None else sticky_seconds
+        self._next = itertools.cycle(range(len(self.replicas)))
+        self._lock = threading.Lock()
+        self._checking = False
+        self._last_check = 0.0
+
+    # 延迟检查 ----------------------------------------------------------------
+
+    def _beat(self, now):
+        """把当前时间写入主库的心跳行"""
+        from src.models.replica import HEARTBEAT_ID, ReplicaHeartbeat
+
+        with self.primary.begin() as connection:
+            updated = connection.execute(
+                update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == HEARTBEAT_ID).values(beat_at=now)
+            ).rowcount
+            if not updated:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(insert(ReplicaHeartbeat).values(id=HEARTBEAT_ID, beat_at=now))
+                except IntegrityError:
+                    # 其他进程同时插入了心跳行
+                    pass
+
+    def _measure(self, replica, now):
+        """返回副本的复制延迟（秒）；副本上还没有心跳时返回 None"""
+        from src.models.replica import HEARTBEAT_ID, ReplicaHeartbeat
+
+        with replica.engine.connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                in_recovery, lag = connection.execute(text(
+                    "SELECT pg_is_in_recovery(), CASE "
+                    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                )).one()
+                if in_recovery:
+                    return float(lag or 0)
+            beat_at = connection.execute(
+                select(ReplicaHeartbeat.beat_at).where(ReplicaHeartbeat.id == HEARTBEAT_ID)
+            ).scalar()
+        if beat_at is None:
+            return None
+        return max(0.0, (now - beat_at).total_seconds())
+
+    def check(self, force=False):
+        """检查全部副本的延迟；距上次检查不足 check_interval 时跳过（同一时间只有一个线程检查）"""
+        with self._lock:
+            if self._checking or (not force and time.monotonic() - self._last_check < self.check_interval):
+                return
+            self._checking = True
+        try:
+            # 先读副本再写主库：副本读到的是之前写入的心跳
+            now = datetime.utcnow()
+            for replica in self.replicas:
+                try:
+                    replica.lag = self._measure(replica, now)
+                    if replica.lag is None:
+                        replica.healthy = False
+                        replica.error = '副本上还没有心跳，等待复制'
+                    else:
+                        replica.healthy = replica.lag <= self.max_lag
+                        replica.error = None if replica.healthy else f'复制延迟 {replica.lag:.1f}s 超过上限'
+                except Exception as e:
+                    replica.healthy = False
+                    replica.error = str(e)
+                replica.checked_at = now
+            try:
+                self._beat(now)
+            except Exception:
+                traceback.print_exc()
+        finally:
+            with self._lock:
+                self._checking = False
+                self._last_check = time.monotonic()
+
+    # 路由 --------------------------------------------------------------------
+
+    def choose(self):
+        """轮询选择一个延迟在上限内的副本；没有时返回 None"""
+        self.check()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next)]
+            if replica.healthy:
+                return replica
+        return None
+
+    def describe(self):
+        return {
+            'max_lag_seconds': self.max_lag,
+            'check_interval_seconds': self.check_interval,
+            'sticky_seconds': self.sticky_seconds,
+            'replicas': [{
+                'name': replica.name,
+                'url': replica.engine.url.render_as_string(hide_password=True),
+                'healthy': replica.healthy,
+                'lag_seconds': None if replica.lag is None else round(replica.lag, 3),
+                'error': replica.error,
+                'checked_at': replica.checked_at.isoformat() if replica.checked_at else None,
+            } for replica in self.replicas],
+            'routed_requests': {
+                target: routed_requests.value(target=target) for target in ('replica', 'primary', 'sticky')
+            },
+        }
+
+
+_router = None
+
+
+def get_replica_router():
+    """已配置副本时返回进程内的路由器，否则返回 None"""
+    return _router
+
+
+def init_app(app, db):
+    """为配置了副本的应用注册路由钩子；需要在应用上下文中、db.init_app 之后调用"""
+    global _router
+    replicas = sorted(
+        (name, engine) for name, engine in db.engines.items()
+        if name and name.startswith(REPLICA_BIND_PREFIX)
+    )
+    if not replicas:
+        return None
+    max_lag = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    sticky = os.environ.get('REPLICA_STICKY_SECONDS')
+    _router = ReplicaRouter(
+        db.engine, replicas,
+        max_lag=max_lag,
+        check_interval=float(os.environ.get('REPLICA_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)),
+        sticky_seconds=float(sticky) if sticky is not None else None
+    )
+    registry.register_collector(lambda: [
+        ('db_replica_lag_seconds', 'gauge', 'Last measured replication lag per replica',
+         [({'replica': replica.name}, replica.lag) for replica in _router.replicas if replica.lag is not None]),
+        ('db_replica_healthy', 'gauge', 'Whether the replica is currently used for reads',
+         [({'replica': replica.name}, int(replica.healthy)) for replica in _router.replicas]),
+    ])
+
+    @app.before_request
+    def _route_reads():
+        if request.method not in READ_METHODS:
+            return
+        try:
+            sticky_until = float(request.cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0
+        if sticky_until > time.time():
+            g.db_route = 'sticky'
+            return
+        replica = _router.choose()
+        g.db_route = replica.name if replica is not None else 'primary'
+        if replica is not None:
+            db.session.info['replica'] = replica.engine
+
+    @app.after_request
+    def _mark_writes(response):
+        route = g.pop('db_route', None)
+        if route is not None:
+            routed_requests.inc(target=route if route in ('primary', 'sticky') else 'replica')
+            response.headers['X-Database-Route'] = route
+        elif request.method in WRITE_METHODS and response.status_code < 400 and _router.sticky_seconds > 0:
+            # 写请求成功后，该客户端的后续读取在副本追上之前留在主库
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + _router.sticky_seconds:.3f}',
+                max_age=int(_router.sticky_seconds) + 1, httponly=True, samesite='Lax', path='/api'
+            )
+        return response
+
+    @app.teardown_appcontext
+    def _reset_route(exception=None):
+        # 作用域会话随应用上下文移除，这里只需清掉路由标记，避免残留到复用的会话
+        db.session.info.pop('replica', None)
+
+    return _router
@@ -0,0 +1,321 @@
+"""笔记全文检索后端
+
+根据数据库方言选择检索实现：
+- SQLite：FTS5 外部内容虚拟表 + 触发器，增删改笔记时由数据库增量维护索引
+- PostgreSQL：tsvector 生成列 + GIN 索引，同样由数据库在写入时维护
+- 其他数据库或查询词过短时退回 LIKE 子串匹配
+
+全文索引只由 init_database()（flask init-db）创建；请求中只检查索引是否已安装（不执行 DDL），
+未安装时使用 LIKE。
+
+所有后端返回统一结构：按相关度排序的分页结果，每条包含高亮片段而非完整笔记。
+标题与片段是可以直接插入页面的 HTML：笔记文本经过转义，只有命中处的 <mark> 标签是标记。
+"""
+
+import html
+import os
+import re
+from sqlalchemy import or_, text
+from src.models.user import db
+
+# 输出中的高亮标记；其余文本均经过 HTML 转义
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+# 数据库生成高亮时使用的占位控制字符：先转义整段文本，再把占位符换成 <mark> 标签
+_MARKER_OPEN = '\x02'
+_MARKER_CLOSE = '\x03'
+# 片段前后截断时使用的省略符
+ELLIPSIS = '…'
+# LIKE 后端在命中位置前后保留的字符数
+LIKE_SNIPPET_RADIUS = 60
+
+
+class LikeSearchBackend:
+    """基于 LIKE '%q%' 的兜底实现，需要全表扫描"""
+
+    name = 'like'
+
+    def install(self, connection):
+        """LIKE 检索无需额外索引"""
+
+    def detect(self, connection):
+        return True
+
+    def search(self, query, limit, offset):
+        from src.models.note import Note
+
+        rows = db.session.query(Note.id, Note.title, Note.content, Note.updated_at).filter(
+            or_(Note.title.contains(query), Note.content.contains(query))
+        ).order_by(Note.updated_at.desc(), Note.id.desc()).limit(limit).offset(offset).all()
+
+        return [{
+            'id': row.id,
+            'title': _highlight(row.title, query),
+            'snippet': _make_snippet(row.content, query),
+            'score': None,
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None
+        } for row in rows]
+
+
+class SQLiteFTSBackend:
+    """SQLite FTS5 实现，使用 trigram 分词以兼容中文等无空格语言"""
+
+    name = 'sqlite_fts5'
+    # trigram 分词要求每个检索词至少 3 个字符
+    MIN_TERM_LENGTH = 3
+
+    def __init__(self):
+        self.tokenizer = 'trigram'
+
+    def install(self, connection):
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'"
+        )).first()
+        if not exists:
+            try:
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE note_fts USING fts5("
+                    "title, content, content='note', content_rowid='id', tokenize='trigram')"
+                ))
+            except Exception:
+                # SQLite < 3.34 不支持 trigram 分词，退回默认分词器
+                self.tokenizer = 'unicode61'
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE note_fts USING fts5("
+                    "title, content, content='note', content_rowid='id')"
+                ))
+            # 为已有笔记建立索引
+            connection.execute(text("INSERT INTO note_fts(note_fts) VALUES ('rebuild')"))
+        else:
+            ddl = connection.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'"
+            )).scalar() or ''
+            self.tokenizer = 'trigram' if 'trigram' in ddl else 'unicode61'
+
+        # 触发器负责增量维护：只有标题或正文变化时才重建对应行的索引
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN "
+            "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+            "END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN "
+            "INSERT INTO note_fts(note_fts, rowid, title, content) "
+            "VALUES ('delete', old.id, old.title, old.content); "
+            "END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE OF title, content ON note BEGIN "
+            "INSERT INTO note_fts(note_fts, rowid, title, content) "
+            "VALUES ('delete', old.id, old.title, old.content); "
+            "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+            "END"
+        ))
+
+    def detect(self, connection):
+        """索引表与三个维护触发器都已存在时返回 True，并按建表语句确定分词器"""
+        rows = dict(connection.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE name IN ("
+            "'note_fts', 'note_fts_ai', 'note_fts_ad', 'note_fts_au')"
+        )).all())
+        if len(rows) < 4:
+            return False
+        self.tokenizer = 'trigram' if 'trigram' in (rows['note_fts'] or '') else 'unicode61'
+        return True
+
+    def supports(self, query):
+        if self.tokenizer != 'trigram':
+            return True
+        return all(len(term) >= self.MIN_TERM_LENGTH for term in query.split())
+
+    def search(self, query, limit, offset):
+        # 每个词作为短语加引号，避免用户输入被解析成 FTS5 语法
+        match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+        rows = db.session.execute(text(
+            "SELECT note.id AS id, "
+            "highlight(note_fts, 0, :open, :close) AS title, "
+            "snippet(note_fts, 1, :open, :close, :ellipsis, 32) AS snippet, "
+            "bm25(note_fts, 10.0, 1.0) AS rank, "
+            "note.updated_at AS updated_at "
+            "FROM note_fts JOIN note ON note.id = note_fts.rowid "
+            "WHERE note_fts MATCH :match "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {
+            'open': _MARKER_OPEN,
+            'close': _MARKER_CLOSE,
+            'ellipsis': ELLIPSIS,
+            'match': match,
+            'limit': limit,
+            'offset': offset
+        }).mappings().all()
+
+        # bm25 越小越相关，对外统一为越大越相关
+        return [{
+            'id': row['id'],
+            'title': _render_markers(row['title']),
+            'snippet': _render_markers(row['snippet']),
+            'score': -float(row['rank']),
+            'updated_at': _isoformat(row['updated_at'])
+        } for row in rows]
+
+
+class PostgresFTSBackend:
+    """PostgreSQL tsvector 实现，标题权重高于正文"""
+
+    # 使用 'simple' 配置：不做词干化，对多语言笔记更稳妥
+    name = 'postgres_tsvector'
+
+    def install(self, connection):
+        connection.execute(text(
+            "ALTER TABLE note ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+            ") STORED"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_note_search_vector ON note USING GIN (search_vector)"
+        ))
+
+    def detect(self, connection):
+        """note.search_vector 生成列已存在时返回 True"""
+        return connection.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'note' AND column_name = 'search_vector'"
+        )).first() is not None
+
+    def supports(self, query):
+        return True
+
+    def search(self, query, limit, offset):
+        # 先在索引上完成排序分页，再只对当前页计算 ts_headline
+        rows = db.session.execute(text(
+            "WITH q AS (SELECT websearch_to_tsquery('simple', :query) AS query), "
+            "hits AS ("
+            "  SELECT note.id, ts_rank_cd(note.search_vector, q.query) AS score "
+            "  FROM note, q WHERE note.search_vector @@ q.query "
+            "  ORDER BY score DESC, note.id DESC LIMIT :limit OFFSET :offset"
+            ") "
+            "SELECT note.id AS id, "
+            "ts_headline('simple', note.title, q.query, :title_options) AS title, "
+            "ts_headline('simple', note.content, q.query, :options) AS snippet, "
+            "hits.score AS score, note.updated_at AS updated_at "
+            "FROM hits JOIN note ON note.id = hits.id, q "
+            "ORDER BY hits.score DESC, note.id DESC"
+        ), {
+            'query': query,
+            'limit': limit,
+            'offset': offset,
+            'title_options': f'StartSel={_MARKER_OPEN},StopSel={_MARKER_CLOSE},HighlightAll=true',
+            'options': (f'StartSel={_MARKER_OPEN},StopSel={_MARKER_CLOSE},'
+                        f'FragmentDelimiter={ELLIPSIS},MaxFragments=2,MaxWords=30,MinWords=10')
+        }).mappings().all()
+
+        return [{
+            'id': row['id'],
+            'title': _render_markers(row['title']),
+            'snippet': _render_markers(row['snippet']),
+            'score': float(row['score']),
+            'updated_at': _isoformat(row['updated_at'])
+        } for row in rows]
+
+
+# 每个引擎对应一个后端实例（install 时会记录分词器等状态）
+_backends = {}
+_like_backend = LikeSearchBackend()
+
+
+def _create_backend(dialect_name):
+    """按环境变量 SEARCH_BACKEND（auto/like）和数据库方言选择后端"""
+    if os.environ.get('SEARCH_BACKEND', 'auto').lower() == 'like':
+        return _like_backend
+    if dialect_name == 'sqlite':
+        return SQLiteFTSBackend()
+    if dialect_name == 'postgresql':
+        return PostgresFTSBackend()
+    return _like_backend
+
+
+def install_search_index(engine):
+    """创建全文索引及其维护对象，可重复执行"""
+    backend = _create_backend(engine.dialect.name)
+    with engine.begin() as connection:
+        backend.install(connection)
+    _backends[engine.url] = backend
+    return backend
+
+
+def detect_search_backend(engine):
+    """不执行 DDL，返回引擎上已安装的检索后端；全文索引未安装时返回 LIKE 后端"""
+    backend = _create_backend(engine.dialect.name)
+    if backend is not _like_backend:
+        with engine.connect() as connection:
+            installed = backend.detect(connection)
+        if not installed:
+            print(f'Warning: full-text index for {backend.name} is not installed; '
+                  'search falls back to LIKE. Run `flask --app src.main init-db` to create it.')
+            backend = _like_backend
+    _backends[engine.url] = backend
+    return backend
+
+
+def get_search_backend(query=None):
+    """返回当前引擎可用的检索后端；查询词不被支持时退回 LIKE"""
+    engine = db.engine
+    backend = _backends.get(engine.url)
+    if backend is None:
+        backend = detect_search_backend(engine)
+    if query is not None and backend is not _like_backend and not backend.supports(query):
+        return _like_backend
+    return backend
+
+
+def search_notes(query, limit, offset=0):
+    """执行检索，返回 (后端名称, 结果列表)"""
+    backend = get_search_backend(query)
+    return backend.name, backend.search(query, limit, offset)
+
+
+def _isoformat(value):
+    # SQLite 原生 SQL 查询返回的时间是字符串，PostgreSQL 返回 datetime
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.replace(' ', 'T', 1)
+    return value.isoformat()
+
+
+def _render_markers(value):
+    """转义数据库返回的高亮文本，并把占位符换成 <mark> 标签"""
+    if value is None:
+        return None
+    return html.escape(value).replace(_MARKER_OPEN, HIGHLIGHT_OPEN).replace(_MARKER_CLOSE, HIGHLIGHT_CLOSE)
+
+
+def _highlight(value, query):
+    """转义文本，并对所有不区分大小写的命中位置加高亮标记"""
+    if not value:
+        return value
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    parts = []
+    last = 0
+    for match in pattern.finditer(value):
+        parts.append(html.escape(value[last:match.start()]))
+        parts.append(f'{HIGHLIGHT_OPEN}{html.escape(match.group(0))}{HIGHLIGHT_CLOSE}')
+        last = match.end()
+    parts.append(html.escape(value[last:]))
+    return ''.join(parts)
+
+
+def _make_snippet(content, query):
+    """截取首个命中位置附近的文本作为片段"""
+    if not content:
+        return ''
+    index = content.lower().find(query.lower())
+    if index < 0:
+        return html.escape(content[:LIKE_SNIPPET_RADIUS * 2]) + \
+            (ELLIPSIS if len(content) > LIKE_SNIPPET_RADIUS * 2 else '')
+    start = max(0, index - LIKE_SNIPPET_RADIUS)
+    end = min(len(content), index + len(query) + LIKE_SNIPPET_RADIUS)
+    snippet = _highlight(content[start:end], query)
+    return (ELLIPSIS if start > 0 else '') + snippet + (ELLIPSIS if end < len(content) else '')
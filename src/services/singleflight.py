@@ -0,0 +1,66 @@
+"""进程内的单飞（single-flight）合并
+
+同一个键同时只有一个调用真正执行（leader），期间到达的相同调用（follower）
+等待 leader 完成并共享它的结果或异常，不再各自请求上游。
+调用结束后立即移除该键，之后的调用重新执行（结果复用交给 AI 缓存负责）。
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """按键合并并发中的相同调用"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """返回 (call, is_leader)；leader 必须在结束时调用 finish()"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        """发布 leader 的结果（或异常）并唤醒所有 follower"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def do(self, key, func):
+        """执行 func() 或等待正在执行的相同调用，返回 (结果, 是否共享了他人的结果)"""
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait(), True
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
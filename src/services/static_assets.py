@@ -0,0 +1,186 @@
+"""静态资源清单
+
+首次请求静态资源时遍历一次静态目录，为每个文件记录内容摘要、类型与大小，之后的请求只查字典，
+未知路径直接回落到 index.html，不再逐个请求调用 os.path.exists。
+
+- 内存服务：不超过 STATIC_MEMORY_MAX_BYTES 的文件读入内存，连同预压缩的 gzip / br 版本
+  （压缩后至少小 10% 才保留）直接从内存返回；更大的文件仍交给 send_file，但使用清单里的 ETag
+  构建工具生成的同名 .gz / .br 文件会被当作预压缩版本使用
+- 强 ETag：取内容 sha256 的前 16 位，压缩版本追加 -gzip / -br 后缀（与响应压缩模块的约定一致）
+- 指纹：HTML 中以 href="/..." / src="/..." 引用的清单内资源会被改写为 /path?v=<摘要>；
+  请求的 v 与当前摘要一致，或文件名自带十六进制指纹（app.3f2a9c1b.js）时，
+  返回 Cache-Control: public, max-age=31536000, immutable
+- HTML 入口（index.html）使用 no-cache，每次通过 ETag 重新验证，部署后立即生效；
+  其余未带指纹的文件缓存 STATIC_MAX_AGE 秒
+
+配置（环境变量）：
+    STATIC_MEMORY_MAX_BYTES（默认 262144）：读入内存的单个文件大小上限
+    STATIC_MAX_AGE（秒，默认 3600）：未带指纹的非 HTML 文件的缓存时间
+    STATIC_RELOAD（默认 0）：设为 1 时每次请求都重建清单，便于本地修改前端后立即生效
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, request, send_file
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_TYPES = frozenset((
+    'application/javascript', 'application/json', 'application/xml', 'application/manifest+json',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon'
+))
+# 文件名中的内容指纹，例如 app.3f2a9c1b.js、chunk-5d41402abc4b.css
+_FINGERPRINT = re.compile(r'[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$')
+_HTML_REFERENCE = re.compile(r'((?:href|src)=")/([^"?#]+)(")')
+
+
+def _is_compressible(mimetype):
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def _precompress(data):
+    """返回 {编码: 压缩后的内容}，只保留至少小 10% 的版本"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants['br'] = brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    return {encoding: body for encoding, body in variants.items() if len(body) <= len(data) * 0.9}
+
+
+class StaticAsset:
+    """清单中的一个静态文件"""
+
+    def __init__(self, path, filename, data, mimetype, memory_max_bytes):
+        self.path = path
+        self.filename = filename
+        self.mimetype = mimetype
+        self.size = len(data)
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.fingerprinted = bool(_FINGERPRINT.search(path))
+        self.is_html = mimetype == 'text/html'
+        self.mtime = os.path.getmtime(filename)
+        # 改写过引用的 HTML 与磁盘文件不同，总是从内存返回
+        self.data = data if self.size <= memory_max_bytes or self.is_html else None
+        # 内存中的预压缩版本；大文件改用构建工具生成的 .br / .gz 文件
+        self.variants = {}
+        self.variant_files = {}
+        if self.data is not None and _is_compressible(mimetype):
+            self.variants = _precompress(data)
+        else:
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if os.path.isfile(filename + suffix):
+                    self.variant_files[encoding] = filename + suffix
+
+    def etag(self, encoding=None):
+        return f'{self.digest}-{encoding}' if encoding else self.digest
+
+    def cache_control(self, version, max_age):
+        if self.is_html:
+            return 'no-cache'
+        if self.fingerprinted or version == self.digest:
+            return IMMUTABLE_CACHE_CONTROL
+        return f'public, max-age={max_age}'
+
+
+class StaticManifest:
+    """静态目录的内容清单，构建后只读"""
+
+    def __init__(self, folder, memory_max_bytes=256 * 1024, max_age=3600):
+        self.folder = folder
+        self.memory_max_bytes = memory_max_bytes
+        self.max_age = max_age
+        self.assets = {}
+        self._build()
+
+    def _build(self):
+        sources = {}
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                filename = os.path.join(root, name)
+                path = os.path.relpath(filename, self.folder).replace(os.sep, '/')
+                # 预压缩的副本作为原文件的变体使用，不单独出现在清单中
+                if name.endswith(('.gz', '.br')) and os.path.isfile(filename[:-3]):
+                    continue
+                sources[path] = filename
+
+        # 先处理非 HTML 文件，得到摘要后再改写 HTML 中的引用
+        ordered = sorted(sources, key=lambda path: path.endswith(('.html', '.htm')))
+        for path in ordered:
+            filename = sources[path]
+            mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            with open(filename, 'rb') as f:
+                data = f.read()
+            if mimetype == 'text/html':
+                data = self._fingerprint_references(data)
+            self.assets[path] = StaticAsset(path, filename, data, mimetype, self.memory_max_bytes)
+
+    def _fingerprint_references(self, html):
+        """把 HTML 中对清单内资源的根路径引用改写为带摘要版本的地址"""
+        def replace(match):
+            asset = self.assets.get(match.group(2))
+            if asset is None:
+                return match.group(0)
+            return f'{match.group(1)}/{match.group(2)}?v={asset.digest}{match.group(3)}'
+
+        text = html.decode('utf-8')
+        return _HTML_REFERENCE.sub(replace, text).encode('utf-8')
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def url_for(self, path):
+        """带摘要版本的资源地址，可被浏览器永久缓存"""
+        asset = self.assets[path]
+        return f'/{path}?v={asset.digest}'
+
+    def response(self, asset):
+        """按当前请求生成响应：协商预压缩版本、处理 If-None-Match、设置缓存头"""
+        available = list(asset.variants or asset.variant_files)
+        encoding = request.accept_encodings.best_match(available) if available else None
+        etag = asset.etag(encoding)
+        cache_control = asset.cache_control(request.args.get('v'), self.max_age)
+
+        # 压缩模块可能已去掉条件头中的编码后缀，任一版本的 ETag 命中都说明内容未变
+        if request.if_none_match and any(
+            request.if_none_match.contains_weak(asset.etag(candidate)) for candidate in (None, *available)
+        ):
+            response = Response(status=304)
+        elif asset.data is not None:
+            response = Response(asset.variants.get(encoding, asset.data), mimetype=asset.mimetype)
+        else:
+            response = send_file(
+                asset.variant_files.get(encoding, asset.filename), mimetype=asset.mimetype, conditional=False,
+                etag=False, last_modified=asset.mtime
+            )
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if available:
+            response.vary.add('Accept-Encoding')
+        if encoding and response.status_code != 304:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest(folder):
+    """Get or build the process-wide manifest of the static folder"""
+    global _manifest
+    reload = os.environ.get('STATIC_RELOAD') == '1'
+    if _manifest is None or reload:
+        with _manifest_lock:
+            if _manifest is None or reload:
+                _manifest = StaticManifest(
+                    folder,
+                    memory_max_bytes=int(os.environ.get('STATIC_MEMORY_MAX_BYTES', 256 * 1024)),
+                    max_age=int(os.environ.get('STATIC_MAX_AGE', 3600))
+                )
+    return _manifest
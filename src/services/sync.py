@@ -0,0 +1,138 @@
+"""增量同步
+
+客户端携带上次返回的游标调用 `GET /api/notes/changes`，只取回之后有变化的笔记
+（按 (updated_at, id) 递增）以及之后删除的笔记墓碑（按 (deleted_at, id) 递增）。
+
+墓碑保留 NOTE_TOMBSTONE_RETENTION_DAYS 天（默认 30）。游标早于保留期限时，
+期间的删除记录可能已被清理，接口会要求客户端重新全量同步。
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_
+
+from src.models.note import Note, NoteTombstone, note_load_options
+from src.models.user import db
+
+DEFAULT_RETENTION_DAYS = 30
+# 同一进程内两次清理过期墓碑的最小间隔（秒）
+PURGE_INTERVAL_SECONDS = 3600
+# 没有任何墓碑时使用的起始位置
+_EPOCH = datetime(1970, 1, 1)
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+class CursorExpired(Exception):
+    """游标早于墓碑保留期限，客户端需要重新全量同步"""
+
+
+def get_retention():
+    return timedelta(days=int(os.environ.get('NOTE_TOMBSTONE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)))
+
+
+def encode_cursor(note_position, tombstone_position, synced_at):
+    """把笔记与墓碑两路读取位置及本次同步时间编码为一个不透明游标"""
+    raw = json.dumps({
+        's': synced_at.isoformat(),
+        'n': [note_position[0].isoformat(), note_position[1]],
+        't': [tombstone_position[0].isoformat(), tombstone_position[1]]
+    })
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (
+            (datetime.fromisoformat(data['n'][0]), int(data['n'][1])),
+            (datetime.fromisoformat(data['t'][0]), int(data['t'][1])),
+            datetime.fromisoformat(data['s'])
+        )
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise ValueError('无效的同步游标')
+
+
+def _initial_positions():
+    """首次同步：笔记从头读取，墓碑从当前最新位置开始（客户端本地尚无数据可删）"""
+    latest = db.session.query(NoteTombstone.deleted_at, NoteTombstone.id).order_by(
+        NoteTombstone.deleted_at.desc(), NoteTombstone.id.desc()
+    ).first()
+    tombstone_position = (latest.deleted_at, latest.id) if latest else (_EPOCH, 0)
+    return (_EPOCH, 0), tombstone_position
+
+
+def collection_version():
+    """笔记集合的版本：(最大 updated_at, 最大笔记 id, 最大墓碑 id)，任何增删改都会改变它
+
+    每个聚合单独查询：SQLite 只对单个 min/max 聚合做索引末端读取优化，
+    把多个 max 写在同一条语句里会退化为全索引扫描。
+    """
+    return (
+        db.session.query(func.max(Note.updated_at)).scalar(),
+        db.session.query(func.max(Note.id)).scalar(),
+        db.session.query(func.max(NoteTombstone.id)).scalar()
+    )
+
+
+def fetch_changes(cursor, limit, fields):
+    """读取游标之后的变更
+
+    Returns:
+        dict: changes（笔记字典列表）、deleted（被删除的笔记 id 列表）、next_cursor、has_more
+    """
+    now = datetime.utcnow()
+    if cursor:
+        note_position, tombstone_position, synced_at = decode_cursor(cursor)
+        # 上次同步早于保留期限时，期间的墓碑可能已被清理
+        if synced_at < now - get_retention():
+            raise CursorExpired()
+    else:
+        note_position, tombstone_position = _initial_positions()
+
+    last_updated_at, last_id = note_position
+    # 前置的 >= 条件让数据库对 (updated_at, id) 索引做范围扫描，OR 条件只在范围内过滤
+    notes = Note.query.options(*note_load_options(fields)).filter(
+        Note.updated_at >= last_updated_at,
+        or_(Note.updated_at > last_updated_at,
+            and_(Note.updated_at == last_updated_at, Note.id > last_id))
+    ).order_by(Note.updated_at.asc(), Note.id.asc()).limit(limit + 1).all()
+
+    last_deleted_at, last_tombstone_id = tombstone_position
+    tombstones = NoteTombstone.query.filter(
+        NoteTombstone.deleted_at >= last_deleted_at,
+        or_(NoteTombstone.deleted_at > last_deleted_at,
+            and_(NoteTombstone.deleted_at == last_deleted_at, NoteTombstone.id > last_tombstone_id))
+    ).order_by(NoteTombstone.deleted_at.asc(), NoteTombstone.id.asc()).limit(limit + 1).all()
+
+    has_more = len(notes) > limit or len(tombstones) > limit
+    notes = notes[:limit]
+    tombstones = tombstones[:limit]
+    if notes:
+        note_position = (notes[-1].updated_at, notes[-1].id)
+    if tombstones:
+        tombstone_position = (tombstones[-1].deleted_at, tombstones[-1].id)
+
+    return {
+        'changes': [note.to_dict(fields) for note in notes],
+        'deleted': [tombstone.note_id for tombstone in tombstones],
+        'next_cursor': encode_cursor(note_position, tombstone_position, now),
+        'has_more': has_more
+    }
+
+
+def maybe_purge_tombstones():
+    """按固定间隔清理过期墓碑；在写路径中顺带调用，调用方负责提交事务"""
+    global _last_purge
+    with _purge_lock:
+        if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        _last_purge = time.monotonic()
+    NoteTombstone.purge_expired(get_retention())
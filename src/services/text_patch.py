@@ -0,0 +1,75 @@
+"""文本增量补丁
+
+自动保存只需上传本次改动：一组相对基础版本的编辑 {"start", "end", "text"}，
+表示把基础文本的 [start, end) 替换为 text（start == end 为插入，text 为空为删除）。
+所有偏移都指向同一份基础文本，编辑之间不得重叠，服务端按顺序一次拼接出新文本。
+
+偏移单位：
+- codepoint（默认）：Unicode 码点，与 Python 字符串下标一致
+- utf16：UTF-16 码元，与 JavaScript 字符串下标（String.length / slice）一致，
+  前端可直接使用编辑器给出的偏移；落在代理对中间的偏移视为无效
+"""
+
+OFFSET_UNITS = ('codepoint', 'utf16')
+# 单个补丁允许的编辑数上限
+MAX_EDITS = 1000
+
+
+class PatchError(ValueError):
+    """补丁格式错误或与基础文本不匹配"""
+
+
+def parse_edits(raw):
+    """校验编辑列表，返回按 start 排序的 [(start, end, text), ...]"""
+    if not isinstance(raw, list):
+        raise PatchError('edits 必须是数组')
+    if len(raw) > MAX_EDITS:
+        raise PatchError(f'单次最多 {MAX_EDITS} 处编辑')
+    edits = []
+    for index, edit in enumerate(raw):
+        if not isinstance(edit, dict):
+            raise PatchError(f'第 {index} 处编辑格式错误')
+        start, end, text = edit.get('start'), edit.get('end', edit.get('start')), edit.get('text', '')
+        if not isinstance(start, int) or not isinstance(end, int) or isinstance(start, bool) or isinstance(end, bool):
+            raise PatchError(f'第 {index} 处编辑的 start/end 必须是整数')
+        if not isinstance(text, str):
+            raise PatchError(f'第 {index} 处编辑的 text 必须是字符串')
+        if start < 0 or end < start:
+            raise PatchError(f'第 {index} 处编辑的范围无效')
+        edits.append((start, end, text))
+    edits.sort(key=lambda edit: (edit[0], edit[1]))
+    for (_, previous_end, _), (start, _, _) in zip(edits, edits[1:]):
+        if start < previous_end:
+            raise PatchError('编辑范围不能重叠')
+    return edits
+
+
+def _splice(base, edits, empty):
+    pieces = []
+    position = 0
+    for start, end, text in edits:
+        if end > len(base):
+            raise PatchError('编辑范围超出基础文本长度')
+        pieces.append(base[position:start])
+        pieces.append(text)
+        position = end
+    pieces.append(base[position:])
+    return empty.join(pieces)
+
+
+def apply_edits(base, edits, unit='codepoint'):
+    """把 parse_edits 返回的编辑应用到 base，返回新文本"""
+    if unit == 'codepoint':
+        return _splice(base, edits, '')
+    if unit != 'utf16':
+        raise PatchError(f"不支持的偏移单位: {unit}")
+    # 在 UTF-16 字节序列上拼接，偏移乘 2 即字节位置；切断代理对时编码或解码会失败
+    try:
+        encoded = _splice(
+            base.encode('utf-16-le'),
+            [(start * 2, end * 2, text.encode('utf-16-le')) for start, end, text in edits],
+            b''
+        )
+        return encoded.decode('utf-16-le')
+    except UnicodeError:
+        raise PatchError('编辑偏移落在代理对中间')
@@ -0,0 +1,421 @@
+"""自动保存的写合并（write-behind）
+
+编辑器在输入时频繁 PUT 同一篇笔记，每次都是一次 UPDATE + 提交，并触发全文索引更新和
+updated_at 变化。开启后，PUT /api/notes/<id> 只把新的标题/正文记入内存缓冲区，
+同一篇笔记在窗口内的后续保存直接覆盖缓冲中的版本（被"吸收"），到期后只写入最后一个版本；
+多篇笔记同时到期时在一个事务中写入。
+
+- 到期时间：距最近一次保存 AUTOSAVE_COALESCE_MS 毫秒（持续输入时顺延），
+  但距第一次未写入的保存不超过 AUTOSAVE_MAX_DELAY_MS 毫秒
+- 读己之写：GET /api/notes/<id> 在数据库结果上叠加缓冲中的标题/正文，ETag 与 If-Match
+  按缓冲中的版本时间计算
+- 写入时 updated_at 取写入时刻（而不是保存时刻），列表 ETag、增量同步游标与相关笔记索引
+  都能看到这次写入；保存时返回的 ETag 在写入后仍可用于 If-Match（version_alias）
+- 其他写入先落盘再执行：PATCH 与批量更新会先同步写入相关笔记的缓冲版本，删除会丢弃缓冲版本；
+  列表、搜索、增量同步等读取最多落后一个窗口
+- 缓冲区在进程内存中，只适合单个常驻进程（或按笔记粘滞路由）的部署；
+  serverless 模式下实例随时被冻结，不会启用
+
+持久性（AUTOSAVE_DURABILITY）：
+- memory（默认）：进程正常退出时写入全部缓冲；进程崩溃会丢失最多一个窗口内的保存
+- journal：确认前先把保存追加到 AUTOSAVE_JOURNAL 日志文件（AUTOSAVE_FSYNC=1 时 fsync），
+  每批写入提交后把日志压缩为仍未写入的版本；启动时重放日志，
+  数据库中已是该版本、或基础正文已被其他写入替换的条目会被跳过
+
+配置（环境变量）：
+    AUTOSAVE_COALESCE_MS（默认 0，即关闭）：合并窗口，建议 1000-3000
+    AUTOSAVE_MAX_DELAY_MS（默认 窗口的 5 倍）：单篇笔记最长的写入延迟
+    AUTOSAVE_DURABILITY（memory / journal，默认 memory）
+    AUTOSAVE_JOURNAL（默认 autosave.journal）、AUTOSAVE_FSYNC（默认 1）
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from src.models.note import Note, content_hash
+from src.models.user import db
+from src.services.metrics import registry
+
+DURABILITY_MODES = ('memory', 'journal')
+BUFFERED_FIELDS = ('title', 'content')
+# 保留最近写入的笔记的 (保存版本时间, 写入时间)，供写入后仍携带旧 ETag 的客户端使用
+MAX_VERSION_ALIASES = 10000
+# 写入失败后重试前的等待时间（秒）
+RETRY_DELAY = 1.0
+
+autosave_updates = registry.counter(
+    'autosave_updates_total', 'Note updates accepted by the write-behind buffer', ('outcome',)
+)
+autosave_flushes = registry.counter(
+    'autosave_flushes_total', 'Buffered note versions written to the database, by outcome', ('outcome',)
+)
+autosave_flush_delay = registry.histogram(
+    'autosave_flush_delay_seconds', 'Time from the first buffered update of a note to its write', ()
+)
+
+
+class PendingWrite:
+    """一篇笔记尚未写入数据库的最新版本"""
+
+    __slots__ = ('note_id', 'fields', 'updated_at', 'base_hash', 'written_at', 'replayed',
+                 'first_at', 'last_at', 'absorbed')
+
+    def __init__(self, note_id, now, base_hash=None):
+        self.note_id = note_id
+        self.fields = {}
+        self.updated_at = None  # 保存版本时间，即返回给客户端的 ETag
+        self.base_hash = base_hash  # 第一次保存时数据库中的 content_hash
+        self.written_at = None  # 开始写入的时刻，写入后的 updated_at
+        self.replayed = False
+        self.first_at = now
+        self.last_at = now
+        self.absorbed = 0
+
+    def deadline(self, window, max_delay):
+        return min(self.last_at + window, self.first_at + max_delay)
+
+
+class WriteBuffer:
+    """按笔记合并更新的缓冲区，由后台线程按期写入"""
+
+    def __init__(self, app, window, max_delay=None, durability='memory', journal_path=None, fsync=True):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"AUTOSAVE_DURABILITY 必须是 {'/'.join(DURABILITY_MODES)} 之一")
+        self.app = app
+        self.window = window
+        self.max_delay = max(max_delay if max_delay is not None else window * 5, window)
+        self.durability = durability
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self._pending = {}  # note_id -> PendingWrite
+        self._flushing = {}  # 正在写入、尚未提交的版本，读取时同样可见
+        self._aliases = OrderedDict()  # note_id -> (保存版本时间, 写入后的 updated_at)
+        self._lock = threading.Condition()
+        self._closed = False
+        self._journal = None
+        if durability == 'journal':
+            self._replay_journal()
+            self._journal = open(journal_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='autosave-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # 请求路径 ----------------------------------------------------------------
+
+    def submit(self, note_id, fields, base_hash=None):
+        """记录一次保存，返回该笔记的缓冲版本时间（即响应中的 ETag）
+
+        base_hash 为保存时数据库中的 content_hash，重放日志时用来判断基础版本是否已被替换。
+        """
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending.get(note_id)
+            if pending is None:
+                pending = self._pending[note_id] = PendingWrite(note_id, now, base_hash)
+                # 上一个版本正在写入时以它为基础，只更新部分字段的保存不会丢掉其他字段
+                flushing = self._flushing.get(note_id)
+                if flushing is not None:
+                    pending.fields.update(flushing.fields)
+                    if 'content' in flushing.fields:
+                        pending.base_hash = content_hash(flushing.fields['content'])
+                autosave_updates.inc(outcome='buffered')
+            else:
+                pending.absorbed += 1
+                autosave_updates.inc(outcome='absorbed')
+            pending.fields.update({name: fields[name] for name in BUFFERED_FIELDS if name in fields})
+            pending.last_at = now
+            # 同一篇笔记的版本时间严格递增（也晚于正在写入的版本的 updated_at），保证每次保存得到不同的 ETag
+            stamp = datetime.utcnow()
+            flushing = self._flushing.get(note_id)
+            previous = [value for value in (
+                pending.updated_at,
+                flushing.updated_at if flushing else None,
+                flushing.written_at if flushing else None,
+            ) if value is not None]
+            if previous and stamp <= max(previous):
+                stamp = max(previous) + timedelta(microseconds=1)
+            pending.updated_at = stamp
+            if self._journal is not None:
+                self._append_journal(pending)
+            self._lock.notify_all()
+            return stamp
+
+    def overlay(self, note_id):
+        """返回 (缓冲中的字段, 版本时间)；没有未写入的版本时返回 None"""
+        with self._lock:
+            pending = self._latest(note_id)
+            if pending is None:
+                return None
+            return dict(pending.fields), pending.updated_at
+
+    def version_alias(self, note_id, updated_at):
+        """笔记最近一次写入的保存版本时间；数据库中的 updated_at 不再是那次写入的结果时返回 None
+
+        保存时返回的 ETag 基于保存版本时间，写入后 updated_at 变为写入时刻，
+        条件请求仍可用旧 ETag 匹配这一版本。
+        """
+        with self._lock:
+            alias = self._aliases.get(note_id)
+        if alias is not None and alias[1] == updated_at:
+            return alias[0]
+        return None
+
+    def discard(self, note_id):
+        """笔记被删除时丢弃其缓冲版本（正在写入的版本会因笔记不存在而跳过）"""
+        with self._lock:
+            self._pending.pop(note_id, None)
+            self._aliases.pop(note_id, None)
+
+    def flush_notes(self, note_ids):
+        """在当前应用上下文中同步写入指定笔记的缓冲版本，供随后的其他写操作使用最新正文"""
+        with self._lock:
+            # 等待后台线程正在写入的同一批笔记完成，避免旧版本覆盖新版本
+            while any(note_id in self._flushing for note_id in note_ids):
+                self._lock.wait()
+            entries = [self._pending.pop(note_id) for note_id in note_ids if note_id in self._pending]
+            self._start_writing(entries)
+        if entries and not self._write(entries):
+            raise RuntimeError('缓冲的自动保存写入失败，请稍后重试')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': True,
+                'window_ms': round(self.window * 1000),
+                'max_delay_ms': round(self.max_delay * 1000),
+                'durability': self.durability,
+                'pending_notes': len(self._pending) + len(self._flushing),
+                'buffered': autosave_updates.value(outcome='buffered'),
+                'absorbed': autosave_updates.value(outcome='absorbed'),
+                'flushed': autosave_flushes.value(outcome='ok'),
+                'flush_errors': autosave_flushes.value(outcome='error'),
+            }
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending) + len(self._flushing)
+
+    def _latest(self, note_id):
+        return self._pending.get(note_id) or self._flushing.get(note_id)
+
+    # 写入 --------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while True:
+                    now = time.monotonic()
+                    # 同一篇笔记的上一个版本仍在写入（请求中同步写入）时，等它提交后再写
+                    candidates = [entry for entry in self._pending.values() if entry.note_id not in self._flushing]
+                    due = [entry for entry in candidates
+                           if self._closed or entry.deadline(self.window, self.max_delay) <= now]
+                    if due or (self._closed and not self._pending):
+                        break
+                    deadlines = [entry.deadline(self.window, self.max_delay) for entry in candidates]
+                    self._lock.wait(max(0.0, min(deadlines) - now) if deadlines else None)
+                if not due:
+                    return
+                for entry in due:
+                    del self._pending[entry.note_id]
+                self._start_writing(due)
+            with self.app.app_context():
+                try:
+                    written = self._write(due)
+                finally:
+                    db.session.remove()
+            if not written and self._closed:
+                # 退出时数据库不可用，不再重试（journal 模式下由下次启动重放）
+                return
+
+    def _start_writing(self, entries):
+        """把一批版本标记为写入中（调用方持有锁）
+
+        写入时刻在这里确定：之后的保存得到更晚的版本时间，ETag 始终随保存递增。
+        """
+        written_at = datetime.utcnow()
+        for entry in entries:
+            entry.written_at = max(written_at, entry.updated_at + timedelta(microseconds=1))
+            self._flushing[entry.note_id] = entry
+
+    def _is_stale_replay(self, entry, row):
+        """重放的条目已经写入过，或其基础正文已被之后的其他写入（如 PATCH）替换"""
+        if all(getattr(row, name) == value for name, value in entry.fields.items()):
+            return True
+        return entry.base_hash is not None and row.content_hash != entry.base_hash
+
+    def _write(self, entries):
+        """在一个事务中写入一批缓冲版本，返回是否成功；失败时放回缓冲区稍后重试"""
+        written = {}
+        try:
+            existing = {
+                row.id: row for row in db.session.execute(
+                    select(Note.id, Note.title, Note.content, Note.content_hash, Note.updated_at)
+                    .where(Note.id.in_([entry.note_id for entry in entries]))
+                )
+            }
+            for entry in entries:
+                row = existing.get(entry.note_id)
+                if row is None:
+                    autosave_flushes.inc(outcome='missing')
+                    continue
+                if entry.replayed and self._is_stale_replay(entry, row):
+                    autosave_flushes.inc(outcome='stale')
+                    continue
+                values = dict(entry.fields)
+                if 'content' in values:
+                    values['content_hash'] = content_hash(values['content'])
+                # updated_at 取写入时刻，列表 ETag 与增量同步游标才能看到这次写入；
+                # 期间若有其他写入（如保存 AI 结果）推进了 updated_at，仍保持递增
+                updated_at = entry.written_at
+                if row.updated_at and updated_at <= row.updated_at:
+                    updated_at = row.updated_at + timedelta(microseconds=1)
+                values['updated_at'] = written[entry.note_id] = updated_at
+                db.session.execute(
+                    update(Note).where(Note.id == entry.note_id).values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+        except Exception:
+            traceback.print_exc()
+            db.session.rollback()
+            retry_at = time.monotonic() + RETRY_DELAY
+            with self._lock:
+                for entry in entries:
+                    self._flushing.pop(entry.note_id, None)
+                    autosave_flushes.inc(outcome='error')
+                    # 期间又有新的保存时以新版本为准，否则放回原版本
+                    if entry.note_id not in self._pending:
+                        entry.last_at = entry.first_at = retry_at - self.window
+                        self._pending[entry.note_id] = entry
+                self._lock.notify_all()
+            return False
+
+        finished = time.monotonic()
+        with self._lock:
+            for entry in entries:
+                self._flushing.pop(entry.note_id, None)
+                if entry.note_id in written:
+                    autosave_flushes.inc(outcome='ok')
+                    autosave_flush_delay.observe(finished - entry.first_at)
+                    self._aliases.pop(entry.note_id, None)
+                    self._aliases[entry.note_id] = (entry.updated_at, written[entry.note_id])
+            while len(self._aliases) > MAX_VERSION_ALIASES:
+                self._aliases.popitem(last=False)
+            if self._journal is not None:
+                self._compact_journal()
+            self._lock.notify_all()
+        return True
+
+    def close(self):
+        """停止后台线程并写入全部缓冲（进程退出时自动调用）"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._lock.notify_all()
+        self._thread.join(timeout=30)
+        if self._journal is not None:
+            self._journal.close()
+
+    # 日志 --------------------------------------------------------------------
+
+    @staticmethod
+    def _journal_record(entry):
+        return json.dumps({
+            'note_id': entry.note_id, 'fields': entry.fields, 'updated_at': entry.updated_at.isoformat(),
+            'base_hash': entry.base_hash
+        }, ensure_ascii=False) + '\n'
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _append_journal(self, entry):
+        self._journal.write(self._journal_record(entry))
+        self._sync(self._journal)
+
+    def _compact_journal(self):
+        """每批写入提交后，把日志改写为仍未写入的版本（调用方持有锁）
+
+        先写临时文件再原子替换，崩溃时保留的要么是旧日志，要么是新日志。
+        """
+        entries = list(self._flushing.values()) + [
+            entry for note_id, entry in self._pending.items() if note_id not in self._flushing
+        ]
+        temporary = self.journal_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(self._journal_record(entry))
+            self._sync(f)
+        self._journal.close()
+        os.replace(temporary, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _replay_journal(self):
+        """把上次进程退出前未写入的版本放回缓冲区，由后台线程写入"""
+        if not os.path.exists(self.journal_path):
+            return
+        now = time.monotonic()
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    continue
+                entry = self._pending.get(record['note_id'])
+                if entry is None:
+                    entry = PendingWrite(record['note_id'], now - self.max_delay, record.get('base_hash'))
+                    # 写入前与数据库核对，跳过已写入或已被更新的写入替换的版本
+                    entry.replayed = True
+                entry.fields.update(record['fields'])
+                entry.updated_at = datetime.fromisoformat(record['updated_at'])
+                self._pending[entry.note_id] = entry
+        if self._pending:
+            print(f'Replaying {len(self._pending)} buffered autosave(s) from {self.journal_path}')
+
+
+_buffer = None
+# serverless 模式下不启用，判断结果只在首次调用时确定
+_disabled = False
+_buffer_lock = threading.Lock()
+registry.register_collector(lambda: [
+    ('autosave_pending_notes', 'gauge', 'Notes with buffered updates not yet written',
+     [({}, _buffer.pending_count() if _buffer else 0)])
+])
+
+
+def get_write_buffer(app):
+    """返回进程内的写合并缓冲区；未开启（或 serverless 模式）时返回 None"""
+    global _buffer, _disabled
+    window_ms = int(os.environ.get('AUTOSAVE_COALESCE_MS', 0))
+    if window_ms <= 0 or _disabled:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None and not _disabled:
+                from src.services.database import get_pool_mode
+
+                if get_pool_mode() == 'serverless':
+                    print('Warning: AUTOSAVE_COALESCE_MS is ignored in serverless mode; updates are written directly.')
+                    _disabled = True
+                    return None
+                max_delay_ms = os.environ.get('AUTOSAVE_MAX_DELAY_MS')
+                _buffer = WriteBuffer(
+                    app,
+                    window=window_ms / 1000.0,
+                    max_delay=int(max_delay_ms) / 1000.0 if max_delay_ms else None,
+                    durability=os.environ.get('AUTOSAVE_DURABILITY', 'memory').lower(),
+                    journal_path=os.environ.get('AUTOSAVE_JOURNAL', 'autosave.journal'),
+                    fsync=os.environ.get('AUTOSAVE_FSYNC', '1') != '0'
+                )
+    return _buffer
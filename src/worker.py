@@ -0,0 +1,35 @@
+"""AI 任务独立 worker
+
+生产环境（AI_JOB_MODE=external）下，Web 进程只负责把任务写入 ai_job 表，
+由本进程轮询领取并执行。需要与 Web 进程使用同一个 DATABASE_URL。
+
+Usage:
+    python -m src.worker --concurrency 4 --poll-interval 1.0
+    python -m src.worker --once   # 处理完当前队列后退出
+"""
+
+import argparse
+import os
+import sys
+
+# 与 src/main.py 一致，保证以脚本方式运行时可以 import src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+from src.services.jobs import DEFAULT_CONCURRENCY, run_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the AI job worker')
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.environ.get('AI_JOB_CONCURRENCY', DEFAULT_CONCURRENCY)))
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--once', action='store_true', help='处理完当前队列后退出')
+    args = parser.parse_args()
+
+    print(f'AI job worker started: concurrency={args.concurrency}, poll_interval={args.poll_interval}s')
+    run_worker(app, concurrency=args.concurrency, poll_interval=args.poll_interval, once=args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""测试公共夹具
+
+与基准脚本相同，在导入 `src.main` 之前设置 DATABASE_URL：默认为临时目录下的 SQLite 文件，
+设置 TEST_DATABASE_URL（如本地 PostgreSQL / MySQL 的空库）时在该数据库上运行。
+每个测试结束后清空全部表，测试之间互不影响。
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or \
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='notes-test-'), 'test.db')}"
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app, init_database
+
+    init_database()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def db(app):
+    from src.models.user import db
+
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_note(db):
+    """直接写入一篇笔记，返回其 id"""
+    from src.models.note import Note
+
+    def make(title='title', content='content'):
+        note = Note(title=title, content=content)
+        db.session.add(note)
+        db.session.commit()
+        return note.id
+
+    return make
@@ -0,0 +1,175 @@
+"""AI 调用的熔断、重试与限流"""
+
+import time
+
+import pytest
+
+from src.services.ai_resilience import (
+    AIGuard, BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, CircuitOpenError,
+    DeadlineExceeded, TokenBucket, classify_error, retry_after_seconds,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class UpstreamError(Exception):
+    """与 openai.APIStatusError 一样带 status_code 和 response"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+
+def scripted(*outcomes):
+    """依次返回或抛出 outcomes 中的值，并记录每次调用收到的 timeout"""
+    calls = []
+
+    def func(timeout):
+        calls.append(timeout)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return func, calls
+
+
+def make_guard(max_retries=3, failures=5, reset=30.0, rate=0, deadline=5.0):
+    return AIGuard(
+        TokenBucket(rate, 10), CircuitBreaker(failures, reset),
+        max_retries=max_retries, base_delay=0.001, max_delay=0.01, deadline=deadline
+    )
+
+
+def test_classify_error():
+    assert classify_error(UpstreamError(429)) == 'rate_limited'
+    assert classify_error(UpstreamError(503)) == 'server_error'
+    assert classify_error(TimeoutError()) == 'timeout'
+    assert classify_error(ConnectionError()) == 'connection'
+    assert classify_error(UpstreamError(400)) is None
+    assert classify_error(ValueError()) is None
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(UpstreamError(429, {'retry-after-ms': '1500'})) == 1.5
+    assert retry_after_seconds(UpstreamError(429, {'retry-after': '2'})) == 2.0
+    assert retry_after_seconds(UpstreamError(429)) is None
+
+
+def test_retries_transient_errors_then_succeeds():
+    guard = make_guard()
+    func, calls = scripted(UpstreamError(502), TimeoutError(), 'ok')
+
+    assert guard.call(func) == 'ok'
+    assert len(calls) == 3
+    assert guard.breaker.state() == {'state': BREAKER_CLOSED, 'consecutive_failures': 0}
+
+
+def test_gives_up_after_max_retries():
+    guard = make_guard(max_retries=2)
+    func, calls = scripted(UpstreamError(500))
+
+    with pytest.raises(UpstreamError):
+        guard.call(func)
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    guard = make_guard()
+    func, calls = scripted(UpstreamError(400), 'ok')
+
+    with pytest.raises(UpstreamError):
+        guard.call(func)
+    assert len(calls) == 1
+    assert guard.breaker.state()['consecutive_failures'] == 0
+
+
+def test_rate_limit_pauses_bucket_without_tripping_breaker():
+    guard = make_guard(failures=1, rate=1000)
+    func, calls = scripted(UpstreamError(429, {'retry-after-ms': '50'}), 'ok')
+
+    started = time.monotonic()
+    assert guard.call(func) == 'ok'
+
+    # 重试前等待了 Retry-After 指定的时间，且限流不计入熔断
+    assert time.monotonic() - started >= 0.05
+    assert len(calls) == 2
+    assert guard.breaker.state()['state'] == BREAKER_CLOSED
+
+
+def test_retry_stops_at_deadline():
+    guard = make_guard(max_retries=10, deadline=0.2)
+    func, calls = scripted(UpstreamError(503, {'retry-after': '1'}))
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamError):
+        guard.call(func)
+    # Retry-After 超过剩余时间时不再等待
+    assert len(calls) == 1 and time.monotonic() - started < 0.2
+
+
+def test_rate_limiter_rejects_when_deadline_too_short():
+    guard = AIGuard(TokenBucket(1, 1), CircuitBreaker(5, 30), deadline=0.05)
+    func, calls = scripted('ok')
+
+    assert guard.call(func) == 'ok'
+    # 桶已空，下一个令牌要 1 秒后才有
+    with pytest.raises(DeadlineExceeded):
+        guard.call(func)
+    assert len(calls) == 1
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast():
+    guard = make_guard(max_retries=0, failures=2)
+    failing, calls = scripted(UpstreamError(500))
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            guard.call(failing)
+    assert guard.breaker.state()['state'] == BREAKER_OPEN
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        guard.call(failing)
+    assert len(calls) == 2
+    assert 0 < excinfo.value.retry_in <= 30
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker(1, 0.05)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+    assert breaker.state()['state'] == BREAKER_HALF_OPEN
+    # 探测进行中时其他调用仍被拒绝
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    # 探测失败重新打开，成功则恢复
+    breaker.record_failure()
+    assert breaker.state()['state'] == BREAKER_OPEN
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state() == {'state': BREAKER_CLOSED, 'consecutive_failures': 0}
+    breaker.allow()
+
+
+def test_client_error_probe_lets_next_probe_through():
+    guard = make_guard(max_retries=0, failures=1, reset=0.05)
+    with pytest.raises(UpstreamError):
+        guard.call(scripted(UpstreamError(500))[0])
+    time.sleep(0.06)
+
+    # 探测请求遇到 4xx 不计为失败，释放探测名额，下一次调用继续探测而不是卡在 half-open
+    with pytest.raises(UpstreamError):
+        guard.call(scripted(UpstreamError(400))[0])
+    assert guard.call(scripted('ok')[0]) == 'ok'
+    assert guard.breaker.state()['state'] == BREAKER_CLOSED
@@ -0,0 +1,26 @@
+"""PUT /api/notes/<id> 的 If-Match 乐观并发控制"""
+
+
+def test_put_with_matching_etag_updates(client, make_note):
+    note_id = make_note('title', 'v1')
+    etag = client.get(f'/api/notes/{note_id}').headers['ETag']
+
+    response = client.put(f'/api/notes/{note_id}', json={'content': 'v2'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['content'] == 'v2'
+
+    response = client.put(f'/api/notes/{note_id}', json={'content': 'v3'}, headers={'If-Match': etag})
+    assert response.status_code == 412
+
+
+def test_put_without_body_does_not_leave_lock_open(client, db, make_note):
+    note_id = make_note()
+    etag = client.get(f'/api/notes/{note_id}').headers['ETag']
+    # 测试请求共用夹具的会话：先结束 GET 留下的读事务
+    db.session.rollback()
+
+    response = client.put(f'/api/notes/{note_id}', json={}, headers={'If-Match': etag})
+
+    assert response.status_code == 400
+    # 400 返回前没有执行加锁查询，会话中没有未结束的事务
+    assert not db.session().in_transaction()
@@ -0,0 +1,12 @@
+"""连接池统计"""
+
+
+def test_pool_counters_are_attached_at_startup(client, make_note):
+    make_note()
+    client.get('/api/notes')
+
+    stats = client.get('/api/system/db-pool').get_json()
+
+    # 启动时已挂载计数器，第一个连接及之后的借出都被统计到
+    assert stats['connects'] >= 1
+    assert stats['checkouts'] >= stats['connects']
@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.job import AIJob, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from src.services import jobs
+
+
+@pytest.fixture
+def fake_extract(monkeypatch):
+    """用不调用模型的执行函数替换 extract 操作，记录每次执行"""
+    calls = []
+
+    def run(payload):
+        calls.append(payload['content'])
+        return {'extracted_info': payload['content'].upper()}
+
+    monkeypatch.setitem(jobs.OPERATIONS, 'extract', (run, lambda note, result, source_hash: None))
+    monkeypatch.setattr(jobs, '_last_stale_check', 0.0)
+    return calls
+
+
+def wait_status(client, db, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        body = client.get(f'/api/jobs/{job_id}').get_json()
+        if body['status'] == status or time.monotonic() > deadline:
+            return body
+        # 测试请求共用夹具的应用上下文与会话，结束读事务才能看到执行线程的提交
+        db.session.rollback()
+        time.sleep(0.02)
+
+
+def test_serverless_runs_thread_mode_jobs_inline(client, fake_extract, monkeypatch):
+    monkeypatch.delenv('AI_JOB_MODE', raising=False)
+    monkeypatch.setenv('DB_POOL_MODE', 'serverless')
+    assert jobs.get_job_mode() == 'inline'
+
+    response = client.post('/api/notes/extract-info', json={'content': 'hello inline', 'async': True})
+    assert response.status_code == 202
+    assert response.get_json()['status'] == JOB_SUCCEEDED
+    assert fake_extract == ['hello inline']
+
+
+def test_invalid_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv('AI_JOB_MODE', 'threads')
+    with pytest.raises(ValueError):
+        jobs.get_job_mode()
+
+
+def test_invalid_mode_does_not_leave_a_queued_job(client, db, fake_extract, monkeypatch):
+    monkeypatch.setenv('AI_JOB_MODE', 'threads')
+
+    response = client.post('/api/notes/extract-info', json={'content': 'hello', 'async': True})
+
+    assert response.status_code == 500
+    db.session.rollback()
+    assert AIJob.query.count() == 0
+    assert fake_extract == []
+
+
+def test_polling_requeues_stale_job_in_thread_mode(client, db, fake_extract, monkeypatch):
+    monkeypatch.setenv('AI_JOB_MODE', 'thread')
+    monkeypatch.setenv('DB_POOL_MODE', 'server')
+    # 执行它的线程已随进程退出：状态停在 running
+    job = jobs.create_job('extract', {'content': 'orphaned'})
+    job.status = JOB_RUNNING
+    job.attempts = 1
+    job.started_at = datetime.utcnow() - timedelta(seconds=jobs.STALE_JOB_SECONDS + 1)
+    db.session.commit()
+
+    body = wait_status(client, db, job.id, JOB_SUCCEEDED)
+    assert body['status'] == JOB_SUCCEEDED
+    assert body['attempts'] == 2
+    assert body['result']['extracted_info'] == 'ORPHANED'
+    assert fake_extract == ['orphaned']
+
+
+def test_polling_resubmits_queued_job_in_thread_mode(client, db, fake_extract, monkeypatch):
+    monkeypatch.setenv('AI_JOB_MODE', 'thread')
+    monkeypatch.setenv('DB_POOL_MODE', 'server')
+    # 入队后进程重启，本进程的执行器里没有这个任务
+    job_id = jobs.create_job('extract', {'content': 'lost'}).id
+    assert db.session.get(AIJob, job_id).status == JOB_QUEUED
+
+    assert wait_status(client, db, job_id, JOB_SUCCEEDED)['status'] == JOB_SUCCEEDED
+    assert fake_extract == ['lost']
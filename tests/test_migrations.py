@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+# 迁移脚本是独立脚本，不是包
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
+
+
+@pytest.fixture
+def legacy_engine(app, tmp_path):
+    """带旧版 translations / quiz_* 列的独立 SQLite 数据库"""
+    from src.models.user import db
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for column, kind in (('translations', 'TEXT'), ('quiz_question', 'TEXT'), ('quiz_options', 'TEXT'),
+                             ('quiz_answer', 'TEXT'), ('quiz_explanation', 'TEXT'),
+                             ('quiz_generated_at', 'DATETIME')):
+            connection.execute(text(f'ALTER TABLE note ADD COLUMN {column} {kind}'))
+    yield engine
+    engine.dispose()
+
+
+def test_backfill_keeps_other_languages_of_partially_translated_note(legacy_engine):
+    from migrate_normalize_note_children import backfill_batch
+    from src.models.note import NoteTranslation
+
+    now = datetime(2026, 1, 1)
+    with legacy_engine.begin() as connection:
+        connection.execute(text(
+            'INSERT INTO note (id, title, content, translations, created_at, updated_at) '
+            'VALUES (1, :title, :content, :translations, :now, :now)'
+        ), {'title': 't', 'content': 'c', 'now': now,
+            'translations': json.dumps({'English': 'legacy en', 'Japanese': 'legacy ja'})})
+        # 升级后、回填之前，应用写入了新的英文译文
+        connection.execute(text(
+            "INSERT INTO note_translation (note_id, language, text, updated_at) VALUES (1, 'English', 'new en', :now)"
+        ), {'now': now})
+
+    with legacy_engine.begin() as connection:
+        last_id, notes, added, _ = backfill_batch(connection, 0, 100)
+    assert (last_id, notes, added) == (1, 1, 1)
+
+    with legacy_engine.connect() as connection:
+        rows = {language: value for language, value in connection.execute(
+            select(NoteTranslation.language, NoteTranslation.text)
+        )}
+    assert rows == {'English': 'new en', 'Japanese': 'legacy ja'}
+
+    # 重复执行不会再插入
+    with legacy_engine.begin() as connection:
+        assert backfill_batch(connection, 0, 100)[2] == 0
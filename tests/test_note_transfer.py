@@ -0,0 +1,112 @@
+import json
+
+from sqlalchemy import event
+
+from src.models.note import Note
+from src.services.note_transfer import export_chunks, import_notes, iter_export_records
+
+
+def seed(db, count):
+    ids = []
+    for i in range(count):
+        note = Note(title=f'note {i}', content=f'content {i}')
+        db.session.add(note)
+        db.session.flush()
+        if i % 2 == 0:
+            note.apply_translations({'English': f'en {i}', 'Japanese': f'ja {i}'}, 'hash')
+        if i % 3 == 0:
+            note.apply_quiz({'question': f'q {i}', 'options': ['a', 'b'], 'answer': 'a'}, 'hash')
+        ids.append(note.id)
+    db.session.commit()
+    return ids
+
+
+def test_export_pages_embed_the_right_children(db):
+    ids = seed(db, 7)
+    records = list(iter_export_records(batch_size=3))
+    assert [record['id'] for record in records] == ids
+    for i, record in enumerate(records):
+        expected = [{'English': f'en {i}'}, {'Japanese': f'ja {i}'}] if i % 2 == 0 else []
+        assert [{row['language']: row['text']} for row in record['translations']] == expected
+        if i % 3 == 0:
+            assert record['quiz']['question'] == f'q {i}'
+            assert record['quiz']['options'] == ['a', 'b']
+        else:
+            assert record['quiz'] is None
+
+
+def test_export_reads_each_result_set_before_the_next_query(db):
+    """同一连接上不能同时打开多个结果集（MySQL 非缓冲游标）：执行下一条语句时，之前的结果必须已读完"""
+    seed(db, 5)
+    results = []
+    still_open = []
+
+    def before(conn, clauseelement, multiparams, params, execution_options):
+        still_open.append(sum(1 for result in results if not result._soft_closed))
+
+    def after(conn, clauseelement, multiparams, params, execution_options, result):
+        results.append(result)
+
+    event.listen(db.engine, 'before_execute', before)
+    event.listen(db.engine, 'after_execute', after)
+    try:
+        records = list(iter_export_records(batch_size=2))
+    finally:
+        event.remove(db.engine, 'before_execute', before)
+        event.remove(db.engine, 'after_execute', after)
+    assert len(records) == 5
+    assert still_open and max(still_open) == 0
+
+
+def test_round_trip_with_preserved_ids(db):
+    seed(db, 4)
+    exported = ''.join(export_chunks()).splitlines()
+    before = [json.loads(line) for line in exported]
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+
+    result = import_notes(exported, preserve_ids=True, batch_size=3)
+    assert result['imported'] == 4 and result['batches'] == 2 and not result['errors']
+    after = [json.loads(line) for line in ''.join(export_chunks()).splitlines()]
+    for old, new in zip(before, after):
+        assert (old['id'], old['title'], old['content'], old['quiz'] and old['quiz']['question']) == \
+            (new['id'], new['title'], new['content'], new['quiz'] and new['quiz']['question'])
+        assert [row['text'] for row in old['translations']] == [row['text'] for row in new['translations']]
+
+
+def test_import_skips_malformed_lines(db):
+    lines = [json.dumps({'title': 'ok', 'content': 'x'}), '{broken', json.dumps({'title': 'no content'})]
+    result = import_notes(lines)
+    assert result['imported'] == 1
+    assert [error['line'] for error in result['errors']] == [2, 3]
+
+
+def test_sync_between_import_batches_sees_later_batches(client, db, make_note):
+    edited = make_note('existing', 'before')
+    cursor = client.get('/api/notes/changes').get_json()['next_cursor']
+    synced = {}
+
+    def lines():
+        yield json.dumps({'title': 'first batch', 'content': 'a'})
+        # 第一批已提交：此时另一客户端修改笔记并同步，游标越过第一批与这次修改
+        assert client.put(f'/api/notes/{edited}', json={'content': 'after'}).status_code == 200
+        body = client.get('/api/notes/changes', query_string={'since': cursor, 'fields': 'id,title'}).get_json()
+        synced['mid'] = [note['title'] for note in body['changes']]
+        synced['cursor'] = body['next_cursor']
+        yield json.dumps({'title': 'second batch', 'content': 'b'})
+
+    result = import_notes(lines(), batch_size=1)
+    assert result['batches'] == 2
+    assert synced['mid'] == ['first batch', 'existing']
+
+    body = client.get('/api/notes/changes', query_string={'since': synced['cursor'], 'fields': 'id,title'}).get_json()
+    assert [note['title'] for note in body['changes']] == ['second batch']
+
+
+def test_import_fills_missing_child_timestamps_at_write_time(db):
+    line = json.dumps({'title': 't', 'content': 'c', 'translations': {'English': 'en'}})
+    import_notes([line])
+    note = Note.query.one()
+    assert note.created_at == note.updated_at
+    assert note.translation_rows[0].updated_at == note.updated_at
@@ -0,0 +1,136 @@
+"""只读副本路由与复制延迟检查（两个 SQLite 文件分别充当主库与副本）"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, select, text
+
+from src.models.replica import HEARTBEAT_ID, ReplicaHeartbeat
+from src.services import replicas
+from src.services.replicas import STICKY_COOKIE, ReplicaRouter, RoutingSession
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        ReplicaHeartbeat.__table__.create(engine)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def replicate(primary, replica):
+    """把主库的心跳复制到副本"""
+    with primary.connect() as connection:
+        beat_at = connection.execute(select(ReplicaHeartbeat.beat_at)).scalar()
+    with replica.begin() as connection:
+        connection.execute(ReplicaHeartbeat.__table__.delete())
+        connection.execute(ReplicaHeartbeat.__table__.insert().values(id=HEARTBEAT_ID, beat_at=beat_at))
+
+
+def test_replica_without_heartbeat_is_not_used(engines):
+    primary, replica = engines
+    router = ReplicaRouter(primary, [('replica_0', replica)], max_lag=5)
+
+    router.check(force=True)
+
+    state = router.replicas[0]
+    assert not state.healthy and state.lag is None
+    # 检查同时在主库写入了心跳
+    with primary.connect() as connection:
+        assert connection.execute(select(ReplicaHeartbeat.beat_at)).scalar() is not None
+
+
+def test_lag_follows_heartbeat_not_data_age(engines):
+    primary, replica = engines
+    router = ReplicaRouter(primary, [('replica_0', replica)], max_lag=5)
+    router.check(force=True)
+    replicate(primary, replica)
+
+    # 主库长时间没有写入数据，但副本已复制到最近的心跳：不算延迟
+    router.check(force=True)
+    state = router.replicas[0]
+    assert state.healthy and state.lag < 5
+
+    # 副本停止复制后，它的心跳越来越旧
+    with primary.begin() as connection:
+        connection.execute(ReplicaHeartbeat.__table__.update().values(beat_at=datetime.utcnow()))
+    with replica.begin() as connection:
+        connection.execute(
+            ReplicaHeartbeat.__table__.update().values(beat_at=datetime.utcnow() - timedelta(seconds=60))
+        )
+    router.check(force=True)
+    assert not state.healthy and state.lag >= 60
+    assert router.choose() is None
+
+
+def test_unreachable_replica_is_skipped(engines, tmp_path):
+    primary, _ = engines
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(primary, [('replica_0', broken)], max_lag=5)
+
+    router.check(force=True)
+
+    assert not router.replicas[0].healthy and router.replicas[0].error
+
+
+@pytest.fixture
+def routed_app(tmp_path, monkeypatch):
+    """带一个副本的最小应用；主库与副本中的 marker 表内容不同，以此判断查询走了哪个库"""
+    primary_url = f"sqlite:///{tmp_path / 'primary.db'}"
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = primary_url
+    app.config['SQLALCHEMY_BINDS'] = {'replica_0': replica_url}
+    db = SQLAlchemy(session_options={'class_': RoutingSession})
+    db.init_app(app)
+
+    @app.route('/api/where', methods=['GET', 'POST', 'OPTIONS'])
+    def where():
+        return jsonify(db.session.execute(text('SELECT name FROM marker')).scalar())
+
+    with app.app_context():
+        for name, engine in (('primary', db.engines[None]), ('replica', db.engines['replica_0'])):
+            with engine.begin() as connection:
+                connection.execute(text('CREATE TABLE marker (name TEXT)'))
+                connection.execute(text('INSERT INTO marker VALUES (:name)'), {'name': name})
+                ReplicaHeartbeat.__table__.create(connection)
+                connection.execute(
+                    ReplicaHeartbeat.__table__.insert().values(id=HEARTBEAT_ID, beat_at=datetime.utcnow())
+                )
+        # 路由器与指标采集器是进程级的，测试结束后还原
+        monkeypatch.setattr(replicas, '_router', None)
+        monkeypatch.setattr(replicas.registry, 'register_collector', lambda collector: None)
+        replicas.init_app(app, db)
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_get_reads_from_replica_and_options_from_primary(routed_app):
+    client = routed_app.test_client()
+
+    response = client.get('/api/where')
+    assert response.get_json() == 'replica'
+    assert response.headers['X-Database-Route'] == 'replica_0'
+
+    response = client.options('/api/where')
+    assert 'X-Database-Route' not in response.headers
+    assert STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+
+
+def test_write_keeps_client_on_primary(routed_app):
+    client = routed_app.test_client()
+
+    response = client.post('/api/where')
+    assert response.get_json() == 'primary'
+    assert STICKY_COOKIE in response.headers['Set-Cookie']
+
+    response = client.get('/api/where')
+    assert response.get_json() == 'primary'
+    assert response.headers['X-Database-Route'] == 'sticky'
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import event, text
+
+from src.services import search
+
+PAYLOAD = '<img src=x onerror=alert(1)> secret & "quoted" text'
+
+
+@pytest.fixture(params=['auto', 'like'])
+def backend(request, monkeypatch):
+    monkeypatch.setenv('SEARCH_BACKEND', request.param)
+    monkeypatch.setattr(search, '_backends', {})
+    return request.param
+
+
+def test_snippets_escape_note_text(client, make_note, backend):
+    make_note(title='<b>secret</b> title', content=PAYLOAD)
+    response = client.get('/api/notes/search', query_string={'q': 'secret'})
+    assert response.status_code == 200
+    item = response.get_json()['items'][0]
+    assert item['title'] == '&lt;b&gt;<mark>secret</mark>&lt;/b&gt; title'
+    assert '<img' not in item['snippet']
+    assert item['snippet'].startswith('&lt;img src=x onerror=alert(1)&gt; <mark>')
+    # 去掉 <mark> 后不应再有任何标签
+    assert '<' not in item['snippet'].replace('<mark>', '').replace('</mark>', '')
+
+
+def test_query_with_markup_is_escaped_inside_mark(client, make_note, backend):
+    make_note(title='plain', content='before <script> after')
+    item = client.get('/api/notes/search', query_string={'q': '<script>'}).get_json()['items'][0]
+    assert '<script>' not in item['snippet']
+    assert '&lt;script&gt;' in item['snippet']
+
+
+
+@pytest.fixture
+def sqlite_only(db):
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('drops SQLite FTS5 objects')
+
+
+def test_missing_index_falls_back_to_like_without_ddl(db, sqlite_only, monkeypatch):
+    monkeypatch.setenv('SEARCH_BACKEND', 'auto')
+    monkeypatch.setattr(search, '_backends', {})
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with db.engine.begin() as connection:
+        connection.execute(text('DROP TRIGGER note_fts_au'))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        assert search.get_search_backend('anything').name == 'like'
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+        search.install_search_index(db.engine)
+    # 请求路径只做检查查询
+    assert statements and all(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+
+
+def test_installed_index_is_detected(db, sqlite_only, monkeypatch):
+    monkeypatch.setenv('SEARCH_BACKEND', 'auto')
+    monkeypatch.setattr(search, '_backends', {})
+    backend = search.get_search_backend()
+    assert backend.name == 'sqlite_fts5' and backend.tokenizer == 'trigram'
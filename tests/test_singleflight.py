@@ -0,0 +1,144 @@
+"""单飞合并：并发的相同调用只执行一次"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.services import ai_service
+from src.services.ai_cache import AICache, MemoryCache
+from src.services.singleflight import SingleFlight
+
+
+def run_together(count, func):
+    """count 个线程同时调用 func，返回各自的结果（异常作为结果返回）"""
+    barrier = threading.Barrier(count)
+
+    def call():
+        barrier.wait()
+        try:
+            return func()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(count) as pool:
+        return list(pool.map(lambda _: call(), range(count)))
+
+
+def wait_followers(flight, count):
+    """等到正在执行的调用上有 count 个 follower"""
+    deadline = time.monotonic() + 5
+    while sum(call.followers for call in list(flight._calls.values())) < count:
+        assert time.monotonic() < deadline, 'followers did not arrive'
+        time.sleep(0.01)
+
+
+def blocking_call(started, release, result='result'):
+    """第一次调用在 release 之前一直阻塞，以保证其他调用在它执行期间到达"""
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return func, calls
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    func, calls = blocking_call(started, release)
+
+    def call():
+        return flight.do('key', func)
+
+    with ThreadPoolExecutor(5) as pool:
+        leader = pool.submit(call)
+        started.wait(5)
+        followers = [pool.submit(call) for _ in range(4)]
+        # follower 进入等待后再放行 leader
+        wait_followers(flight, 4)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert results[0] == ('result', False)
+    assert results[1:] == [('result', True)] * 4
+    assert flight.in_flight() == 0
+
+
+def test_leader_error_is_raised_in_followers():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    func, calls = blocking_call(started, release, result=RuntimeError('upstream failed'))
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'key', func)
+        started.wait(5)
+        follower = pool.submit(flight.do, 'key', func)
+        wait_followers(flight, 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match='upstream failed'):
+                future.result()
+
+    assert len(calls) == 1
+    # 失败后键被移除，下一次调用重新执行
+    assert flight.do('key', lambda: 'retried') == ('retried', False)
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+    results = run_together(4, lambda: flight.do(threading.get_ident(), lambda: 'own'))
+    assert results == [('own', False)] * 4
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv('GITHUB_TOKEN', 'test-token')
+    cache = AICache(MemoryCache())
+    monkeypatch.setattr(ai_service, 'get_ai_cache', lambda: cache)
+    return ai_service.GitHubAIService()
+
+
+def test_cached_call_coalesces_concurrent_misses_and_caches(service):
+    started, release = threading.Event(), threading.Event()
+    compute, calls = blocking_call(started, release, result='summary')
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(service._cached_call, 'extract', 'same content', compute)]
+        started.wait(5)
+        futures += [pool.submit(service._cached_call, 'extract', 'same content', compute) for _ in range(2)]
+        wait_followers(ai_service._in_flight, 2)
+        release.set()
+        assert [f.result() for f in futures] == ['summary'] * 3
+
+    assert len(calls) == 1
+    # 之后的相同调用直接命中缓存
+    assert service._cached_call('extract', 'same content', compute) == 'summary'
+    assert len(calls) == 1
+
+
+def test_cached_stream_waiter_gets_full_result(service):
+    started, release = threading.Event(), threading.Event()
+
+    def open_stream():
+        started.set()
+        release.wait(5)
+        yield 'Hello, '
+        yield 'world'
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(lambda: list(service._cached_stream('translate', 'text', open_stream, 'en')))
+        started.wait(5)
+        waiter = pool.submit(lambda: list(service._cached_stream('translate', 'text', open_stream, 'en')))
+        wait_followers(ai_service._in_flight, 1)
+        release.set()
+        assert leader.result() == ['Hello, ', 'world']
+        # 等待者不再请求模型，把拼接好的结果作为一个增量产出
+        assert waiter.result() == ['Hello, world']
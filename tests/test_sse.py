@@ -0,0 +1,117 @@
+"""流式提取与翻译接口（SSE）：事件顺序、完成后保存、上游出错时不写入"""
+
+import json
+
+import pytest
+
+from src.models.note import Note
+from src.services import ai_service
+from src.services.ai_cache import AICache, MemoryCache
+
+
+class UpstreamDown(Exception):
+    pass
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    """用假的模型流替换真实请求；返回可设置增量列表（或其中的异常）的对象，并记录调用次数"""
+    monkeypatch.setenv('GITHUB_TOKEN', 'test-token')
+    cache = AICache(MemoryCache())
+    monkeypatch.setattr(ai_service, 'get_ai_cache', lambda: cache)
+    service = ai_service.GitHubAIService()
+
+    class Fake:
+        deltas = ['Key ', 'points']
+        calls = []
+
+    def stream_completion(operation, messages, temperature, max_tokens):
+        Fake.calls.append(operation)
+        for delta in Fake.deltas:
+            if isinstance(delta, Exception):
+                raise delta
+            yield delta
+
+    monkeypatch.setattr(service, '_stream_completion', stream_completion)
+    monkeypatch.setattr(ai_service, 'get_ai_service', lambda: service)
+    return Fake
+
+
+def read_events(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if not block.strip():
+            continue
+        event_line, data_line = block.split('\n')
+        events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+    return events
+
+
+def test_extract_stream_sends_events_and_saves(client, db, make_note, fake_stream):
+    note_id = make_note('title', 'some long text')
+
+    events = read_events(client.post('/api/notes/extract-info/stream', json={
+        'content': 'some long text', 'note_id': note_id
+    }))
+
+    assert events == [
+        ('start', {}),
+        ('delta', {'text': 'Key '}),
+        ('delta', {'text': 'points'}),
+        ('done', {'extracted_info': 'Key points', 'saved': True}),
+    ]
+    db.session.expire_all()
+    assert db.session.get(Note, note_id).extracted_info == 'Key points'
+
+    # 同一正文再次请求时复用已保存的结果，不再调用模型
+    events = read_events(client.post('/api/notes/extract-info/stream', json={
+        'content': 'some long text', 'note_id': note_id
+    }))
+    assert events[-1] == ('done', {'extracted_info': 'Key points', 'saved': True, 'reused': True})
+    assert fake_stream.calls == ['extract']
+
+
+def test_translate_stream_sends_events_and_saves(client, db, make_note, fake_stream):
+    note_id = make_note('title', '你好')
+    fake_stream.deltas = ['Hel', 'lo']
+
+    events = read_events(client.post('/api/notes/translate/stream', json={
+        'content': '你好', 'language': 'English', 'note_id': note_id
+    }))
+
+    assert [event for event, _ in events] == ['start', 'delta', 'delta', 'done']
+    assert events[-1][1] == {'translation': 'Hello', 'language': 'English', 'saved': True}
+    db.session.expire_all()
+    assert db.session.get(Note, note_id).get_translations() == {'English': 'Hello'}
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/notes/extract-info/stream', {}),
+    ('/api/notes/translate/stream', {'language': 'English'}),
+])
+def test_upstream_error_sends_error_event_without_writing(client, db, make_note, fake_stream, path, body):
+    note_id = make_note('title', 'text')
+    fake_stream.deltas = ['partial ', UpstreamDown('connection reset')]
+
+    events = read_events(client.post(path, json={'content': 'text', 'note_id': note_id, **body}))
+
+    assert [event for event, _ in events] == ['start', 'delta', 'error']
+    assert events[-1][1]['error']
+    db.session.expire_all()
+    note = db.session.get(Note, note_id)
+    assert note.extracted_info is None
+    assert note.get_translations() == {}
+
+    # 失败的结果没有进入缓存，下次请求重新调用模型
+    fake_stream.deltas = ['ok']
+    events = read_events(client.post(path, json={'content': 'text', 'note_id': note_id, **body}))
+    assert events[-1][0] == 'done'
+    assert len(fake_stream.calls) == 2
+
+
+def test_stream_rejects_missing_note_before_streaming(client, fake_stream):
+    response = client.post('/api/notes/extract-info/stream', json={'content': 'text', 'note_id': 999})
+    assert response.status_code == 404
+    assert fake_stream.calls == []
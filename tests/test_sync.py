@@ -0,0 +1,91 @@
+"""增量同步与删除墓碑"""
+
+from datetime import datetime, timedelta
+
+from src.models.note import NoteTombstone
+from src.services import sync
+
+
+def sync_all(client, cursor=None, limit=50):
+    """按 next_cursor 连续同步到 has_more 为 false，返回 (变更 id, 删除 id, 最后的游标)"""
+    changed, deleted = [], []
+    while True:
+        params = {'limit': limit, 'fields': 'id,title'}
+        if cursor:
+            params['since'] = cursor
+        response = client.get('/api/notes/changes', query_string=params)
+        assert response.status_code == 200
+        body = response.get_json()
+        changed += [note['id'] for note in body['changes']]
+        deleted += body['deleted']
+        cursor = body['next_cursor']
+        if not body['has_more']:
+            return changed, deleted, cursor
+
+
+def test_first_sync_returns_notes_and_skips_older_deletions(client, make_note):
+    gone = make_note('gone')
+    assert client.delete(f'/api/notes/{gone}').status_code == 204
+    kept = [make_note(f'note {i}') for i in range(3)]
+
+    changed, deleted, _ = sync_all(client)
+
+    assert changed == kept
+    # 首次同步的客户端本地没有数据，之前的删除无需告知
+    assert deleted == []
+
+
+def test_incremental_sync_reports_updates_and_deletions(client, make_note):
+    first, second, third = (make_note(f'note {i}') for i in range(3))
+    _, _, cursor = sync_all(client)
+
+    assert client.put(f'/api/notes/{second}', json={'title': 'edited'}).status_code == 200
+    assert client.delete(f'/api/notes/{first}').status_code == 204
+    response = client.post('/api/notes/batch', json={'operations': [{'op': 'delete', 'id': third}]})
+    assert response.status_code == 200
+    created = make_note('new')
+
+    changed, deleted, cursor = sync_all(client, cursor)
+    assert changed == [second, created]
+    assert sorted(deleted) == [first, third]
+
+    # 游标之后没有新变化
+    assert sync_all(client, cursor)[:2] == ([], [])
+
+
+def test_sync_pages_deletions_with_has_more(client, make_note):
+    ids = [make_note(f'note {i}') for i in range(5)]
+    _, _, cursor = sync_all(client)
+    for note_id in ids:
+        assert client.delete(f'/api/notes/{note_id}').status_code == 204
+
+    changed, deleted, _ = sync_all(client, cursor, limit=2)
+
+    assert changed == []
+    assert deleted == ids
+
+
+def test_expired_cursor_requires_full_resync(client, make_note, monkeypatch):
+    make_note()
+    _, _, cursor = sync_all(client)
+    monkeypatch.setenv('NOTE_TOMBSTONE_RETENTION_DAYS', '0')
+
+    response = client.get('/api/notes/changes', query_string={'since': cursor})
+
+    assert response.status_code == 410
+    assert response.get_json()['reset'] is True
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/api/notes/changes', query_string={'since': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+def test_purge_removes_only_expired_tombstones(db):
+    NoteTombstone.record([1, 2])
+    db.session.add(NoteTombstone(note_id=3, deleted_at=datetime.utcnow() - timedelta(days=31)))
+    db.session.commit()
+
+    assert NoteTombstone.purge_expired(sync.get_retention()) == 1
+    db.session.commit()
+    assert sorted(t.note_id for t in NoteTombstone.query) == [1, 2]
@@ -0,0 +1,112 @@
+"""增量文本补丁：拼接规则与 PATCH /api/notes/<id>"""
+
+import pytest
+
+from src.models.note import Note, content_hash
+from src.services.text_patch import PatchError, apply_edits, parse_edits
+
+
+def patch(text, edits, unit='codepoint'):
+    return apply_edits(text, parse_edits(edits), unit)
+
+
+def test_edits_refer_to_base_text_in_any_order():
+    edits = [
+        {'start': 12, 'end': 12, 'text': '!'},
+        {'start': 0, 'end': 5, 'text': 'Goodbye'},
+        {'start': 5, 'end': 6},
+    ]
+    assert patch('hello, world', edits) == 'Goodbye world!'
+
+
+@pytest.mark.parametrize('edits', [
+    [{'start': 0, 'end': 3}, {'start': 2, 'end': 4}],
+    [{'start': 3, 'end': 1}],
+    [{'start': -1, 'end': 0}],
+    [{'start': True, 'end': 1}],
+    [{'start': 0, 'end': 1, 'text': 5}],
+    {'start': 0},
+])
+def test_invalid_edits_are_rejected(edits):
+    with pytest.raises(PatchError):
+        patch('hello', edits)
+
+
+def test_edit_past_end_is_rejected():
+    with pytest.raises(PatchError):
+        patch('hello', [{'start': 5, 'end': 6, 'text': '!'}])
+
+
+def test_utf16_offsets_count_surrogate_pairs_like_javascript():
+    # '😀' 在 JavaScript 中长度为 2
+    assert patch('a😀b', [{'start': 3, 'end': 4, 'text': 'c'}], unit='utf16') == 'a😀c'
+    assert patch('a😀b', [{'start': 2, 'end': 3, 'text': 'c'}]) == 'a😀c'
+    with pytest.raises(PatchError):
+        patch('a😀b', [{'start': 2, 'end': 2, 'text': 'x'}], unit='utf16')
+
+
+def test_patch_route_applies_edits_with_if_match(client, db, make_note):
+    note_id = make_note('title', 'hello world')
+    etag = client.get(f'/api/notes/{note_id}').headers['ETag']
+
+    response = client.patch(
+        f'/api/notes/{note_id}',
+        json={'edits': [{'start': 6, 'end': 11, 'text': 'there'}], 'title': 'greeting',
+              'result_hash': content_hash('hello there')},
+        headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()['content_hash'] == content_hash('hello there')
+    assert response.headers['ETag'] != etag
+    db.session.expire_all()
+    note = db.session.get(Note, note_id)
+    assert (note.title, note.content) == ('greeting', 'hello there')
+
+    # 同一个旧 ETag 再次提交时版本已变化
+    response = client.patch(
+        f'/api/notes/{note_id}', json={'edits': [{'start': 0, 'end': 0, 'text': '>'}]},
+        headers={'If-Match': etag}
+    )
+    assert response.status_code == 412
+
+
+def test_patch_route_checks_base_hash(client, db, make_note):
+    note_id = make_note('title', 'abc')
+
+    stale = client.patch(f'/api/notes/{note_id}', json={
+        'edits': [{'start': 3, 'end': 3, 'text': 'd'}], 'base_hash': content_hash('something else')
+    })
+    assert stale.status_code == 412
+
+    response = client.patch(f'/api/notes/{note_id}', json={
+        'edits': [{'start': 3, 'end': 3, 'text': 'd'}], 'base_hash': content_hash('abc')
+    })
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Note, note_id).content == 'abcd'
+
+
+def test_patch_route_rejects_mismatched_result_without_writing(client, db, make_note):
+    note_id = make_note('title', 'abc')
+
+    response = client.patch(f'/api/notes/{note_id}', json={
+        'edits': [{'start': 0, 'end': 1, 'text': 'x'}], 'base_hash': content_hash('abc'),
+        'result_hash': content_hash('not what the server gets')
+    })
+
+    assert response.status_code == 409
+    assert response.get_json()['content_hash'] == content_hash('xbc')
+    db.session.expire_all()
+    assert db.session.get(Note, note_id).content == 'abc'
+
+
+def test_patch_route_requires_base_version(client, make_note):
+    note_id = make_note()
+    response = client.patch(f'/api/notes/{note_id}', json={'edits': []})
+    assert response.status_code == 428
+
+    response = client.patch(f'/api/notes/{note_id}', json={
+        'edits': [{'start': 0, 'end': 99}], 'base_hash': content_hash('content')
+    })
+    assert response.status_code == 400
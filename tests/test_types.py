@@ -0,0 +1,47 @@
+"""CompressedText 的压缩与还原"""
+
+import pytest
+
+from src.models import types
+from src.models.note import Note
+from src.models.types import COMPRESSED_PREFIX, compress_text, decompress_text
+
+
+@pytest.fixture
+def threshold(monkeypatch):
+    def use(min_bytes):
+        monkeypatch.setattr(types, '_min_bytes', min_bytes)
+    return use
+
+
+@pytest.mark.parametrize('min_bytes', [0, 16, 1 << 20])
+@pytest.mark.parametrize('value', [
+    COMPRESSED_PREFIX,
+    COMPRESSED_PREFIX + 'not base64 at all',
+    COMPRESSED_PREFIX + 'x' * 1000,
+])
+def test_values_starting_with_prefix_round_trip(threshold, min_bytes, value):
+    threshold(min_bytes)
+    stored = compress_text(value)
+    assert stored != value
+    assert decompress_text(stored) == value
+
+
+def test_large_values_are_compressed_and_small_ones_kept(threshold):
+    threshold(64)
+    large = '重复的译文内容 ' * 100
+    assert compress_text(large).startswith(COMPRESSED_PREFIX)
+    assert decompress_text(compress_text(large)) == large
+    assert compress_text('short') == 'short'
+
+
+def test_prefixed_text_round_trips_through_the_column(db, make_note, threshold):
+    threshold(0)
+    value = COMPRESSED_PREFIX + 'user text'
+    note_id = make_note()
+    note = db.session.get(Note, note_id)
+    note.apply_extracted_info(value)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(Note, note_id).extracted_info == value
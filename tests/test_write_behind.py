@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from src.services import write_behind
+from src.services.write_behind import WriteBuffer
+
+
+def wait_flushed(buffer, timeout=5):
+    deadline = time.monotonic() + timeout
+    while buffer.pending_count():
+        assert time.monotonic() < deadline, 'buffer was not flushed in time'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def use_buffer(app, monkeypatch):
+    """把指定缓冲区装入进程级单例，路由通过 get_write_buffer 使用它"""
+    buffers = []
+
+    def use(buffer):
+        monkeypatch.setenv('AUTOSAVE_COALESCE_MS', str(round(buffer.window * 1000)))
+        monkeypatch.setattr(write_behind, '_buffer', buffer)
+        buffers.append(buffer)
+        return buffer
+
+    yield use
+    for buffer in buffers:
+        buffer.close()
+
+
+def crash(buffer):
+    """模拟进程崩溃：丢弃内存中的缓冲，日志文件保持原样"""
+    with buffer._lock:
+        buffer._pending.clear()
+    buffer.close()
+
+
+def test_saves_are_coalesced_into_one_write(app, client, make_note, use_buffer):
+    buffer = use_buffer(WriteBuffer(app, window=0.05))
+    note_id = make_note()
+    for i in range(5):
+        assert client.put(f'/api/notes/{note_id}', json={'content': f'v{i}'}).status_code == 200
+    assert client.get(f'/api/notes/{note_id}').get_json()['content'] == 'v4'
+    wait_flushed(buffer)
+    assert buffer.stats()['absorbed'] >= 4
+    assert client.get(f'/api/notes/{note_id}').get_json()['content'] == 'v4'
+
+
+def test_flush_advances_list_etag_and_change_feed(app, client, make_note, use_buffer):
+    buffer = use_buffer(WriteBuffer(app, window=0.2))
+    a, b = make_note('a'), make_note('b')
+    assert client.put(f'/api/notes/{a}', json={'content': 'a2'}).status_code == 200
+    # 保存与写入之间，另一篇笔记被直接写入
+    response = client.post('/api/notes/batch', json={'operations': [{'op': 'update', 'id': b, 'content': 'b2'}]})
+    assert response.status_code == 200
+
+    listing = client.get('/api/notes')
+    changes = client.get('/api/notes/changes').get_json()
+    assert [note['id'] for note in changes['changes']][-1] == b
+
+    wait_flushed(buffer)
+    refreshed = client.get('/api/notes', headers={'If-None-Match': listing.headers['ETag']})
+    assert refreshed.status_code == 200
+    assert {note['id']: note['content'] for note in refreshed.get_json()}[a] == 'a2'
+    later = client.get('/api/notes/changes', query_string={'since': changes['next_cursor']}).get_json()
+    assert [note['id'] for note in later['changes']] == [a]
+
+
+def test_save_etag_still_matches_after_flush(app, client, make_note, use_buffer):
+    buffer = use_buffer(WriteBuffer(app, window=0.05))
+    note_id = make_note()
+    etag = client.put(f'/api/notes/{note_id}', json={'content': 'v1'}).headers['ETag']
+    wait_flushed(buffer)
+
+    response = client.put(f'/api/notes/{note_id}', json={'content': 'v2'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    wait_flushed(buffer)
+    # 之后的版本已写入，最初的 ETag 不再匹配
+    response = client.put(f'/api/notes/{note_id}', json={'content': 'v3'}, headers={'If-Match': etag})
+    assert response.status_code == 412
+
+
+def test_journal_replay_does_not_undo_later_patch(app, client, make_note, use_buffer, tmp_path):
+    journal = str(tmp_path / 'autosave.journal')
+    buffer = use_buffer(WriteBuffer(app, window=3600, durability='journal', journal_path=journal, fsync=False))
+    a, b = make_note('a', 'a0'), make_note('b', 'b0')
+    client.put(f'/api/notes/{a}', json={'content': 'a1'})
+    client.put(f'/api/notes/{b}', json={'content': 'b1'})
+    etag = client.get(f'/api/notes/{a}').headers['ETag']
+    response = client.patch(f'/api/notes/{a}', json={'edits': [{'start': 0, 'end': 2, 'text': 'PATCHED'}]},
+                            headers={'If-Match': etag})
+    assert response.status_code == 200
+    # 写入 a 后日志只剩 b 的版本
+    with open(journal, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    crash(buffer)
+
+    replayed = use_buffer(WriteBuffer(app, window=0.05, durability='journal', journal_path=journal, fsync=False))
+    wait_flushed(replayed)
+    assert client.get(f'/api/notes/{a}').get_json()['content'] == 'PATCHED'
+    assert client.get(f'/api/notes/{b}').get_json()['content'] == 'b1'
+
+
+def test_journal_replay_skips_superseded_entries(app, client, db, make_note, use_buffer, tmp_path):
+    from src.models.note import Note
+
+    journal = str(tmp_path / 'autosave.journal')
+    buffer = use_buffer(WriteBuffer(app, window=3600, durability='journal', journal_path=journal, fsync=False))
+    note_id = make_note('a', 'a0')
+    client.put(f'/api/notes/{note_id}', json={'content': 'a1'})
+    crash(buffer)
+    # 日志写入后、重放之前，正文被其他写入替换
+    db.session.get(Note, note_id).content = 'other'
+    db.session.commit()
+
+    replayed = use_buffer(WriteBuffer(app, window=0.05, durability='journal', journal_path=journal, fsync=False))
+    wait_flushed(replayed)
+    assert client.get(f'/api/notes/{note_id}').get_json()['content'] == 'other'
+    assert write_behind.autosave_flushes.value(outcome='stale') >= 1
+
+
+def test_serverless_disables_buffer_without_touching_environment(app, monkeypatch):
+    monkeypatch.setenv('AUTOSAVE_COALESCE_MS', '100')
+    monkeypatch.setenv('DB_POOL_MODE', 'serverless')
+    monkeypatch.setattr(write_behind, '_buffer', None)
+    monkeypatch.setattr(write_behind, '_disabled', False)
+    assert write_behind.get_write_buffer(app) is None
+    assert write_behind._disabled
+    import os
+    assert os.environ['AUTOSAVE_COALESCE_MS'] == '100'